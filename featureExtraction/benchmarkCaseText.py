@@ -0,0 +1,157 @@
+"""Benchmark case-text conversion against the original pandas path.
+
+For every file in ``sampleJudgments`` (and for the appeal and corrigendum
+pairs combined into one judgement) the case text is built the way it used to
+be (BeautifulSoup with ``html.parser``, serialised and parsed again, with every
+table read by ``pd.read_html`` and written back with ``to_markdown``) and with
+``build_case_text``, which parses each HTML string once with lxml and writes
+simple tables to markdown directly. It prints the time per judgement for
+both, and exits with an error if the case text of any sample differs;
+``--diff`` shows how.
+
+    uv run benchmarkCaseText.py --repeat 5 --diff
+"""
+
+import argparse
+import difflib
+import os
+import re
+import sys
+import time
+from collections.abc import Callable
+from io import StringIO
+
+import pandas as pd
+from bs4 import BeautifulSoup
+from tabulate import tabulate
+
+from extract.case_text import build_case_text
+
+SAMPLES_DIR = "sampleJudgments"
+# Judgements whose appeal or corrigendum is stored alongside the main HTML.
+COMBINED_SAMPLES = {
+    "appeal.htm": ("appeal_html", "appeal-from.htm"),
+    "case-with-corrigendum.htm": ("corrigendum_html", "corrigendum.htm"),
+}
+
+
+def load_samples() -> dict[str, dict]:
+    def read(name: str) -> str:
+        with open(os.path.join(SAMPLES_DIR, name)) as file:
+            return file.read()
+
+    samples = {
+        name: {"_id": name, "html": read(name)}
+        for name in sorted(os.listdir(SAMPLES_DIR))
+        if name.endswith(".htm")
+    }
+    for name, (field, other) in COMBINED_SAMPLES.items():
+        samples[f"{name} + {other}"] = {
+            "_id": name,
+            "html": read(name),
+            field.removesuffix("_html"): True,
+            field: read(other),
+        }
+    return samples
+
+
+def legacy_html_to_text(html: str) -> str:
+    """``html_to_text_with_tables`` as it was before tables were converted directly."""
+    soup = BeautifulSoup(str(BeautifulSoup(html, "html.parser")), "html.parser")
+    for table in soup.find_all("table")[1:]:
+        if table.find_parent(["parties", "coram", "date", "representation", "charge"]):
+            continue
+        table_df = (
+            pd.read_html(StringIO(str(table)), header=0)[0]
+            .fillna("")
+            .rename(columns={"Unnamed: 0": ""})
+            .astype(str)
+        )
+        table.replace_with(table_df.to_markdown(index=False))
+    return soup.get_text()
+
+
+def legacy_case_text(judgement_doc: dict) -> tuple[str, str]:
+    """``build_case_text`` as it was before HTML was parsed only once."""
+    judgement_type = "standard"
+    if judgement_doc.get("appeal"):
+        judgement_type = "appeal"
+    elif judgement_doc.get("corrigendum"):
+        judgement_type = "corrigendum"
+
+    case_txt = ""
+    for field in ("html", "appeal_html", "corrigendum_html"):
+        if judgement_doc.get(field):
+            case_txt += legacy_html_to_text(judgement_doc[field])
+    case_txt = re.sub(r"\n\s*\n", "\n\n", case_txt).strip()
+    return case_txt, judgement_type
+
+
+def time_per_call(
+    convert: Callable[[dict], tuple[str, str]], judgement_doc: dict, repeat: int
+) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        convert(judgement_doc)
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--diff", action="store_true", help="Print how differing case texts differ."
+    )
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    rows = []
+    mismatches = []
+    legacy_total = current_total = 0.0
+    for name, judgement_doc in load_samples().items():
+        legacy_txt, _ = legacy_case_text(judgement_doc)
+        current_txt, _ = build_case_text(judgement_doc)
+        if legacy_txt != current_txt:
+            mismatches.append(name)
+            if args.diff:
+                print(f"--- {name}")
+                for line in difflib.unified_diff(
+                    legacy_txt.splitlines(), current_txt.splitlines(), lineterm="", n=0
+                ):
+                    if not line.startswith(("---", "+++")):
+                        print(line)
+        legacy = time_per_call(legacy_case_text, judgement_doc, args.repeat)
+        current = time_per_call(build_case_text, judgement_doc, args.repeat)
+        legacy_total += legacy
+        current_total += current
+        rows.append(
+            [
+                name,
+                f"{legacy * 1000:.1f}",
+                f"{current * 1000:.1f}",
+                f"{legacy / current:.2f}x",
+            ]
+        )
+    rows.append(
+        [
+            "total",
+            f"{legacy_total * 1000:.1f}",
+            f"{current_total * 1000:.1f}",
+            f"{legacy_total / current_total:.2f}x",
+        ]
+    )
+    print(
+        tabulate(
+            rows,
+            headers=["sample", "before ms", "after ms", "speed-up"],
+            tablefmt="github",
+        )
+    )
+    if mismatches:
+        print(f"Case text differs for: {', '.join(mismatches)}")
+        sys.exit(1)
+    print("Case text is identical for every sample.")
+
+
+if __name__ == "__main__":
+    main()
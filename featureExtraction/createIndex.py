@@ -12,3 +12,5 @@ if __name__ == "__main__":
     judgements_collection.create_index("appeal")
     judgements_collection.create_index("corrigendum")
     judgements_collection.create_index(["trial", ("year", pymongo.DESCENDING)])
+    # lease-based work queue used by `extractFeature.py --lease`
+    judgements_collection.create_index(["extraction_status", "lease_expires_at"])
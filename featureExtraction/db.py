@@ -1,7 +1,7 @@
 import os
 
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient
 
 load_dotenv()
 
@@ -21,3 +21,19 @@ class DB:
 
     def get_extracted_features_collection(self):
         return self.database.get_collection(EXTRACTED_FEATURES_COLLECTION_NAME)
+
+
+class AsyncDB:
+    def __init__(self):
+        uri = os.getenv("DB_MONGODB_URI")
+        self.client = AsyncMongoClient(uri)
+        self.database = self.client.get_database(DB_NAME)
+
+    def get_judgements_collection(self):
+        return self.database.get_collection(JUDGEMENTS_COLLECTION_NAME)
+
+    def get_extracted_features_collection(self):
+        return self.database.get_collection(EXTRACTED_FEATURES_COLLECTION_NAME)
+
+    async def close(self):
+        await self.client.close()
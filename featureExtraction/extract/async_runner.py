@@ -0,0 +1,296 @@
+import asyncio
+import sys
+from collections.abc import AsyncIterator
+from contextlib import ExitStack
+from typing import Any
+
+from pymongo.asynchronous.collection import AsyncCollection
+from tqdm import tqdm
+
+from .cache import get_response_cache
+from .client import (
+    aclose_clients,
+    create_async_db,
+    get_async_openai_client,
+    get_governor,
+    get_langfuse,
+)
+from .compact import RUN_COMPACTION
+from .config import (
+    EXTRACT_CONCURRENCY,
+    EXTRACT_DASHBOARD_SECONDS,
+    EXTRACT_LIMIT,
+    EXTRACT_RENDER_PROCESSES,
+    MUST_INCLUDE_TRIALS,
+    RERUN_ALL,
+)
+from .dashboard import Dashboard
+from .feed import judgement_doc_size
+from .hedge import get_hedger
+from .pipeline import aextract_all_features
+from .preprocess import (
+    RENDER_ERRORS,
+    RenderedJudgement,
+    RenderStage,
+    failed_render,
+)
+from .runner import (
+    JUDGEMENT_ERRORS,
+    JUDGEMENT_PROJECTION,
+    ProcessResult,
+    RunSummary,
+    build_extracted_doc,
+    build_must_include_filter,
+    build_normal_filter,
+)
+from .sections import RUN_SECTIONS, build_case_texts
+from .timing import RUN_PROFILE, report_profile
+from .usage import RUN_BUDGET, RUN_USAGE, UsageMeter
+
+
+async def should_skip_extraction(
+    source_id: Any, extracted_features_collection: AsyncCollection
+) -> bool:
+    if RERUN_ALL:
+        return False
+    return (
+        await extracted_features_collection.count_documents(
+            {"source_judgement_id": source_id}
+        )
+        > 0
+    )
+
+
+async def build_docs_filters(
+    judgements_collection: AsyncCollection,
+    extracted_features_collection: AsyncCollection,
+) -> tuple[dict | None, dict]:
+    base_filter = {
+        "_id": {
+            "$nin": await extracted_features_collection.distinct("source_judgement_id")
+        }
+    }
+    must_include_filter = build_must_include_filter(MUST_INCLUDE_TRIALS)
+    if not must_include_filter:
+        return None, base_filter
+
+    priority_filter = {"$and": [base_filter, must_include_filter]}
+    must_include_ids = [
+        doc["_id"]
+        async for doc in judgements_collection.find(priority_filter, {"_id": 1})
+    ]
+    return priority_filter, build_normal_filter(base_filter, must_include_ids)
+
+
+async def iter_docs_to_process(
+    judgements_collection: AsyncCollection,
+    priority_filter: dict | None,
+    normal_filter: dict,
+) -> AsyncIterator[dict]:
+    batch_size = EXTRACT_CONCURRENCY
+    if priority_filter:
+        async for judgement_doc in judgements_collection.find(
+            priority_filter, JUDGEMENT_PROJECTION, batch_size=batch_size
+        ):
+            yield judgement_doc
+
+    cursor = judgements_collection.find(
+        normal_filter, JUDGEMENT_PROJECTION, batch_size=batch_size
+    )
+    if EXTRACT_LIMIT > 0:
+        cursor = cursor.limit(EXTRACT_LIMIT)
+    async for judgement_doc in cursor:
+        yield judgement_doc
+
+
+async def process_judgement_doc(
+    judgement_doc: dict,
+    extracted_features_collection: AsyncCollection,
+    client: Any,
+    langfuse: Any,
+    render: RenderStage | None = None,
+) -> ProcessResult:
+    source_id = judgement_doc.get("_id")
+    if source_id is None:
+        return ProcessResult(status="skipped", message="Skipping document without _id.")
+
+    if await should_skip_extraction(source_id, extracted_features_collection):
+        return ProcessResult(status="skipped", source_id=source_id)
+
+    # HTML parsing is CPU-bound; keep it off the event loop.
+    if render is not None:
+        rendered = await render.arender(judgement_doc)
+    else:
+        with RUN_PROFILE.time("case_text"):
+            try:
+                rendered = RenderedJudgement(
+                    judgement_doc,
+                    *await asyncio.to_thread(build_case_texts, judgement_doc),
+                )
+            except RENDER_ERRORS as exc:
+                rendered = failed_render(judgement_doc, exc)
+    if rendered.error is not None:
+        return ProcessResult(
+            status="failed",
+            source_id=source_id,
+            message=f"Failed to convert {source_id} to case text: {rendered.error}",
+        )
+    case_txt, judgement_type = rendered.case_txt, rendered.judgement_type
+    schema_case_texts, chunks = rendered.schema_case_texts, rendered.chunks
+    if not case_txt:
+        return ProcessResult(
+            status="skipped",
+            source_id=source_id,
+            message=f"Skipping {source_id}: empty html content",
+        )
+    RUN_SECTIONS.record(case_txt, schema_case_texts)
+    case_txt = RUN_COMPACTION.apply(case_txt)
+    schema_case_texts = RUN_COMPACTION.apply_to_schemas(schema_case_texts)
+    chunks = RUN_COMPACTION.apply_to_chunks(chunks)
+    if chunks:
+        tqdm.write(f"Extracting {source_id} in {len(chunks)} chunks.")
+    usage = UsageMeter()
+
+    try:
+        (
+            judgement_data,
+            defendants_data,
+            trials_data,
+            trace_id,
+        ) = await aextract_all_features(
+            case_txt=case_txt,
+            judgement_type=judgement_type,
+            client=client,
+            langfuse=langfuse,
+            schema_case_texts=schema_case_texts,
+            chunks=chunks,
+            usage=usage,
+        )
+        extracted_doc = build_extracted_doc(
+            judgement_doc,
+            judgement_type,
+            judgement_data,
+            defendants_data,
+            trials_data,
+            trace_id,
+            usage,
+        )
+        with RUN_PROFILE.time("db.insert"):
+            await extracted_features_collection.insert_one(extracted_doc)
+        return ProcessResult(status="processed", source_id=source_id)
+    except JUDGEMENT_ERRORS as exc:
+        return ProcessResult(status="failed", source_id=source_id, message=str(exc))
+
+
+async def run(dashboard: bool = False) -> None:
+    db = create_async_db()
+    judgements_collection = db.get_judgements_collection()
+    extracted_features_collection = db.get_extracted_features_collection()
+    client = get_async_openai_client()
+    langfuse = get_langfuse()
+
+    priority_filter, normal_filter = await build_docs_filters(
+        judgements_collection, extracted_features_collection
+    )
+    must_include_count = 0
+    if priority_filter:
+        must_include_count = await judgements_collection.count_documents(
+            priority_filter
+        )
+    normal_count = await judgements_collection.count_documents(normal_filter)
+    judgement_count = must_include_count + normal_count
+    if EXTRACT_LIMIT > 0:
+        normal_count = min(normal_count, EXTRACT_LIMIT)
+
+    print(
+        f"Found {judgement_count} unprocessed judgement records in judgement-html collection."
+    )
+    if MUST_INCLUDE_TRIALS:
+        print(
+            f"Must-include configured: matched {must_include_count} records from {len(MUST_INCLUDE_TRIALS)} trial values."
+        )
+    print(f"Using async engine with concurrency={EXTRACT_CONCURRENCY}.")
+
+    summary = RunSummary()
+    semaphore = asyncio.Semaphore(EXTRACT_CONCURRENCY)
+    tasks: set[asyncio.Task] = set()
+    status: Dashboard | None = None
+    if dashboard:
+        status = Dashboard(
+            must_include_count + normal_count, None, EXTRACT_DASHBOARD_SECONDS
+        )
+
+    with ExitStack() as stack:
+        progress = stack.enter_context(
+            tqdm(
+                total=must_include_count + normal_count,
+                desc="Judgements",
+                file=sys.stdout,
+            )
+        )
+        if status is not None:
+            stack.enter_context(status)
+        render: RenderStage | None = None
+        if EXTRACT_RENDER_PROCESSES:
+            # Tasks are already bounded by EXTRACT_CONCURRENCY, so no queue.
+            render = stack.enter_context(RenderStage(EXTRACT_RENDER_PROCESSES, 0))
+
+        async def run_one(judgement_doc: dict) -> None:
+            if status is not None:
+                status.start()
+            try:
+                with RUN_PROFILE.time("judgement"):
+                    result = await process_judgement_doc(
+                        judgement_doc,
+                        extracted_features_collection,
+                        client,
+                        langfuse,
+                        render,
+                    )
+            finally:
+                semaphore.release()
+                if status is not None:
+                    status.finish(judgement_doc_size(judgement_doc))
+            summary.record(result)
+            progress.update()
+
+        try:
+            docs = iter_docs_to_process(
+                judgements_collection, priority_filter, normal_filter
+            )
+            async for judgement_doc in RUN_PROFILE.aiterate("fetch", docs):
+                if status is not None:
+                    status.submit()
+                await semaphore.acquire()
+                # Checked once a slot is free, so the latest spend is counted.
+                if RUN_BUDGET.exhausted():
+                    semaphore.release()
+                    break
+                task = asyncio.create_task(run_one(judgement_doc))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            await asyncio.gather(*tasks)
+        finally:
+            await aclose_clients()
+            await db.close()
+
+    print(
+        f"Extraction completed. processed={summary.processed}, skipped={summary.skipped}, failed={summary.failed}, total={judgement_count}"
+    )
+    print(get_governor().summary())
+    if render is not None:
+        print(render.summary())
+    if RUN_COMPACTION.enabled:
+        print(RUN_COMPACTION.summary())
+    if RUN_SECTIONS.enabled:
+        print(RUN_SECTIONS.summary())
+    print(RUN_USAGE.summary())
+    if RUN_BUDGET.enabled:
+        print(RUN_BUDGET.summary())
+    if (cache := get_response_cache()) is not None:
+        print(cache.summary())
+    if (hedger := get_hedger()) is not None:
+        print(hedger.summary())
+        hedger.close()
+    report_profile()
@@ -0,0 +1,524 @@
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field, replace
+from typing import Any
+
+from openai import OpenAI
+from openai.types.responses import Response
+from pydantic import ValidationError
+from tqdm import tqdm
+
+from .client import create_db, create_openai_client
+from .compact import RUN_COMPACTION
+from .config import (
+    EXTRACT_BATCH_DIR,
+    EXTRACT_BATCH_MAX_REQUESTS,
+    EXTRACT_BATCH_POLL_SECONDS,
+    EXTRACT_RENDER_PROCESSES,
+    EXTRACT_RENDER_QUEUE_SIZE,
+    MAX_RETRIES,
+    MUST_INCLUDE_TRIALS,
+)
+from .merge import ChunkMismatchError
+from .pipeline import (
+    EXTRACTION_STAGES,
+    ExtractionModel,
+    RetryState,
+    SchemaCall,
+    collect_stage,
+    plan_stage,
+    record_extraction,
+    schema_case_parts,
+)
+from .preprocess import RenderStage
+from .runner import (
+    ProcessResult,
+    RunSummary,
+    build_extracted_doc,
+    should_skip_extraction,
+    stream_docs_to_process,
+)
+from .sections import RUN_SECTIONS
+from .timing import RUN_PROFILE, report_profile
+from .usage import RUN_BUDGET, RUN_USAGE, UsageMeter
+
+BATCH_ENDPOINT = "/v1/responses"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+MANIFEST_NAME = "batches.json"
+# What the extracted document records about its judgement.
+SOURCE_FIELDS = ("_id", "trial", "appeal", "corrigendum")
+
+
+class BatchWorkDir:
+    """Case texts of pending judgements, request files and submitted batches.
+
+    Case texts are written here as judgements are rendered and read back
+    whenever requests are built, so neither the HTML nor the case texts of
+    the pending corpus are held in memory. Submitted batch IDs are kept by
+    the hash of their request file: a run restarted over the same pending
+    judgements builds the same requests and picks up those batches instead
+    of submitting them again.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._remove("job-*.json", "requests-*.jsonl")
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self.batches: dict[str, str] = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as file:
+                self.batches = json.load(file)
+
+    def _remove(self, *patterns: str) -> None:
+        for pattern in patterns:
+            for path in glob.glob(os.path.join(self.directory, pattern)):
+                os.remove(path)
+
+    def write_job(
+        self,
+        index: int,
+        case_txt: str,
+        schema_case_texts: dict[str, str],
+        chunks: list[str],
+    ) -> str:
+        path = os.path.join(self.directory, f"job-{index}.json")
+        with open(path, "w") as file:
+            json.dump(
+                {
+                    "case_txt": case_txt,
+                    "schema_case_texts": schema_case_texts,
+                    "chunks": chunks,
+                },
+                file,
+                ensure_ascii=False,
+            )
+        return path
+
+    def request_path(self, description: str) -> str:
+        return os.path.join(self.directory, f"requests-{description}.jsonl")
+
+    def submitted(self, digest: str) -> str | None:
+        return self.batches.get(digest)
+
+    def _save(self) -> None:
+        temporary_path = self.manifest_path + ".tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(self.batches, file)
+        os.replace(temporary_path, self.manifest_path)
+
+    def record(self, digest: str, batch_id: str) -> None:
+        self.batches[digest] = batch_id
+        self._save()
+
+    def forget(self, batch_id: str) -> None:
+        self.batches = {
+            digest: known_id
+            for digest, known_id in self.batches.items()
+            if known_id != batch_id
+        }
+        self._save()
+
+    def clear(self) -> None:
+        self._remove("job-*.json", "requests-*.jsonl", MANIFEST_NAME)
+
+
+@dataclass
+class BatchJob:
+    source: dict
+    judgement_type: str
+    # File with the case texts, see BatchWorkDir.write_job.
+    path: str
+    previous_extractions: dict[str, Any] = field(default_factory=dict)
+    extracted: dict[str, ExtractionModel] = field(default_factory=dict)
+    # Calls of the current stage (one per chunk and item), without their case
+    # texts, and their outputs.
+    calls: list[SchemaCall] = field(default_factory=list)
+    results: dict[int, ExtractionModel] = field(default_factory=dict)
+    # Batch requests are not timed, so only tokens and attempts are recorded.
+    usage: UsageMeter = field(default_factory=UsageMeter)
+    error: str | None = None
+
+    def case_texts(self) -> tuple[str, dict[str, str], list[str]]:
+        with open(self.path) as file:
+            texts = json.load(file)
+        return texts["case_txt"], texts["schema_case_texts"], texts["chunks"]
+
+
+@dataclass
+class RequestFile:
+    path: str
+    custom_ids: list[str]
+    digest: str
+
+
+def _custom_id(job: BatchJob, call: SchemaCall) -> str:
+    return f"{job.source['_id']}|{call.request_schema}|{call.part}|{call.item}"
+
+
+def _request_body(state: RetryState, attempt: int) -> dict[str, Any]:
+    body = state.request(attempt)
+    # "name" only labels the Langfuse generation; the API does not accept it.
+    body.pop("name", None)
+    return body
+
+
+def _request_lines(
+    states: dict[str, tuple[BatchJob, int, RetryState]],
+    pending: list[str],
+    attempt: int,
+) -> Iterator[tuple[str, str]]:
+    """The batch line of each pending request, reading each job's case texts
+    back from disk only while its requests are built."""
+    loaded: tuple[BatchJob, tuple[str, dict[str, str], list[str]]] | None = None
+    for custom_id in pending:
+        job, index, state = states[custom_id]
+        if loaded is None or loaded[0] is not job:
+            loaded = (job, job.case_texts())
+        call = job.calls[index]
+        state.case_txt = schema_case_parts(call.schema_name, *loaded[1])[call.part]
+        body = _request_body(state, attempt)
+        state.case_txt = ""
+        yield (
+            custom_id,
+            json.dumps(
+                {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": body,
+                },
+                ensure_ascii=False,
+            ),
+        )
+
+
+def _write_requests(
+    work: BatchWorkDir, description: str, lines: Iterator[tuple[str, str]]
+) -> list[RequestFile]:
+    """Write the lines to files of at most EXTRACT_BATCH_MAX_REQUESTS lines."""
+    request_files: list[RequestFile] = []
+    file = None
+    digest = hashlib.sha256()
+    try:
+        for custom_id, line in lines:
+            if file is None or len(request_files[-1].custom_ids) >= (
+                EXTRACT_BATCH_MAX_REQUESTS
+            ):
+                if file is not None:
+                    file.close()
+                    request_files[-1].digest = digest.hexdigest()
+                path = work.request_path(f"{description}-{len(request_files) + 1}")
+                file = open(path, "w")
+                digest = hashlib.sha256()
+                request_files.append(RequestFile(path, [], ""))
+            file.write(line + "\n")
+            digest.update(line.encode() + b"\n")
+            request_files[-1].custom_ids.append(custom_id)
+    finally:
+        if file is not None:
+            file.close()
+            request_files[-1].digest = digest.hexdigest()
+    return request_files
+
+
+def _submit(
+    client: OpenAI, work: BatchWorkDir, request_file: RequestFile, description: str
+) -> str:
+    if (batch_id := work.submitted(request_file.digest)) is not None:
+        tqdm.write(f"Picking up batch {batch_id} ({description}) from an earlier run.")
+        return batch_id
+    with open(request_file.path, "rb") as file:
+        input_file = client.files.create(
+            file=(f"{description}.jsonl", file), purpose="batch"
+        )
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+        metadata={"description": description},
+    )
+    work.record(request_file.digest, batch.id)
+    tqdm.write(
+        f"Submitted batch {batch.id} ({description}, "
+        f"{len(request_file.custom_ids)} requests)."
+    )
+    return batch.id
+
+
+def _read_lines(client: OpenAI, file_id: str | None) -> list[dict]:
+    if not file_id:
+        return []
+    content = client.files.content(file_id).text
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def _wait_for_batches(
+    client: OpenAI, work: BatchWorkDir, batch_ids: list[str]
+) -> tuple[dict[str, dict], dict[str, str]]:
+    """Poll until every batch is final.
+
+    Returns the result lines by custom_id, and the error of each batch that
+    failed as a whole.
+    """
+    results: dict[str, dict] = {}
+    failed: dict[str, str] = {}
+    waiting = list(batch_ids)
+    while waiting:
+        still_waiting = []
+        for batch_id in waiting:
+            batch = client.batches.retrieve(batch_id)
+            if batch.status not in BATCH_FINAL_STATUSES:
+                still_waiting.append(batch_id)
+                continue
+            if batch.status == "failed":
+                errors = batch.errors.data if batch.errors and batch.errors.data else []
+                failed[batch_id] = "; ".join(str(error.message) for error in errors)
+                # A restarted run submits these requests again.
+                work.forget(batch_id)
+                tqdm.write(f"Batch {batch_id} failed: {failed[batch_id]}")
+                continue
+            # Expired and cancelled batches still return what they finished;
+            # the rest is resubmitted in the next round.
+            for line in _read_lines(client, batch.output_file_id) + _read_lines(
+                client, batch.error_file_id
+            ):
+                results[line["custom_id"]] = line
+            tqdm.write(f"Batch {batch_id} {batch.status}.")
+        waiting = still_waiting
+        if waiting:
+            time.sleep(EXTRACT_BATCH_POLL_SECONDS)
+    return results, failed
+
+
+def _line_response(line: dict | None) -> Response:
+    if line is None:
+        raise ValueError("No result returned by the batch.")
+    if line.get("error"):
+        raise ValueError(f"Batch request failed: {line['error']}")
+    response = line.get("response") or {}
+    if response.get("status_code") != 200:
+        raise ValueError(
+            f"Batch request failed with status {response.get('status_code')}: "
+            f"{response.get('body')}"
+        )
+    return Response.model_validate(response["body"])
+
+
+def run_stage(
+    client: OpenAI,
+    work: BatchWorkDir,
+    jobs: list[BatchJob],
+    stage: list[str],
+    stage_index: int,
+) -> None:
+    states: dict[str, tuple[BatchJob, int, RetryState]] = {}
+    for job in jobs:
+        if job.error is not None:
+            continue
+        calls = plan_stage(stage, *job.case_texts(), job.previous_extractions)
+        # The case texts are read back from disk whenever requests are built.
+        job.calls = [replace(call, case_txt="") for call in calls]
+        job.results = {}
+        for index, call in enumerate(job.calls):
+            states[_custom_id(job, call)] = (
+                job,
+                index,
+                RetryState(
+                    call.request_schema,
+                    "",
+                    job.judgement_type,
+                    call.previous_extractions,
+                    job.usage,
+                ),
+            )
+    pending = list(states)
+    for attempt in range(MAX_RETRIES):
+        if not pending:
+            break
+        description = f"{'+'.join(stage)}-stage{stage_index + 1}-attempt{attempt + 1}"
+        request_files = _write_requests(
+            work, description, _request_lines(states, pending, attempt)
+        )
+        submitted = {
+            _submit(client, work, request_file, f"{description}-{part}"): request_file
+            for part, request_file in enumerate(request_files, start=1)
+        }
+        with RUN_PROFILE.time("batch.wait"):
+            results, failed = _wait_for_batches(client, work, list(submitted))
+        for batch_id, message in failed.items():
+            # Only the judgements with requests in that batch fail.
+            for custom_id in submitted[batch_id].custom_ids:
+                job = states[custom_id][0]
+                if job.error is None:
+                    job.error = f"Batch {batch_id} failed: {message}"
+
+        still_pending = []
+        for custom_id in pending:
+            job, index, state = states[custom_id]
+            if job.error is not None:
+                continue
+            try:
+                job.results[index] = state.parse(_line_response(results.get(custom_id)))
+            except (ValidationError, ValueError) as exc:
+                state.failed(exc)
+                still_pending.append(custom_id)
+        pending = still_pending
+
+    for custom_id in pending:
+        job, _, state = states[custom_id]
+        job.error = (
+            f"Failed to extract {state.schema_name} after {MAX_RETRIES} batch "
+            f"attempts: {state.last_error}"
+        )
+    for job in jobs:
+        if job.error is not None:
+            continue
+        try:
+            job.extracted.update(
+                collect_stage(
+                    stage,
+                    job.calls,
+                    [job.results[index] for index in range(len(job.calls))],
+                )
+            )
+        except ChunkMismatchError as exc:
+            # Batch rounds are shared by every job, so a job is not re-run
+            # from the full text; run it again with EXTRACT_CHUNK_THRESHOLD_TOKENS=0.
+            job.error = f"Cannot merge chunks of {'+'.join(stage)}: {exc}"
+            continue
+        except ValidationError as exc:
+            job.error = f"Failed to assemble {'+'.join(stage)}: {exc}"
+            continue
+        finally:
+            job.results = {}
+        for schema_name in stage:
+            record_extraction(
+                job.previous_extractions, schema_name, job.extracted[schema_name]
+            )
+
+
+def run() -> None:
+    db = create_db()
+    judgements_collection = db.get_judgements_collection()
+    extracted_features_collection = db.get_extracted_features_collection()
+    client = create_openai_client()
+    summary = RunSummary()
+
+    docs, judgement_count, must_include_count = stream_docs_to_process(
+        judgements_collection, extracted_features_collection
+    )
+    print(f"Total judgements to process: {judgement_count}")
+    if RUN_BUDGET.enabled:
+        # Every judgement is submitted before any usage is known.
+        print("EXTRACT_BUDGET_TOKENS and EXTRACT_BUDGET_USD are ignored in batch mode.")
+    print(
+        f"Must-include trials queued: {must_include_count}/{len(MUST_INCLUDE_TRIALS)}"
+    )
+
+    def to_render() -> Iterator[dict]:
+        for judgement_doc in RUN_PROFILE.iterate("fetch", docs):
+            source_id = judgement_doc.get("_id")
+            if source_id is None or should_skip_extraction(
+                source_id, extracted_features_collection
+            ):
+                summary.record(ProcessResult(status="skipped", source_id=source_id))
+                continue
+            yield judgement_doc
+
+    work = BatchWorkDir(EXTRACT_BATCH_DIR)
+    jobs: list[BatchJob] = []
+    # There are no LLM workers to render in, so batch mode renders on every
+    # core unless EXTRACT_RENDER_PROCESSES says otherwise.
+    cores = os.cpu_count() or 1
+    render = RenderStage(
+        EXTRACT_RENDER_PROCESSES or (cores if cores > 1 else 0),
+        EXTRACT_RENDER_QUEUE_SIZE,
+    )
+    with render:
+        for rendered in tqdm(
+            render.results(to_render()), desc="Rendering", file=sys.stdout
+        ):
+            source_id = rendered.judgement_doc["_id"]
+            if rendered.error is not None:
+                summary.record(
+                    ProcessResult(
+                        status="failed",
+                        source_id=source_id,
+                        message=(
+                            f"Failed to convert {source_id} to case text: "
+                            f"{rendered.error}"
+                        ),
+                    )
+                )
+                continue
+            if not rendered.case_txt:
+                summary.record(
+                    ProcessResult(
+                        status="skipped",
+                        source_id=source_id,
+                        message=f"Skipping {source_id}: empty html content",
+                    )
+                )
+                continue
+            RUN_SECTIONS.record(rendered.case_txt, rendered.schema_case_texts)
+            jobs.append(
+                BatchJob(
+                    {key: rendered.judgement_doc.get(key) for key in SOURCE_FIELDS},
+                    rendered.judgement_type,
+                    work.write_job(
+                        len(jobs),
+                        RUN_COMPACTION.apply(rendered.case_txt),
+                        RUN_COMPACTION.apply_to_schemas(rendered.schema_case_texts),
+                        RUN_COMPACTION.apply_to_chunks(rendered.chunks),
+                    ),
+                )
+            )
+    print(render.summary())
+    if RUN_COMPACTION.enabled:
+        print(RUN_COMPACTION.summary())
+    if RUN_SECTIONS.enabled:
+        print(RUN_SECTIONS.summary())
+
+    try:
+        for stage_index, stage in enumerate(EXTRACTION_STAGES):
+            if any(job.error is None for job in jobs):
+                run_stage(client, work, jobs, stage, stage_index)
+
+        for job in jobs:
+            source_id = job.source["_id"]
+            if job.error is not None:
+                summary.record(
+                    ProcessResult(
+                        status="failed", source_id=source_id, message=job.error
+                    )
+                )
+                continue
+            extracted_doc = build_extracted_doc(
+                job.source,
+                job.judgement_type,
+                job.extracted["judgement"],
+                job.extracted["defendants"],
+                job.extracted["trials"],
+                None,
+                job.usage,
+            )
+            with RUN_PROFILE.time("db.insert"):
+                extracted_features_collection.insert_one(extracted_doc)
+            summary.record(ProcessResult(status="processed", source_id=source_id))
+        # Failed judgements are rendered and submitted again by the next run.
+        work.clear()
+    finally:
+        client.close()
+
+    print(
+        f"Extraction completed. processed={summary.processed}, skipped={summary.skipped}, failed={summary.failed}, total={judgement_count}"
+    )
+    print(RUN_USAGE.summary())
+    report_profile()
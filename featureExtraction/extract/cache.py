@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from contextlib import suppress
+from typing import TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from .config import EXTRACT_CACHE_DIR, EXTRACT_CACHE_MAX_BYTES
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def schema_hash(model: type[BaseModel]) -> str:
+    return _sha256(json.dumps(model.model_json_schema(), sort_keys=True))
+
+
+class ResponseCache:
+    """Content-addressed on-disk cache of parsed schema extractions.
+
+    Entries are keyed by the model name, the output schema, the rendered
+    prompt and the case text, so any change to one of them is a miss. The
+    cache is evicted least-recently-used first once its files exceed
+    ``max_bytes``. Concurrent requests for the same key share one computation:
+    the first caller runs it and the others wait for its result.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future] = {}
+        self._ainflight: dict[str, asyncio.Future] = {}
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def key(
+        model_name: str, schema: type[BaseModel], prompt: str, case_txt: str
+    ) -> str:
+        return _sha256(
+            "\0".join([model_name, schema_hash(schema), prompt, _sha256(case_txt)])
+        )
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _load_index(self) -> None:
+        entries: list[tuple[float, str, int]] = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                entries.append(
+                    (stat.st_mtime, name.removesuffix(".json"), stat.st_size)
+                )
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._size += size
+
+    def _read(self, key: str, schema: type[ModelT]) -> ModelT | None:
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                value = schema.model_validate_json(file.read())
+        except FileNotFoundError:
+            return None
+        except ValidationError:
+            # A truncated or otherwise unreadable entry is treated as a miss.
+            self._remove(key)
+            return None
+        with self._lock:
+            if key not in self._entries:
+                # Written by another process since this index was loaded.
+                self._entries[key] = os.path.getsize(path)
+                self._size += self._entries[key]
+            self._entries.move_to_end(key)
+            self.hits += 1
+        with suppress(FileNotFoundError):
+            os.utime(path)
+        return value
+
+    def _remove(self, key: str) -> None:
+        with self._lock:
+            self._size -= self._entries.pop(key, 0)
+        with suppress(FileNotFoundError):
+            os.remove(self._path(key))
+
+    def _write(self, key: str, value: BaseModel) -> None:
+        path = self._path(key)
+        data = value.model_dump_json(exclude_computed_fields=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, "w") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except OSError as exc:
+            # Losing a cache entry only costs a repeated call later.
+            print(f"Failed to write response cache entry {key}: {exc}")
+            return
+
+        evicted: list[str] = []
+        with self._lock:
+            self._size -= self._entries.pop(key, 0)
+            self._entries[key] = len(data.encode())
+            self._size += self._entries[key]
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._size -= old_size
+                self.evictions += 1
+                evicted.append(old_key)
+        for old_key in evicted:
+            with suppress(FileNotFoundError):
+                os.remove(self._path(old_key))
+
+    def get_or_compute(
+        self, key: str, schema: type[ModelT], compute: Callable[[], ModelT]
+    ) -> ModelT:
+        cached = self._read(key, schema)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+
+        try:
+            # The previous leader may have written the entry between the read
+            # above and this claim.
+            value = self._read(key, schema)
+            if value is None:
+                with self._lock:
+                    self.misses += 1
+                value = compute()
+                self._write(key, value)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    async def aget_or_compute(
+        self, key: str, schema: type[ModelT], compute: Callable[[], Awaitable[ModelT]]
+    ) -> ModelT:
+        cached = self._read(key, schema)
+        if cached is not None:
+            return cached
+
+        future = self._ainflight.get(key)
+        if future is not None:
+            with self._lock:
+                self.shared += 1
+            return await asyncio.shield(future)
+
+        future = self._ainflight[key] = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self.misses += 1
+        try:
+            value = await compute()
+            self._write(key, value)
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Mark the exception as retrieved when nobody else was waiting.
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._ainflight[key]
+
+    def summary(self) -> str:
+        return (
+            f"Response cache: hits={self.hits}, misses={self.misses}, shared={self.shared}, "
+            f"evictions={self.evictions}, entries={len(self._entries)}, bytes={self._size}"
+        )
+
+
+_cache_lock = threading.Lock()
+_response_cache: ResponseCache | None = None
+
+
+def get_response_cache() -> ResponseCache | None:
+    """Return the process-wide cache, or None when ``EXTRACT_CACHE_DIR`` is empty."""
+    global _response_cache
+    if not EXTRACT_CACHE_DIR:
+        return None
+    with _cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(EXTRACT_CACHE_DIR, EXTRACT_CACHE_MAX_BYTES)
+        return _response_cache
@@ -1,11 +1,10 @@
 import re
 
-from bs4 import BeautifulSoup
-
 from utils.htmlToText import html_to_text_with_tables
 
 
-def build_case_text(judgement_doc: dict) -> tuple[str, str]:
+def judgement_html(judgement_doc: dict) -> tuple[list[str], str]:
+    """The HTML fields that make up a judgement's case text, and its type."""
     has_appeal = bool(judgement_doc.get("appeal"))
     has_corrigendum = bool(judgement_doc.get("corrigendum"))
 
@@ -15,21 +14,24 @@ def build_case_text(judgement_doc: dict) -> tuple[str, str]:
     elif has_corrigendum:
         judgement_type = "corrigendum"
 
-    case_txt = ""
+    html_fields = []
     if judgement_doc.get("html"):
-        case_html = BeautifulSoup(judgement_doc["html"], "html.parser")
-        case_txt += html_to_text_with_tables(case_html)
+        html_fields.append(judgement_doc["html"])
 
     if has_appeal and judgement_doc.get("appeal_html"):
-        appeal_html = BeautifulSoup(judgement_doc["appeal_html"], "html.parser")
-        case_txt += html_to_text_with_tables(appeal_html)
+        html_fields.append(judgement_doc["appeal_html"])
 
     if has_corrigendum and judgement_doc.get("corrigendum_html"):
-        corrigendum_html = BeautifulSoup(
-            judgement_doc["corrigendum_html"], "html.parser"
-        )
-        case_txt += html_to_text_with_tables(corrigendum_html)
+        html_fields.append(judgement_doc["corrigendum_html"])
+
+    return html_fields, judgement_type
 
-    case_txt = re.sub(r"\n\s*\n", "\n\n", case_txt).strip()
 
-    return case_txt, judgement_type
+def normalise_case_text(case_txt: str) -> str:
+    return re.sub(r"\n\s*\n", "\n\n", case_txt).strip()
+
+
+def build_case_text(judgement_doc: dict) -> tuple[str, str]:
+    html_fields, judgement_type = judgement_html(judgement_doc)
+    case_txt = "".join(html_to_text_with_tables(html) for html in html_fields)
+    return normalise_case_text(case_txt), judgement_type
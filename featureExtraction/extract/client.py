@@ -1,18 +1,164 @@
 import os
+import threading
 
+import httpx
 from langfuse import Langfuse
 from langfuse.openai import openai
 
-from db import DB
+from db import DB, AsyncDB
+
+from .config import (
+    EXTRACT_CIRCUIT_COOLDOWN_SECONDS,
+    EXTRACT_CIRCUIT_FAILURES,
+    EXTRACT_CONCURRENCY,
+    EXTRACT_LLM_MAX_IN_FLIGHT,
+)
+from .governor import Governor
+from .timing import RUN_PROFILE, install_mongo_monitoring
+
+KEEPALIVE_EXPIRY_SECONDS = 60.0
 
 
 def create_db() -> DB:
+    install_mongo_monitoring()
     return DB()
 
 
+def create_async_db() -> AsyncDB:
+    install_mongo_monitoring()
+    return AsyncDB()
+
+
 def create_langfuse() -> Langfuse:
     return Langfuse()
 
 
-def create_openai_client() -> openai.OpenAI:
-    return openai.OpenAI(base_url=os.getenv("OPENAI_BASE_URL"))
+def _pool_limits(pool_size: int) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+    )
+
+
+def create_governor() -> Governor:
+    return Governor(
+        max_in_flight=EXTRACT_LLM_MAX_IN_FLIGHT,
+        initial_in_flight=EXTRACT_CONCURRENCY,
+        failure_threshold=EXTRACT_CIRCUIT_FAILURES,
+        cooldown_seconds=EXTRACT_CIRCUIT_COOLDOWN_SECONDS,
+    )
+
+
+def create_openai_client(
+    pool_size: int | None = None, governor: Governor | None = None
+) -> openai.OpenAI:
+    http_client = None
+    if pool_size is not None or governor is not None:
+        http_client = openai.DefaultHttpxClient(
+            limits=_pool_limits(pool_size or EXTRACT_LLM_MAX_IN_FLIGHT),
+            event_hooks=(
+                {"response": [governor.observe_response]} if governor else None
+            ),
+        )
+    # Retries are handled by the extraction's own retry policy.
+    return openai.OpenAI(
+        base_url=os.getenv("OPENAI_BASE_URL"), http_client=http_client, max_retries=0
+    )
+
+
+def create_async_openai_client(
+    pool_size: int | None = None, governor: Governor | None = None
+) -> openai.AsyncOpenAI:
+    http_client = None
+    if pool_size is not None or governor is not None:
+        http_client = openai.DefaultAsyncHttpxClient(
+            limits=_pool_limits(pool_size or EXTRACT_LLM_MAX_IN_FLIGHT),
+            event_hooks=(
+                {"response": [governor.aobserve_response]} if governor else None
+            ),
+        )
+    return openai.AsyncOpenAI(
+        base_url=os.getenv("OPENAI_BASE_URL"), http_client=http_client, max_retries=0
+    )
+
+
+# Process-wide clients shared by every worker. The OpenAI clients keep one
+# keep-alive connection pool sized to the LLM in-flight limit and report every
+# response to the shared governor, and Langfuse keeps a single background
+# exporter; both are closed by close_clients().
+_registry_lock = threading.Lock()
+_governor: Governor | None = None
+_openai_client: openai.OpenAI | None = None
+_async_openai_client: openai.AsyncOpenAI | None = None
+_langfuse: Langfuse | None = None
+
+
+def _get_governor_locked() -> Governor:
+    global _governor
+    if _governor is None:
+        _governor = create_governor()
+    return _governor
+
+
+def get_governor() -> Governor:
+    with _registry_lock:
+        return _get_governor_locked()
+
+
+def get_openai_client() -> openai.OpenAI:
+    global _openai_client
+    with _registry_lock:
+        if _openai_client is None:
+            _openai_client = create_openai_client(
+                pool_size=EXTRACT_LLM_MAX_IN_FLIGHT, governor=_get_governor_locked()
+            )
+        return _openai_client
+
+
+def get_async_openai_client() -> openai.AsyncOpenAI:
+    global _async_openai_client
+    with _registry_lock:
+        if _async_openai_client is None:
+            _async_openai_client = create_async_openai_client(
+                pool_size=EXTRACT_LLM_MAX_IN_FLIGHT, governor=_get_governor_locked()
+            )
+        return _async_openai_client
+
+
+def get_langfuse() -> Langfuse:
+    global _langfuse
+    with _registry_lock:
+        if _langfuse is None:
+            _langfuse = create_langfuse()
+        return _langfuse
+
+
+def _take_clients() -> tuple[
+    openai.OpenAI | None, openai.AsyncOpenAI | None, Langfuse | None
+]:
+    global _openai_client, _async_openai_client, _langfuse
+    with _registry_lock:
+        clients = (_openai_client, _async_openai_client, _langfuse)
+        _openai_client = _async_openai_client = _langfuse = None
+        return clients
+
+
+def close_clients() -> None:
+    openai_client, _, langfuse = _take_clients()
+    if openai_client is not None:
+        openai_client.close()
+    if langfuse is not None:
+        with RUN_PROFILE.time("langfuse.flush"):
+            langfuse.shutdown()
+
+
+async def aclose_clients() -> None:
+    openai_client, async_openai_client, langfuse = _take_clients()
+    if openai_client is not None:
+        openai_client.close()
+    if async_openai_client is not None:
+        await async_openai_client.close()
+    if langfuse is not None:
+        with RUN_PROFILE.time("langfuse.flush"):
+            langfuse.shutdown()
@@ -0,0 +1,129 @@
+import re
+import threading
+
+from .config import EXTRACT_COMPACT_CASE_TEXT
+from .timing import RUN_PROFILE, percentile
+
+# Rough planning figure: ~4 characters per token for English text.
+CHARS_PER_TOKEN = 4
+# A run of at least this many consecutive short lines seen earlier in the case
+# text is header or footer boilerplate, e.g. the court and case-number block
+# repeated at the top of a corrigendum or of the judgement under appeal.
+BOILERPLATE_BLOCK_LINES = 3
+BOILERPLATE_LINE_CHARS = 80
+
+_RE_SPACES = re.compile(r"[^\S\n]+")
+_RE_BLANK_LINES = re.compile(r"\n{3,}")
+# Decorative rules such as the "________" lines around the judgement heading.
+_RE_RULE = re.compile(r"^[_=~*\-]{3,}$")
+_RE_DELIMITER = re.compile(r"^:?-+:?$")
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _is_table_row(line: str) -> bool:
+    return len(line) > 1 and line.startswith("|") and line.endswith("|")
+
+
+def _compact_table_row(line: str) -> str:
+    cells = [_RE_SPACES.sub(" ", cell).strip() for cell in line[1:-1].split("|")]
+    if all(_RE_DELIMITER.match(cell) for cell in cells):
+        cells = [re.sub("-+", "---", cell) for cell in cells]
+    return "| " + " | ".join(cells) + " |"
+
+
+def _repeated_block_lines(lines: list[str]) -> set[int]:
+    """Indices of lines in a block of short lines that already appeared."""
+    content = [index for index, line in enumerate(lines) if line]
+    seen: dict[tuple[str, ...], int] = {}
+    repeated: set[int] = set()
+    for start in range(len(content) - BOILERPLATE_BLOCK_LINES + 1):
+        indices = content[start : start + BOILERPLATE_BLOCK_LINES]
+        block = tuple(lines[index] for index in indices)
+        if any(
+            len(line) > BOILERPLATE_LINE_CHARS or _is_table_row(line) for line in block
+        ):
+            continue
+        first = seen.setdefault(block, start)
+        if first + BOILERPLATE_BLOCK_LINES <= start:
+            repeated.update(indices)
+    return repeated
+
+
+def compact_case_text(case_txt: str) -> str:
+    """Strip what costs tokens but carries nothing for the extraction.
+
+    Table padding and runs of spaces are collapsed, decorative rules are
+    dropped, and a repeated block of header or footer lines is kept only
+    where it first appears.
+    """
+    lines = []
+    for line in case_txt.split("\n"):
+        line = line.strip()
+        if _is_table_row(line):
+            lines.append(_compact_table_row(line))
+        elif not _RE_RULE.match(line):
+            lines.append(_RE_SPACES.sub(" ", line))
+
+    repeated = _repeated_block_lines(lines)
+    compacted = "\n".join(
+        line for index, line in enumerate(lines) if index not in repeated
+    )
+    return _RE_BLANK_LINES.sub("\n\n", compacted).strip()
+
+
+class CompactionMeter:
+    """Compact case text when enabled and track the tokens it saves."""
+
+    def __init__(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self._saved: list[int] = []
+        self._tokens_before = 0
+        self._tokens_after = 0
+        self._lock = threading.Lock()
+
+    def apply(self, case_txt: str) -> str:
+        if not self.enabled:
+            return case_txt
+        with RUN_PROFILE.time("compact"):
+            compacted = compact_case_text(case_txt)
+        before, after = estimate_tokens(case_txt), estimate_tokens(compacted)
+        with self._lock:
+            self._saved.append(before - after)
+            self._tokens_before += before
+            self._tokens_after += after
+        return compacted
+
+    def apply_to_schemas(self, schema_case_texts: dict[str, str]) -> dict[str, str]:
+        """Compact per-schema case texts; only the full case text is metered."""
+        if not self.enabled:
+            return schema_case_texts
+        return {
+            schema_name: compact_case_text(case_txt)
+            for schema_name, case_txt in schema_case_texts.items()
+        }
+
+    def apply_to_chunks(self, chunks: list[str]) -> list[str]:
+        """Compact the chunks of a long judgement; they aren't metered either."""
+        if not self.enabled:
+            return chunks
+        return [compact_case_text(chunk) for chunk in chunks]
+
+    def summary(self) -> str:
+        with self._lock:
+            saved = list(self._saved)
+            before, after = self._tokens_before, self._tokens_after
+        if not saved:
+            return "Case-text compaction: no judgements compacted"
+        share = (before - after) / before if before else 0.0
+        return (
+            f"Case-text compaction: judgements={len(saved)}, "
+            f"estimated tokens {before} -> {after} ({share:.0%} saved per schema call), "
+            f"saved per judgement p50={percentile(saved, 50):.0f} "
+            f"p95={percentile(saved, 95):.0f} max={max(saved)}"
+        )
+
+
+RUN_COMPACTION = CompactionMeter(EXTRACT_COMPACT_CASE_TEXT == "on")
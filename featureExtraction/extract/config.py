@@ -21,11 +21,128 @@ def _get_int_at_least(name: str, default: int, minimum: int) -> int:
     return max(value, minimum)
 
 
+def _get_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value is None:
+        return default
+
+    try:
+        return float(value)
+    except ValueError as exc:
+        raise ValueError(f"{name} must be a number, got {value!r}.") from exc
+
+
+def _get_choice(name: str, default: str, choices: tuple[str, ...]) -> str:
+    value = os.getenv(name, default)
+    if value not in choices:
+        raise ValueError(f"{name} must be one of {', '.join(choices)}, got {value!r}.")
+    return value
+
+
 RERUN_ALL = False
 MAX_RETRIES = _get_int_at_least("MAX_RETRIES", 5, 1)
 MODEL = os.getenv("MODEL", "gpt-5-mini")
+# Retries after a schema validation failure that resend only the failed output
+# and the errors instead of the whole case text.
+EXTRACT_REPAIR_RETRIES = _get_int_at_least("EXTRACT_REPAIR_RETRIES", 1, 0)
+# MAX_RETRIES bounds attempts after invalid outputs; network failures, rate
+# limits and refusals each have their own retry allowance.
+EXTRACT_TRANSPORT_RETRIES = _get_int_at_least("EXTRACT_TRANSPORT_RETRIES", 5, 0)
+EXTRACT_RATE_LIMIT_RETRIES = _get_int_at_least("EXTRACT_RATE_LIMIT_RETRIES", 8, 0)
+EXTRACT_REFUSAL_RETRIES = _get_int_at_least("EXTRACT_REFUSAL_RETRIES", 1, 0)
+EXTRACT_RETRY_BASE_SECONDS = _get_int_at_least("EXTRACT_RETRY_BASE_SECONDS", 1, 0)
+EXTRACT_RETRY_MAX_SECONDS = _get_int_at_least("EXTRACT_RETRY_MAX_SECONDS", 60, 0)
+EXTRACT_CALL_TIMEOUT_SECONDS = _get_int_at_least("EXTRACT_CALL_TIMEOUT_SECONDS", 300, 1)
+EXTRACT_JUDGEMENT_DEADLINE_SECONDS = _get_int_at_least(
+    "EXTRACT_JUDGEMENT_DEADLINE_SECONDS", 1800, 0
+)
 EXTRACT_LIMIT = _get_int_at_least("EXTRACT_LIMIT", 0, 0)
 EXTRACT_CONCURRENCY = _get_int_at_least("EXTRACT_CONCURRENCY", 1, 1)
+EXTRACT_QUEUE_SIZE = _get_int_at_least("EXTRACT_QUEUE_SIZE", EXTRACT_CONCURRENCY, 0)
+EXTRACT_MAX_INFLIGHT_BYTES = _get_int_at_least(
+    "EXTRACT_MAX_INFLIGHT_BYTES", 512 * 1024 * 1024, 1
+)
+EXTRACT_LLM_MAX_IN_FLIGHT = _get_int_at_least(
+    "EXTRACT_LLM_MAX_IN_FLIGHT", EXTRACT_CONCURRENCY * 2, 1
+)
+# Processes converting judgement HTML to case text ahead of the LLM workers
+# (0 = render inside the workers), and how many rendered judgements may wait.
+EXTRACT_RENDER_PROCESSES = _get_int_at_least("EXTRACT_RENDER_PROCESSES", 0, 0)
+EXTRACT_RENDER_QUEUE_SIZE = _get_int_at_least(
+    "EXTRACT_RENDER_QUEUE_SIZE", EXTRACT_CONCURRENCY, 0
+)
+EXTRACT_CIRCUIT_FAILURES = _get_int_at_least("EXTRACT_CIRCUIT_FAILURES", 5, 1)
+EXTRACT_CIRCUIT_COOLDOWN_SECONDS = _get_int_at_least(
+    "EXTRACT_CIRCUIT_COOLDOWN_SECONDS", 30, 1
+)
+EXTRACT_WRITE_BATCH_SIZE = _get_int_at_least("EXTRACT_WRITE_BATCH_SIZE", 50, 1)
+EXTRACT_WRITE_FLUSH_SECONDS = _get_int_at_least("EXTRACT_WRITE_FLUSH_SECONDS", 10, 1)
+EXTRACT_SPILL_DIR = os.getenv("EXTRACT_SPILL_DIR", "extract-spill")
+EXTRACT_LEASE_SECONDS = _get_int_at_least("EXTRACT_LEASE_SECONDS", 900, 30)
+EXTRACT_LEASE_MAX_ATTEMPTS = _get_int_at_least("EXTRACT_LEASE_MAX_ATTEMPTS", 3, 1)
+EXTRACT_LEASE_RETRY_SECONDS = _get_int_at_least("EXTRACT_LEASE_RETRY_SECONDS", 300, 0)
+EXTRACT_CACHE_DIR = os.getenv("EXTRACT_CACHE_DIR", "")
+EXTRACT_CACHE_MAX_BYTES = _get_int_at_least(
+    "EXTRACT_CACHE_MAX_BYTES", 1024 * 1024 * 1024, 1
+)
+EXTRACT_BATCH_POLL_SECONDS = _get_int_at_least("EXTRACT_BATCH_POLL_SECONDS", 30, 1)
+EXTRACT_BATCH_MAX_REQUESTS = _get_int_at_least("EXTRACT_BATCH_MAX_REQUESTS", 50000, 1)
+# Case texts, request files and submitted batch IDs of an unfinished batch run.
+EXTRACT_BATCH_DIR = os.getenv("EXTRACT_BATCH_DIR", "extract-batches")
+# Hedge LLM calls that run past this percentile of recent latencies (0 = off),
+# for at most EXTRACT_HEDGE_BUDGET_PERCENT of all calls.
+EXTRACT_HEDGE_PERCENTILE = min(_get_int_at_least("EXTRACT_HEDGE_PERCENTILE", 0, 0), 99)
+EXTRACT_HEDGE_BUDGET_PERCENT = _get_int_at_least("EXTRACT_HEDGE_BUDGET_PERCENT", 5, 0)
+# "schema-first" sends each schema's instructions before the case text;
+# "case-first" sends the case text first so repeated calls with the same schema
+# (retries, fanned-out items) share the same long prompt prefix.
+EXTRACT_PROMPT_LAYOUT = _get_choice(
+    "EXTRACT_PROMPT_LAYOUT", "schema-first", ("schema-first", "case-first")
+)
+# "on" strips table padding, extra whitespace and repeated header boilerplate
+# from the case text before it is sent with every schema call.
+EXTRACT_COMPACT_CASE_TEXT = _get_choice(
+    "EXTRACT_COMPACT_CASE_TEXT", "off", ("off", "on")
+)
+# "on" sends each schema only the judgement sections it needs (see
+# extract/sections.py) instead of the full case text.
+EXTRACT_SECTION_CONTEXT = _get_choice("EXTRACT_SECTION_CONTEXT", "off", ("off", "on"))
+# Judgements estimated above this many case-text tokens (0 = never) are split
+# along section boundaries into chunks of about EXTRACT_CHUNK_TOKENS, extracted
+# chunk by chunk and merged (see extract/merge.py). Off until the merged
+# outputs have been compared with full-text extraction (e.g. 60000).
+EXTRACT_CHUNK_THRESHOLD_TOKENS = _get_int_at_least(
+    "EXTRACT_CHUNK_THRESHOLD_TOKENS", 0, 0
+)
+EXTRACT_CHUNK_TOKENS = _get_int_at_least("EXTRACT_CHUNK_TOKENS", 25000, 1000)
+# Judgements with at least this many defendants (or charge to defendant pairs)
+# have each defendant profile (or trial) extracted in a call of its own
+# (0 = never). Every such call sends the whole case text.
+EXTRACT_FANOUT_MIN_ITEMS = _get_int_at_least("EXTRACT_FANOUT_MIN_ITEMS", 0, 0)
+# Per-stage latency reports written at the end of a run (empty to skip one).
+EXTRACT_PROFILE_JSON = os.getenv("EXTRACT_PROFILE_JSON", "extract-profile.json")
+EXTRACT_PROFILE_PROM = os.getenv("EXTRACT_PROFILE_PROM", "extract-profile.prom")
+EXTRACT_DASHBOARD_SECONDS = _get_int_at_least("EXTRACT_DASHBOARD_SECONDS", 2, 1)
+# Used by --dry-run to project the cost and duration of the pending set.
+EXTRACT_ESTIMATE_CACHE_PATH = os.getenv(
+    "EXTRACT_ESTIMATE_CACHE_PATH", "extract-estimates.json"
+)
+# Output tokens of a call per output token in the example outputs, for the
+# reasoning they don't show; only used until extractions with usage exist.
+EXTRACT_ESTIMATE_REASONING_MULTIPLIER = max(
+    _get_float("EXTRACT_ESTIMATE_REASONING_MULTIPLIER", 2.0), 1.0
+)
+EXTRACT_PRICE_INPUT_PER_MTOK = _get_float("EXTRACT_PRICE_INPUT_PER_MTOK", 0.25)
+EXTRACT_PRICE_CACHED_INPUT_PER_MTOK = _get_float(
+    "EXTRACT_PRICE_CACHED_INPUT_PER_MTOK", 0.025
+)
+EXTRACT_PRICE_OUTPUT_PER_MTOK = _get_float("EXTRACT_PRICE_OUTPUT_PER_MTOK", 2.0)
+# Input plus output tokens, and cost at the prices above, after which a run
+# stops starting new judgements (0 = no limit).
+EXTRACT_BUDGET_TOKENS = _get_int_at_least("EXTRACT_BUDGET_TOKENS", 0, 0)
+EXTRACT_BUDGET_USD = max(_get_float("EXTRACT_BUDGET_USD", 0.0), 0.0)
+EXTRACT_TPM_LIMIT = _get_int_at_least("EXTRACT_TPM_LIMIT", 0, 0)
+EXTRACT_RPM_LIMIT = _get_int_at_least("EXTRACT_RPM_LIMIT", 0, 0)
 MUST_INCLUDE_TRIALS: list[str] = [
     "[2021] HKDC 1500",
     "[2025] HKCFI 4288",
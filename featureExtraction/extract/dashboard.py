@@ -0,0 +1,189 @@
+import sys
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+
+from tqdm import tqdm
+
+from .cache import get_response_cache
+from .client import get_governor
+from .fanout import ITEM_SCHEMAS
+from .prompts import EXTRACTION_ORDER
+from .retry import RUN_ERRORS
+from .timing import RUN_PROFILE, percentile
+from .usage import RUN_USAGE
+
+# Throughput and latency describe the last minute or so of the run, not
+# the whole of it.
+RATE_WINDOW_SECONDS = 60
+LATENCY_SAMPLES = 200
+STATUS_LINES = 5
+
+
+def _format_count(value: float) -> str:
+    for threshold, suffix in ((1e9, "G"), (1e6, "M"), (1e3, "k")):
+        if abs(value) >= threshold:
+            return f"{value / threshold:.1f}{suffix}"
+    return f"{value:.0f}"
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m {seconds % 60:02d}s"
+
+
+def _format_latency(stage: str) -> str:
+    values = RUN_PROFILE.recent(stage, LATENCY_SAMPLES)
+    if not values:
+        return "-"
+    return f"{percentile(values, 50):.1f}/{percentile(values, 95):.1f}s"
+
+
+class Dashboard:
+    """Live status lines shown under the judgement progress bar.
+
+    Workers only bump a few counters; everything else is read from the
+    run-wide meters by a background thread every ``refresh_seconds``. The ETA
+    is based on the HTML size still to be processed rather than the number
+    of judgements, since a long judgement costs many times a short one. When
+    the pending judgements are not known up front (``--stream``, ``--lease``),
+    the remaining size is extrapolated from the judgements seen so far.
+    """
+
+    def __init__(
+        self, total_docs: int, total_bytes: int | None, refresh_seconds: float
+    ) -> None:
+        self.total_docs = total_docs
+        self.total_bytes = total_bytes
+        self.refresh_seconds = refresh_seconds
+        self.submitted = 0
+        self.started = 0
+        self.finished = 0
+        self.finished_bytes = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lines: list[tqdm] = []
+        self._samples: deque[tuple[float, int, int, int, int]] = deque(
+            maxlen=max(2, int(RATE_WINDOW_SECONDS / refresh_seconds) + 1)
+        )
+
+    def submit(self) -> None:
+        with self._lock:
+            self.submitted += 1
+
+    def track(self, docs: Iterable[dict]) -> Iterator[dict]:
+        """Count judgements as they are handed to the workers."""
+        for judgement_doc in docs:
+            self.submit()
+            yield judgement_doc
+
+    def start(self) -> None:
+        with self._lock:
+            self.started += 1
+
+    def finish(self, size: int) -> None:
+        with self._lock:
+            self.finished += 1
+            self.finished_bytes += size
+
+    def _remaining_bytes(self, finished: int, finished_bytes: int) -> float | None:
+        if self.total_bytes is not None:
+            return max(0, self.total_bytes - finished_bytes)
+        if not finished:
+            return None
+        return finished_bytes / finished * max(0, self.total_docs - finished)
+
+    def render(self) -> list[str]:
+        now = time.monotonic()
+        with self._lock:
+            submitted, started = self.submitted, self.started
+            finished, finished_bytes = self.finished, self.finished_bytes
+        usage = RUN_USAGE.total()
+        self._samples.append(
+            (now, finished, finished_bytes, usage.input_tokens, usage.output_tokens)
+        )
+        first, last = self._samples[0], self._samples[-1]
+        elapsed = last[0] - first[0]
+        per_minute = [
+            (last[index] - first[index]) / elapsed * 60 if elapsed else 0.0
+            for index in range(1, 5)
+        ]
+        docs_rate, bytes_rate, input_rate, output_rate = per_minute
+
+        remaining = self._remaining_bytes(finished, finished_bytes)
+        if remaining is None or not bytes_rate:
+            eta = "ETA -"
+        else:
+            eta = (
+                f"ETA {_format_duration(remaining / bytes_rate * 60)} "
+                f"({_format_count(remaining)}B left)"
+            )
+
+        governor = get_governor()
+        cache = get_response_cache()
+        cache_status = (
+            f"cache hits {cache.hits}/{cache.hits + cache.misses}"
+            if cache is not None
+            else "cache off"
+        )
+        errors = RUN_ERRORS.snapshot()
+        error_status = (
+            ", ".join(
+                f"{kind} {failed} ({retried} retried)"
+                for kind, (failed, retried) in sorted(errors.items())
+            )
+            if errors
+            else "none"
+        )
+        # Calls for one fanned-out defendant or trial are shown once there are any.
+        llm_latency = ", ".join(
+            f"{schema_name} {_format_latency(f'llm.{schema_name}')}"
+            for schema_name in (*EXTRACTION_ORDER, *ITEM_SCHEMAS.values())
+            if schema_name in EXTRACTION_ORDER
+            or RUN_PROFILE.recent(f"llm.{schema_name}", 1)
+        )
+        return [
+            f"Throughput: {docs_rate:.1f} judgements/min, "
+            f"{_format_count(bytes_rate)}B/min | {finished}/{self.total_docs} done | {eta}",
+            f"Latency p50/p95: judgement {_format_latency('judgement')} | "
+            f"LLM {llm_latency}",
+            f"Tokens: in {_format_count(usage.input_tokens)} "
+            f"({usage.cached_share:.0%} cached), out {_format_count(usage.output_tokens)} | "
+            f"{_format_count(input_rate)} in/min, {_format_count(output_rate)} out/min",
+            f"Calls: {governor.in_flight} in flight (limit {governor.limit:.0f}), "
+            f"{usage.calls} done | queued judgements {submitted - started}, "
+            f"running {started - finished} | {cache_status}",
+            f"Errors: {error_status}",
+        ]
+
+    def _refresh(self) -> None:
+        for bar, line in zip(self._lines, self.render()):
+            bar.set_description_str(line)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_seconds):
+            self._refresh()
+
+    def __enter__(self) -> "Dashboard":
+        self._lines = [
+            tqdm(bar_format="{desc}", position=index + 1, file=sys.stdout)
+            for index in range(STATUS_LINES)
+        ]
+        self._refresh()
+        self._thread = threading.Thread(
+            target=self._run, name="extract-dashboard", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._refresh()
+        for bar in self._lines:
+            bar.close()
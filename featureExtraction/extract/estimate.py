@@ -0,0 +1,425 @@
+import glob
+import hashlib
+import inspect
+import json
+import os
+import sys
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from pymongo.collection import Collection
+from tabulate import tabulate
+from tqdm import tqdm
+
+from utils import htmlToText
+
+from . import case_text, compact, sections
+from .client import create_db
+from .compact import CHARS_PER_TOKEN, compact_case_text, estimate_tokens
+from .config import (
+    EXTRACT_CHUNK_THRESHOLD_TOKENS,
+    EXTRACT_CHUNK_TOKENS,
+    EXTRACT_COMPACT_CASE_TEXT,
+    EXTRACT_CONCURRENCY,
+    EXTRACT_ESTIMATE_CACHE_PATH,
+    EXTRACT_ESTIMATE_REASONING_MULTIPLIER,
+    EXTRACT_FANOUT_MIN_ITEMS,
+    EXTRACT_LIMIT,
+    EXTRACT_LLM_MAX_IN_FLIGHT,
+    EXTRACT_RPM_LIMIT,
+    EXTRACT_SECTION_CONTEXT,
+    EXTRACT_TPM_LIMIT,
+    MODEL,
+)
+from .pipeline import EXTRACTION_STAGES, schema_case_parts
+from .preprocess import create_process_pool
+from .prompts import EXTRACTION_ORDER, SCHEMA_CONFIGS
+from .runner import JUDGEMENT_PROJECTION, build_docs_filters
+from .sections import build_case_texts
+from .text_format import text_format
+from .usage import cost_usd
+
+# Rough planning figures: a call takes a fixed overhead plus time
+# proportional to its output.
+CALL_OVERHEAD_SECONDS = 2.0
+OUTPUT_TOKENS_PER_SECOND = 50.0
+# Output (excluding reasoning) assumed per schema when there are no example
+# outputs for the configured model.
+DEFAULT_OUTPUT_TOKENS = {"judgement": 3000, "defendants": 2000, "trials": 4000}
+FETCH_BATCH_SIZE = 100
+# Most recent extractions whose recorded usage sets the output per schema.
+RECORDED_USAGE_SAMPLE = 1000
+
+HTML_BYTES_EXPRESSION = {
+    "$add": [
+        {"$strLenBytes": {"$ifNull": [f"${field}", ""]}}
+        for field in ("html", "appeal_html", "corrigendum_html")
+    ]
+}
+
+
+def _estimator_version() -> str:
+    # Cached case-text sizes are only valid for the code that produced them.
+    source = (
+        inspect.getsource(case_text)
+        + inspect.getsource(htmlToText)
+        + inspect.getsource(compact)
+        + inspect.getsource(sections)
+    )
+    settings = (
+        f"{CHARS_PER_TOKEN}\0{EXTRACT_COMPACT_CASE_TEXT}\0{EXTRACT_SECTION_CONTEXT}"
+        f"\0{EXTRACT_CHUNK_THRESHOLD_TOKENS}\0{EXTRACT_CHUNK_TOKENS}"
+    )
+    return hashlib.sha256(f"{settings}\0{source}".encode()).hexdigest()[:16]
+
+
+@dataclass(frozen=True)
+class DocEstimate:
+    html_bytes: int
+    case_tokens: int
+    judgement_type: str
+    # Case-text tokens before EXTRACT_COMPACT_CASE_TEXT compaction.
+    full_case_tokens: int
+    # Case-text tokens of schemas sent only some sections (EXTRACT_SECTION_CONTEXT).
+    schema_case_tokens: dict[str, int]
+    # Tokens of each chunk, with its note, when the judgement is extracted in
+    # chunks; every schema then makes one call per chunk.
+    chunk_tokens: list[int]
+
+    @property
+    def calls_per_schema(self) -> int:
+        return max(len(self.chunk_tokens), 1)
+
+    def schema_input_tokens(self, schema_name: str) -> int:
+        if self.chunk_tokens:
+            return sum(self.chunk_tokens)
+        return self.schema_case_tokens.get(schema_name, self.case_tokens)
+
+
+def _estimate_doc(
+    judgement_doc: dict,
+) -> tuple[str, str, int, int, dict[str, int], list[int]]:
+    case_txt, judgement_type, schema_case_texts, chunks = build_case_texts(
+        judgement_doc
+    )
+    full_case_tokens = estimate_tokens(case_txt)
+    if EXTRACT_COMPACT_CASE_TEXT == "on":
+        case_txt = compact_case_text(case_txt)
+        schema_case_texts = {
+            schema_name: compact_case_text(schema_case_txt)
+            for schema_name, schema_case_txt in schema_case_texts.items()
+        }
+        chunks = [compact_case_text(chunk) for chunk in chunks]
+    # The note is the same for every schema.
+    case_parts = schema_case_parts(EXTRACTION_ORDER[0], case_txt, {}, chunks)
+    return (
+        str(judgement_doc["_id"]),
+        judgement_type,
+        estimate_tokens(case_txt),
+        full_case_tokens,
+        {
+            schema_name: estimate_tokens(schema_case_txt)
+            for schema_name, schema_case_txt in schema_case_texts.items()
+        },
+        [estimate_tokens(case_part) for case_part in case_parts] if chunks else [],
+    )
+
+
+class EstimateCache:
+    """Per-judgement case-text sizes, reused while the judgement's HTML is unchanged."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.version = _estimator_version()
+        self.entries: dict[str, dict[str, Any]] = {}
+        try:
+            with open(path) as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if data.get("version") == self.version:
+            self.entries = data.get("entries", {})
+
+    def get(self, doc_id: str, html_bytes: int) -> DocEstimate | None:
+        entry = self.entries.get(doc_id)
+        if entry is None or entry["html_bytes"] != html_bytes:
+            return None
+        return DocEstimate(**entry)
+
+    def put(self, doc_id: str, estimate: DocEstimate) -> None:
+        self.entries[doc_id] = vars(estimate)
+
+    def save(self) -> None:
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump({"version": self.version, "entries": self.entries}, file)
+        os.replace(temp_path, self.path)
+
+
+def schema_overhead_tokens() -> dict[str, int]:
+    """Tokens every call for a schema sends besides the case text."""
+    return {
+        schema_name: estimate_tokens(config["prompt"])
+        + estimate_tokens(json.dumps(text_format(config["model"])))
+        for schema_name, config in SCHEMA_CONFIGS.items()
+    }
+
+
+def recorded_output_tokens(
+    extracted_features_collection: Collection,
+) -> tuple[dict[str, int], int]:
+    """Average output tokens per judgement for each schema, reasoning and
+    retries included, from the usage recorded on recent extractions with
+    ``MODEL``, and how many extractions that covers."""
+    result = list(
+        extracted_features_collection.aggregate(
+            [
+                {"$match": {"model": MODEL, "usage.total.output_tokens": {"$gt": 0}}},
+                {"$sort": {"_id": -1}},
+                {"$limit": RECORDED_USAGE_SAMPLE},
+                {
+                    "$group": {
+                        "_id": None,
+                        "judgements": {"$sum": 1},
+                        **{
+                            schema_name: {
+                                "$sum": f"$usage.by_schema.{schema_name}.output_tokens"
+                            }
+                            for schema_name in EXTRACTION_ORDER
+                        },
+                    }
+                },
+            ]
+        )
+    )
+    if not result:
+        return {}, 0
+    judgements = result[0]["judgements"]
+    return {
+        schema_name: result[0][schema_name] // judgements
+        for schema_name in EXTRACTION_ORDER
+    }, judgements
+
+
+def expected_output_tokens(
+    extracted_features_collection: Collection,
+) -> tuple[dict[str, int], str]:
+    """Output tokens per schema call, and where the figures come from."""
+    output_tokens, judgements = recorded_output_tokens(extracted_features_collection)
+    if judgements:
+        return output_tokens, f"usage recorded on {judgements} extracted judgements"
+
+    # The example outputs show the answer but not the reasoning behind it.
+    output_tokens = dict(DEFAULT_OUTPUT_TOKENS)
+    for schema_name in EXTRACTION_ORDER:
+        paths = glob.glob(f"schema/exampleOutput/{MODEL}/*/{schema_name}.json")
+        if paths:
+            sizes = []
+            for path in paths:
+                with open(path) as file:
+                    sizes.append(estimate_tokens(file.read()))
+            output_tokens[schema_name] = sum(sizes) // len(sizes)
+    return {
+        schema_name: int(tokens * EXTRACT_ESTIMATE_REASONING_MULTIPLIER)
+        for schema_name, tokens in output_tokens.items()
+    }, (
+        f"example outputs times EXTRACT_ESTIMATE_REASONING_MULTIPLIER="
+        f"{EXTRACT_ESTIMATE_REASONING_MULTIPLIER:g} (no recorded usage yet)"
+    )
+
+
+def _pending_docs(
+    judgements_collection: Collection, extracted_features_collection: Collection
+) -> Iterator[tuple[Any, int]]:
+    priority_filter, normal_filter = build_docs_filters(
+        judgements_collection, extracted_features_collection
+    )
+    projection = {"_id": 1, "html_bytes": HTML_BYTES_EXPRESSION}
+    if priority_filter:
+        for doc in judgements_collection.find(priority_filter, projection):
+            yield doc["_id"], doc["html_bytes"]
+    cursor = judgements_collection.find(normal_filter, projection)
+    if EXTRACT_LIMIT > 0:
+        cursor = cursor.limit(EXTRACT_LIMIT)
+    for doc in cursor:
+        yield doc["_id"], doc["html_bytes"]
+
+
+def _fetch(judgements_collection: Collection, ids: list[Any]) -> Iterator[dict]:
+    for start in range(0, len(ids), FETCH_BATCH_SIZE):
+        yield from judgements_collection.find(
+            {"_id": {"$in": ids[start : start + FETCH_BATCH_SIZE]}},
+            JUDGEMENT_PROJECTION,
+        )
+
+
+def estimate_docs(
+    judgements_collection: Collection,
+    extracted_features_collection: Collection,
+    cache: EstimateCache,
+) -> list[DocEstimate]:
+    estimates: list[DocEstimate] = []
+    missing: dict[str, tuple[Any, int]] = {}
+    for doc_id, html_bytes in _pending_docs(
+        judgements_collection, extracted_features_collection
+    ):
+        cached = cache.get(str(doc_id), html_bytes)
+        if cached is not None:
+            estimates.append(cached)
+        else:
+            missing[str(doc_id)] = (doc_id, html_bytes)
+    print(f"Estimates cached for {len(estimates)} judgements, building {len(missing)}.")
+
+    if missing:
+        ids = [doc_id for doc_id, _ in missing.values()]
+        with create_process_pool(os.cpu_count() or 1) as executor:
+            results = executor.map(
+                _estimate_doc, _fetch(judgements_collection, ids), chunksize=8
+            )
+            for (
+                doc_id,
+                judgement_type,
+                case_tokens,
+                full_case_tokens,
+                schema_case_tokens,
+                chunk_tokens,
+            ) in tqdm(
+                results, total=len(ids), desc="Building case text", file=sys.stdout
+            ):
+                estimate = DocEstimate(
+                    missing[doc_id][1],
+                    case_tokens,
+                    judgement_type,
+                    full_case_tokens,
+                    schema_case_tokens,
+                    chunk_tokens,
+                )
+                cache.put(doc_id, estimate)
+                estimates.append(estimate)
+        cache.save()
+    return estimates
+
+
+def _call_seconds(output_tokens: int) -> float:
+    return CALL_OVERHEAD_SECONDS + output_tokens / OUTPUT_TOKENS_PER_SECOND
+
+
+def _format_duration(seconds: float) -> str:
+    hours, remainder = divmod(int(seconds), 3600)
+    return f"{hours}h {remainder // 60:02d}m"
+
+
+def run() -> None:
+    if EXTRACT_FANOUT_MIN_ITEMS:
+        # How many item calls a judgement makes is only known once its
+        # defendants and charges have been extracted.
+        print(
+            "--dry-run cannot estimate runs with EXTRACT_FANOUT_MIN_ITEMS set; "
+            "unset it to estimate the same judgements without fan-out."
+        )
+        return
+    db = create_db()
+    extracted_features_collection = db.get_extracted_features_collection()
+    cache = EstimateCache(EXTRACT_ESTIMATE_CACHE_PATH)
+    estimates = estimate_docs(
+        db.get_judgements_collection(), extracted_features_collection, cache
+    )
+    if not estimates:
+        print("No pending judgements.")
+        return
+
+    overhead = schema_overhead_tokens()
+    output_tokens, output_source = expected_output_tokens(extracted_features_collection)
+    doc_count = len(estimates)
+    case_tokens = sum(estimate.case_tokens for estimate in estimates)
+    # Calls made for each schema; a chunked judgement makes one per chunk.
+    schema_calls = sum(estimate.calls_per_schema for estimate in estimates)
+
+    rows = []
+    total_input = total_output = 0
+    for schema_name in EXTRACTION_ORDER:
+        schema_input = (
+            sum(estimate.schema_input_tokens(schema_name) for estimate in estimates)
+            + overhead[schema_name] * schema_calls
+        )
+        schema_output = output_tokens[schema_name] * schema_calls
+        total_input += schema_input
+        total_output += schema_output
+        rows.append(
+            [
+                schema_name,
+                f"{overhead[schema_name]:,}",
+                f"{schema_input:,}",
+                f"{schema_output:,}",
+                f"${cost_usd(schema_input, 0, schema_output):,.2f}",
+            ]
+        )
+    rows.append(
+        [
+            "total",
+            "",
+            f"{total_input:,}",
+            f"{total_output:,}",
+            f"${cost_usd(total_input, 0, total_output):,.2f}",
+        ]
+    )
+
+    print(f"Pending judgements: {doc_count} ({case_tokens:,} case-text tokens)")
+    print(f"Output tokens per call from {output_source}.")
+    chunked = [estimate for estimate in estimates if estimate.chunk_tokens]
+    if chunked:
+        print(
+            f"Extracted in chunks: {len(chunked)} judgements, "
+            f"{sum(len(estimate.chunk_tokens) for estimate in chunked)} chunks."
+        )
+    if EXTRACT_COMPACT_CASE_TEXT == "on":
+        full_case_tokens = sum(estimate.full_case_tokens for estimate in estimates)
+        saved = full_case_tokens - case_tokens
+        print(
+            f"Compaction saves {saved:,} of {full_case_tokens:,} case-text tokens "
+            f"({saved / full_case_tokens if full_case_tokens else 0:.0%}) on each schema call."
+        )
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "schema",
+                "overhead/call",
+                "input tokens",
+                "output tokens",
+                "cost",
+            ],
+            tablefmt="github",
+        )
+    )
+
+    # Stages run one after the other; schemas within a stage run in parallel.
+    seconds_per_doc = sum(
+        max(_call_seconds(output_tokens[schema_name]) for schema_name in stage)
+        for stage in EXTRACTION_STAGES
+    )
+    latency_bound = seconds_per_doc * doc_count / EXTRACT_CONCURRENCY
+    call_seconds = sum(_call_seconds(output_tokens[name]) for name in EXTRACTION_ORDER)
+    in_flight_bound = call_seconds * schema_calls / EXTRACT_LLM_MAX_IN_FLIGHT
+    bounds = {
+        "concurrency": latency_bound,
+        "LLM in-flight limit": in_flight_bound,
+    }
+    if EXTRACT_TPM_LIMIT:
+        bounds["token rate limit"] = (
+            (total_input + total_output) / EXTRACT_TPM_LIMIT * 60
+        )
+    if EXTRACT_RPM_LIMIT:
+        bounds["request rate limit"] = (
+            schema_calls * len(EXTRACTION_ORDER) / EXTRACT_RPM_LIMIT * 60
+        )
+    limiting, seconds = max(bounds.items(), key=lambda item: item[1])
+    print(
+        f"Projected wall-clock time: {_format_duration(seconds)} "
+        f"(limited by {limiting}; EXTRACT_CONCURRENCY={EXTRACT_CONCURRENCY})"
+    )
+    print(
+        "Input tokens assume no retries and no prompt caching, and exclude the "
+        "defendant and charge lists added to dependent prompts."
+    )
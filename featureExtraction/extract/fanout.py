@@ -0,0 +1,52 @@
+from typing import Any
+
+from schema import Defendants, Trials
+from schema.defendants import DefendantProfile
+from schema.trials import Trial
+
+from .config import EXTRACT_FANOUT_MIN_ITEMS
+
+# Schemas that can be extracted one item per call, and the schema of an item.
+ITEM_SCHEMAS = {"defendants": "defendant", "trials": "trial"}
+PARENT_SCHEMAS = {item: schema_name for schema_name, item in ITEM_SCHEMAS.items()}
+
+
+def fanout_items(
+    schema_name: str, previous_extractions: dict[str, Any]
+) -> list[dict[str, Any]]:
+    """The prompt context of each item to extract on its own, or an empty list
+    to extract the schema in one call."""
+    if schema_name not in ITEM_SCHEMAS or not EXTRACT_FANOUT_MIN_ITEMS:
+        return []
+    if schema_name == "defendants":
+        items = [
+            {"defendant": defendant} for defendant in previous_extractions["defendants"]
+        ]
+    else:
+        items = [
+            {"charge": charge, "defendant": defendant}
+            for charge in previous_extractions["charge_to_defendants"]
+            for defendant in charge.defendants_of_charge
+        ]
+    return items if len(items) >= EXTRACT_FANOUT_MIN_ITEMS else []
+
+
+def assemble_items(
+    schema_name: str,
+    items: list[dict[str, Any]],
+    extracted: list[DefendantProfile | Trial],
+) -> Defendants | Trials:
+    """Put the items extracted one per call back into their schema.
+
+    Each item keeps the charge number and defendant ID it was asked for,
+    whatever the model answered.
+    """
+    if schema_name == "defendants":
+        for item, profile in zip(items, extracted):
+            profile.defendant_id = item["defendant"].id
+        return Defendants(defendants=extracted)
+
+    for item, trial in zip(items, extracted):
+        trial.charge_type.charge_no = item["charge"].charge_no
+        trial.charge_type.defendant_id = item["defendant"].defendant_id
+    return Trials(trials=extracted)
@@ -0,0 +1,76 @@
+import sys
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Any, Generic, TypeVar
+
+HTML_FIELDS = ("html", "appeal_html", "corrigendum_html")
+
+T = TypeVar("T")
+
+
+def judgement_doc_size(judgement_doc: dict) -> int:
+    return sum(
+        sys.getsizeof(judgement_doc[field])
+        for field in HTML_FIELDS
+        if judgement_doc.get(field)
+    )
+
+
+class BoundedFeed(Generic[T]):
+    """Feed documents from a lazy iterable into an executor.
+
+    At most ``max_pending`` documents are queued or running at once, and their
+    combined HTML size stays under ``max_inflight_bytes``. A single document
+    larger than the byte limit is still processed, but on its own.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        handler: Callable[[Any], T],
+        max_pending: int,
+        max_inflight_bytes: int,
+        size: Callable[[Any], int] = judgement_doc_size,
+    ) -> None:
+        self.executor = executor
+        self.handler = handler
+        self.size = size
+        self.max_pending = max_pending
+        self.max_inflight_bytes = max_inflight_bytes
+        self.inflight_bytes = 0
+        self.peak_inflight_bytes = 0
+        self._pending: dict[Future[T], int] = {}
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _has_room(self, size: int) -> bool:
+        if not self._pending:
+            return True
+        return (
+            len(self._pending) < self.max_pending
+            and self.inflight_bytes + size <= self.max_inflight_bytes
+        )
+
+    def _collect(self) -> Iterator[T]:
+        done, _ = wait(self._pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            self.inflight_bytes -= self._pending.pop(future)
+            yield future.result()
+
+    def results(self, docs: Iterable[Any]) -> Iterator[T]:
+        for judgement_doc in docs:
+            size = self.size(judgement_doc)
+            while not self._has_room(size):
+                yield from self._collect()
+
+            future = self.executor.submit(self.handler, judgement_doc)
+            self._pending[future] = size
+            self.inflight_bytes += size
+            self.peak_inflight_bytes = max(
+                self.peak_inflight_bytes, self.inflight_bytes
+            )
+
+        while self._pending:
+            yield from self._collect()
@@ -0,0 +1,268 @@
+import asyncio
+import re
+import threading
+import time
+from collections.abc import AsyncIterator, Iterator, Mapping
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+import openai
+
+OUTCOME_OK = "ok"
+OUTCOME_RATE_LIMITED = "rate_limited"
+OUTCOME_UNAVAILABLE = "unavailable"
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half-open"
+
+# Stop growing the in-flight limit once less than this share of the
+# provider's request or token budget is left in the current window.
+LOW_REMAINING_FRACTION = 0.1
+# Concurrent failures from one burst should only halve the limit once.
+DECREASE_INTERVAL_SECONDS = 1.0
+MAX_COOLDOWN_SECONDS = 600.0
+ASYNC_POLL_SECONDS = 0.1
+
+DURATION_PART_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: str | None) -> float | None:
+    """Parse provider reset durations such as ``"1s"``, ``"6m0s"`` or ``"20ms"``."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> int | None:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def classify_exception(exc: BaseException) -> str:
+    if isinstance(exc, openai.RateLimitError):
+        return OUTCOME_RATE_LIMITED
+    if isinstance(exc, (openai.InternalServerError, openai.APIConnectionError)):
+        return OUTCOME_UNAVAILABLE
+    # Anything else (bad request, refusal, validation failure) means the
+    # provider answered, which is all the governor cares about.
+    return OUTCOME_OK
+
+
+class Governor:
+    """Adaptive limit on concurrent LLM calls with a circuit breaker.
+
+    The in-flight limit grows additively on successful calls while the
+    provider's rate-limit headers show headroom, and halves on 429s and 5xx
+    responses. A 429 or an exhausted budget also pauses new calls until the
+    provider's reset time. ``failure_threshold`` consecutive 5xx/connection
+    failures open the circuit: every caller waits for ``cooldown_seconds``,
+    then a single probe call decides whether to close it again.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        initial_in_flight: int,
+        failure_threshold: int,
+        cooldown_seconds: float,
+        log=print,
+    ) -> None:
+        self.max_limit = max_in_flight
+        self.limit = float(min(initial_in_flight, max_in_flight))
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown_seconds
+        self.cooldown = cooldown_seconds
+        self.log = log
+
+        self.in_flight = 0
+        # Callers blocked in acquire() or aacquire().
+        self.waiting = 0
+        self.paused_until = 0.0
+        self.circuit = CIRCUIT_CLOSED
+        self.circuit_open_until = 0.0
+        self.consecutive_failures = 0
+        self.near_budget = False
+
+        self.calls = 0
+        self.rate_limited = 0
+        self.unavailable = 0
+        self.circuit_trips = 0
+
+        self._probe_in_flight = False
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def _wait_time(self, now: float) -> float | None:
+        if self.circuit == CIRCUIT_OPEN:
+            if now < self.circuit_open_until:
+                return self.circuit_open_until - now
+            self.circuit = CIRCUIT_HALF_OPEN
+            self._probe_in_flight = False
+        if self.circuit == CIRCUIT_HALF_OPEN:
+            return 1.0 if self._probe_in_flight else None
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= max(1, int(self.limit)):
+            return 1.0
+        return None
+
+    def _enter(self) -> None:
+        self.in_flight += 1
+        self.calls += 1
+        if self.circuit == CIRCUIT_HALF_OPEN:
+            self._probe_in_flight = True
+
+    def acquire(self) -> None:
+        with self._condition:
+            self.waiting += 1
+            try:
+                while (wait := self._wait_time(time.monotonic())) is not None:
+                    self._condition.wait(wait)
+            finally:
+                self.waiting -= 1
+            self._enter()
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free and no other caller is waiting."""
+        with self._condition:
+            if self.waiting or self._wait_time(time.monotonic()) is not None:
+                return False
+            self._enter()
+            return True
+
+    async def aacquire(self) -> None:
+        with self._condition:
+            self.waiting += 1
+        try:
+            while True:
+                with self._condition:
+                    wait = self._wait_time(time.monotonic())
+                    if wait is None:
+                        self._enter()
+                        return
+                await asyncio.sleep(min(wait, ASYNC_POLL_SECONDS))
+        finally:
+            with self._condition:
+                self.waiting -= 1
+
+    def _decrease(self, now: float) -> None:
+        if now - self._last_decrease < DECREASE_INTERVAL_SECONDS:
+            return
+        self._last_decrease = now
+        self.limit = max(1.0, self.limit / 2)
+
+    def _trip(self, now: float) -> None:
+        if self.circuit == CIRCUIT_HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, MAX_COOLDOWN_SECONDS)
+        self.circuit = CIRCUIT_OPEN
+        self.circuit_open_until = now + self.cooldown
+        self.circuit_trips += 1
+        self.log(
+            f"LLM provider unavailable after {self.consecutive_failures} consecutive failures; "
+            f"pausing all calls for {self.cooldown:.0f}s."
+        )
+
+    def release(self, outcome: str) -> None:
+        now = time.monotonic()
+        with self._condition:
+            self.in_flight -= 1
+            was_probe = self.circuit == CIRCUIT_HALF_OPEN and self._probe_in_flight
+            if was_probe:
+                self._probe_in_flight = False
+
+            if outcome == OUTCOME_UNAVAILABLE:
+                self.unavailable += 1
+                self.consecutive_failures += 1
+                self._decrease(now)
+                if was_probe or self.consecutive_failures >= self.failure_threshold:
+                    if self.circuit != CIRCUIT_OPEN:
+                        self._trip(now)
+            else:
+                self.consecutive_failures = 0
+                if was_probe:
+                    self.circuit = CIRCUIT_CLOSED
+                    self.cooldown = self.base_cooldown
+                    self.log("LLM provider reachable again; resuming calls.")
+                if outcome == OUTCOME_RATE_LIMITED:
+                    self._decrease(now)
+                elif not self.near_budget:
+                    self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+            self._condition.notify_all()
+
+    def observe_response(self, response: httpx.Response) -> None:
+        headers = response.headers
+        now = time.monotonic()
+        with self._condition:
+            near_budget = False
+            for kind in ("requests", "tokens"):
+                remaining = _header_int(headers, f"x-ratelimit-remaining-{kind}")
+                limit = _header_int(headers, f"x-ratelimit-limit-{kind}")
+                if remaining is None or not limit:
+                    continue
+                if remaining / limit < LOW_REMAINING_FRACTION:
+                    near_budget = True
+                if remaining == 0:
+                    reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                    if reset:
+                        self.paused_until = max(self.paused_until, now + reset)
+            self.near_budget = near_budget
+
+            if response.status_code >= 500:
+                self._decrease(now)
+            if response.status_code == 429:
+                self.rate_limited += 1
+                self._decrease(now)
+                retry_after = parse_duration(headers.get("retry-after"))
+                retry_after_ms = _header_int(headers, "retry-after-ms")
+                if retry_after_ms is not None:
+                    retry_after = retry_after_ms / 1000
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+
+    async def aobserve_response(self, response: httpx.Response) -> None:
+        self.observe_response(response)
+
+    @contextmanager
+    def slot(self, acquired: bool = False) -> Iterator[None]:
+        """Hold a slot for one call; ``acquired`` if the caller already took it."""
+        if not acquired:
+            self.acquire()
+        try:
+            yield
+        except BaseException as exc:
+            self.release(classify_exception(exc))
+            raise
+        self.release(OUTCOME_OK)
+
+    @asynccontextmanager
+    async def aslot(self, acquired: bool = False) -> AsyncIterator[None]:
+        if not acquired:
+            await self.aacquire()
+        try:
+            yield
+        except BaseException as exc:
+            self.release(classify_exception(exc))
+            raise
+        self.release(OUTCOME_OK)
+
+    def summary(self) -> str:
+        return (
+            f"LLM governor: calls={self.calls}, in_flight_limit={int(self.limit)}, "
+            f"rate_limited={self.rate_limited}, unavailable={self.unavailable}, "
+            f"circuit_trips={self.circuit_trips}"
+        )
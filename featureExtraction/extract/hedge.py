@@ -0,0 +1,254 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TypeVar
+
+from .client import get_governor
+from .config import (
+    EXTRACT_CONCURRENCY,
+    EXTRACT_HEDGE_BUDGET_PERCENT,
+    EXTRACT_HEDGE_PERCENTILE,
+    EXTRACT_LLM_MAX_IN_FLIGHT,
+)
+from .governor import OUTCOME_OK
+from .prompts import EXTRACTION_ORDER
+from .timing import RUN_PROFILE, percentile
+
+T = TypeVar("T")
+
+# Latencies kept per schema, and how many are needed before hedging starts.
+LATENCY_WINDOW = 500
+MIN_LATENCY_SAMPLES = 20
+
+
+class Hedger:
+    """Issue a duplicate LLM call when the first one is unusually slow.
+
+    Once a call has been in flight longer than ``percentile`` of the recent
+    latencies for the same schema, a second identical call is started and
+    whichever returns a valid result first wins. Both calls hold a governor
+    slot, and latencies are measured from when a call got its slot, so time
+    spent queueing neither counts as slowness nor triggers hedges. A hedge is
+    only sent when the governor has a slot free that no other call is
+    waiting for, and hedges are capped at ``budget_percent`` of all calls. A
+    losing async call is cancelled; a losing call in the thread engine cannot
+    be interrupted, so it finishes in its slot and its result is discarded.
+    """
+
+    def __init__(self, percentile: float, budget_percent: float, max_workers: int):
+        self.percentile = percentile
+        self.budget_percent = budget_percent
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        # Hedges not sent because the governor had no slot to spare.
+        self.no_slot = 0
+        self._latencies: dict[str, deque[float]] = {}
+        # What callers waited, and how long the first request took (or at
+        # least took, when the hedge won) for the same calls.
+        self._waited: list[float] = []
+        self._first_request: list[float] = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="hedge"
+        )
+
+    def _threshold(self, key: str) -> float | None:
+        with self._lock:
+            self.calls += 1
+            latencies = self._latencies.get(key)
+            if latencies is None or len(latencies) < MIN_LATENCY_SAMPLES:
+                return None
+            return percentile(list(latencies), self.percentile)
+
+    def _take_hedge(self) -> bool:
+        """Take hedge budget and a free governor slot, or neither."""
+        with self._lock:
+            if self.hedged + 1 > self.calls * self.budget_percent / 100:
+                return False
+            if not get_governor().try_acquire():
+                self.no_slot += 1
+                return False
+            self.hedged += 1
+            return True
+
+    def _observe(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(
+                seconds
+            )
+
+    def _report(self, waited: float, hedge_won: bool) -> int:
+        with self._lock:
+            self._waited.append(waited)
+            self._first_request.append(waited)
+            if hedge_won:
+                self.hedge_wins += 1
+            return len(self._first_request) - 1
+
+    def _finish_first_request(self, index: int, started: float) -> None:
+        with self._lock:
+            self._first_request[index] = time.monotonic() - started
+
+    def _timed(self, key: str, call: Callable[[], T]) -> T:
+        """Make the call in the governor slot already taken for it."""
+        with get_governor().slot(acquired=True):
+            started = time.monotonic()
+            result = call()
+            self._observe(key, time.monotonic() - started)
+        return result
+
+    def _submit(self, key: str, call: Callable[[], T]) -> Future:
+        future = self._executor.submit(
+            contextvars.copy_context().run, self._timed, key, call
+        )
+
+        def release_unstarted(future: Future) -> None:
+            # A call cancelled before it started never entered its slot.
+            if future.cancelled():
+                get_governor().release(OUTCOME_OK)
+
+        future.add_done_callback(release_unstarted)
+        return future
+
+    def run(self, key: str, call: Callable[[], T]) -> T:
+        hedge_after = self._threshold(key)
+        queued = time.monotonic()
+        get_governor().acquire()
+        RUN_PROFILE.record("llm.queue", time.monotonic() - queued)
+        started = time.monotonic()
+        if hedge_after is None:
+            result = self._timed(key, call)
+            elapsed = time.monotonic() - started
+            self._report(elapsed, hedge_won=False)
+            return result
+
+        primary = self._submit(key, call)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done or not self._take_hedge():
+            result = primary.result()
+            elapsed = time.monotonic() - started
+            self._report(elapsed, hedge_won=False)
+            return result
+
+        hedge = self._submit(key, call)
+        pending: set[Future] = {primary, hedge}
+        error: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for other in pending:
+                    other.cancel()
+                index = self._report(
+                    time.monotonic() - started, hedge_won=future is hedge
+                )
+                if future is hedge and not primary.done():
+                    # The first request keeps running; record how long it
+                    # would have made the caller wait.
+                    primary.add_done_callback(
+                        lambda _, index=index: self._finish_first_request(
+                            index, started
+                        )
+                    )
+                return future.result()
+        assert error is not None
+        raise error
+
+    async def arun(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        hedge_after = self._threshold(key)
+        governor = get_governor()
+        queued = time.monotonic()
+        await governor.aacquire()
+        RUN_PROFILE.record("llm.queue", time.monotonic() - queued)
+        started = time.monotonic()
+
+        async def timed() -> T:
+            # Entered on the task's first step, which runs before this
+            # coroutine resumes, so a cancelled task still releases its slot.
+            async with governor.aslot(acquired=True):
+                call_started = time.monotonic()
+                result = await call()
+                self._observe(key, time.monotonic() - call_started)
+            return result
+
+        if hedge_after is None:
+            result = await timed()
+            elapsed = time.monotonic() - started
+            self._report(elapsed, hedge_won=False)
+            return result
+
+        primary = asyncio.ensure_future(timed())
+        pending: set[asyncio.Future] = {primary}
+        error: BaseException | None = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=hedge_after)
+            if done or not self._take_hedge():
+                result = await primary
+                self._report(time.monotonic() - started, hedge_won=False)
+                return result
+
+            hedge = asyncio.ensure_future(timed())
+            pending.add(hedge)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    self._report(time.monotonic() - started, hedge_won=task is hedge)
+                    return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        assert error is not None
+        raise error
+
+    def summary(self) -> str:
+        with self._lock:
+            waited = list(self._waited)
+            first_request = list(self._first_request)
+            hedged, calls, hedge_wins = self.hedged, self.calls, self.hedge_wins
+            no_slot = self.no_slot
+        description = (
+            f"Hedging: hedged={hedged}/{calls} calls ({hedged / calls if calls else 0:.1%}), "
+            f"hedge_wins={hedge_wins}, skipped_without_free_slot={no_slot}"
+        )
+        if waited:
+            description += (
+                f", p99 latency {percentile(waited, 99):.1f}s "
+                f"(first request alone: at least {percentile(first_request, 99):.1f}s)"
+            )
+        return description
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_hedger_lock = threading.Lock()
+_hedger: Hedger | None = None
+
+
+def get_hedger() -> Hedger | None:
+    """Return the process-wide hedger, or None when hedging is disabled."""
+    global _hedger
+    if not EXTRACT_HEDGE_PERCENTILE:
+        return None
+    with _hedger_lock:
+        if _hedger is None:
+            _hedger = Hedger(
+                EXTRACT_HEDGE_PERCENTILE,
+                EXTRACT_HEDGE_BUDGET_PERCENT,
+                # Every in-flight schema call plus its hedge.
+                max_workers=EXTRACT_CONCURRENCY * len(EXTRACTION_ORDER)
+                + EXTRACT_LLM_MAX_IN_FLIGHT,
+            )
+        return _hedger
@@ -0,0 +1,234 @@
+import os
+import socket
+import threading
+import uuid
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from pymongo import ReturnDocument
+from pymongo.collection import Collection
+from pymongo.errors import PyMongoError
+
+STATUS_FIELD = "extraction_status"
+OWNER_FIELD = "lease_owner"
+EXPIRES_FIELD = "lease_expires_at"
+HEARTBEAT_FIELD = "lease_heartbeat_at"
+ATTEMPTS_FIELD = "extraction_attempts"
+ERROR_FIELD = "extraction_error"
+
+STATUS_PENDING = "pending"
+STATUS_CLAIMED = "claimed"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def claimable_filter(now: datetime, max_attempts: int) -> dict:
+    return {
+        "$or": [
+            {STATUS_FIELD: {"$in": [None, STATUS_PENDING]}},
+            {STATUS_FIELD: STATUS_CLAIMED, EXPIRES_FIELD: {"$lt": now}},
+            # A failed judgement waits until its retry time (failures recorded
+            # without one are claimable straight away).
+            {
+                STATUS_FIELD: STATUS_FAILED,
+                ATTEMPTS_FIELD: {"$lt": max_attempts},
+                EXPIRES_FIELD: {"$not": {"$gte": now}},
+            },
+        ]
+    }
+
+
+class LeaseQueue:
+    """Claim judgements for extraction with an expiring lease.
+
+    A claim atomically moves a judgement to ``claimed`` and stamps it with this
+    worker's id and an expiry. Held leases are renewed by a heartbeat thread, so
+    a lease only expires (and becomes claimable by another worker) when its
+    owner has died or stalled. A failed judgement can be claimed again after
+    ``retry_seconds``, until it has been attempted ``max_attempts`` times.
+    """
+
+    def __init__(
+        self,
+        judgements_collection: Collection,
+        lease_seconds: int,
+        max_attempts: int,
+        projection: dict | None = None,
+        worker_id: str | None = None,
+        retry_seconds: int = 0,
+    ) -> None:
+        self.collection = judgements_collection
+        self.lease = timedelta(seconds=lease_seconds)
+        self.max_attempts = max_attempts
+        self.retry_delay = timedelta(seconds=retry_seconds)
+        self.projection = projection
+        self.worker_id = worker_id or default_worker_id()
+        self._held: set[Any] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat_thread: threading.Thread | None = None
+
+    def count_claimable(self, extra_filter: dict | None = None) -> int:
+        return self.collection.count_documents(
+            self._filter(datetime.now(timezone.utc), extra_filter)
+        )
+
+    def _filter(self, now: datetime, extra_filter: dict | None) -> dict:
+        lease_filter = claimable_filter(now, self.max_attempts)
+        if extra_filter:
+            return {"$and": [lease_filter, extra_filter]}
+        return lease_filter
+
+    def claim(self, extra_filter: dict | None = None) -> dict | None:
+        now = datetime.now(timezone.utc)
+        judgement_doc = self.collection.find_one_and_update(
+            self._filter(now, extra_filter),
+            {
+                "$set": {
+                    STATUS_FIELD: STATUS_CLAIMED,
+                    OWNER_FIELD: self.worker_id,
+                    EXPIRES_FIELD: now + self.lease,
+                    HEARTBEAT_FIELD: now,
+                },
+                "$inc": {ATTEMPTS_FIELD: 1},
+            },
+            projection=self.projection,
+            return_document=ReturnDocument.AFTER,
+        )
+        if judgement_doc is not None:
+            with self._lock:
+                self._held.add(judgement_doc["_id"])
+        return judgement_doc
+
+    def iter_claims(
+        self, priority_filter: dict | None = None, limit: int = 0
+    ) -> Iterator[dict]:
+        if priority_filter:
+            while (judgement_doc := self.claim(priority_filter)) is not None:
+                yield judgement_doc
+
+        claimed = 0
+        while limit <= 0 or claimed < limit:
+            judgement_doc = self.claim()
+            if judgement_doc is None:
+                return
+            claimed += 1
+            yield judgement_doc
+
+    def _settle(self, source_id: Any, update: dict) -> bool:
+        with self._lock:
+            self._held.discard(source_id)
+        result = self.collection.update_one(
+            {"_id": source_id, OWNER_FIELD: self.worker_id}, update
+        )
+        return result.modified_count > 0
+
+    def complete(self, source_id: Any) -> bool:
+        return self.complete_many([source_id]) > 0
+
+    def complete_many(self, source_ids: list[Any]) -> int:
+        with self._lock:
+            self._held.difference_update(source_ids)
+        result = self.collection.update_many(
+            {"_id": {"$in": source_ids}, OWNER_FIELD: self.worker_id},
+            {
+                "$set": {STATUS_FIELD: STATUS_DONE},
+                "$unset": {OWNER_FIELD: "", EXPIRES_FIELD: "", ERROR_FIELD: ""},
+            },
+        )
+        return result.modified_count
+
+    def fail(self, source_id: Any, message: str | None) -> bool:
+        return self._settle(
+            source_id,
+            {
+                "$set": {
+                    STATUS_FIELD: STATUS_FAILED,
+                    ERROR_FIELD: message,
+                    EXPIRES_FIELD: datetime.now(timezone.utc) + self.retry_delay,
+                },
+                "$unset": {OWNER_FIELD: ""},
+            },
+        )
+
+    def release_all(self) -> None:
+        with self._lock:
+            held = list(self._held)
+            self._held.clear()
+        if not held:
+            return
+        self.collection.update_many(
+            {"_id": {"$in": held}, OWNER_FIELD: self.worker_id},
+            {
+                "$set": {STATUS_FIELD: STATUS_PENDING},
+                "$unset": {OWNER_FIELD: "", EXPIRES_FIELD: ""},
+                "$inc": {ATTEMPTS_FIELD: -1},
+            },
+        )
+
+    def heartbeat(self) -> None:
+        with self._lock:
+            held = list(self._held)
+        if not held:
+            return
+        now = datetime.now(timezone.utc)
+        self.collection.update_many(
+            {"_id": {"$in": held}, OWNER_FIELD: self.worker_id},
+            {"$set": {EXPIRES_FIELD: now + self.lease, HEARTBEAT_FIELD: now}},
+        )
+
+    def _heartbeat_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.heartbeat()
+            except PyMongoError as exc:
+                print(f"Lease heartbeat failed for worker {self.worker_id}: {exc}")
+
+    def __enter__(self) -> "LeaseQueue":
+        self._stop.clear()
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop,
+            args=(self.lease.total_seconds() / 3,),
+            name="lease-heartbeat",
+            daemon=True,
+        )
+        self._heartbeat_thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._stop.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+        self.release_all()
+
+
+def backfill_lease_status(
+    judgements_collection: Collection, extracted_features_collection: Collection
+) -> int:
+    """Mark judgements that already have extracted features as done."""
+    marked = 0
+    batch: list[Any] = []
+
+    def flush() -> int:
+        if not batch:
+            return 0
+        result = judgements_collection.update_many(
+            {"_id": {"$in": batch}, STATUS_FIELD: {"$ne": STATUS_DONE}},
+            {"$set": {STATUS_FIELD: STATUS_DONE}},
+        )
+        batch.clear()
+        return result.modified_count
+
+    for doc in extracted_features_collection.find({}, {"source_judgement_id": 1}):
+        batch.append(doc.get("source_judgement_id"))
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            marked += flush()
+    marked += flush()
+    return marked
@@ -0,0 +1,226 @@
+import json
+import re
+from collections import Counter
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from pydantic import BaseModel
+
+from schema import Defendants, Judgement, Trials
+
+Record = dict[str, Any]
+
+
+class ChunkMismatchError(ValueError):
+    """The chunks of a judgement disagree on its charges or defendants."""
+
+
+def normalise_name(name: str) -> str:
+    """A defendant's name with case, spacing and punctuation ignored."""
+    return " ".join(re.sub(r"[\W_]+", " ", name).split()).casefold()
+
+
+def _dump(model: BaseModel) -> Record:
+    # Computed fields are derived again when the merged record is validated.
+    return model.model_dump(mode="json", exclude_computed_fields=True)
+
+
+def _first(values: list[Any]) -> Any:
+    return next((value for value in values if value is not None), None)
+
+
+def _identity(item: Any) -> str:
+    """An item of a list field, regardless of which passage it was quoted from."""
+    if isinstance(item, dict):
+        item = {key: value for key, value in item.items() if key != "source"}
+    return json.dumps(item, sort_keys=True, ensure_ascii=False)
+
+
+def _union(lists: list[list[Any] | None]) -> list[Any] | None:
+    present = [items for items in lists if items is not None]
+    if not present:
+        return None
+    merged: dict[str, Any] = {}
+    for items in present:
+        for item in items:
+            merged.setdefault(_identity(item), item)
+    return list(merged.values())
+
+
+def _group(
+    lists: list[list[Record] | None], key: Callable[[Record], Hashable]
+) -> list[list[Record]]:
+    """The records of every chunk that share a key, in order of first appearance."""
+    groups: dict[Hashable, list[Record]] = {}
+    for items in lists:
+        for item in items or []:
+            groups.setdefault(key(item), []).append(item)
+    return list(groups.values())
+
+
+def _merge_fields(
+    records: list[Record],
+    merge_field: dict[str, Callable[[list[Any]], Any]] | None = None,
+) -> Record:
+    """Take each field from the first chunk that found it and combine lists."""
+    merged = {}
+    for name in records[0]:
+        values = [record.get(name) for record in records]
+        if merge_field and name in merge_field:
+            merged[name] = merge_field[name](values)
+        elif any(isinstance(value, list) for value in values):
+            merged[name] = _union(values)
+        else:
+            merged[name] = _first(values)
+    return merged
+
+
+def _filled_leaves(value: Any) -> int:
+    if isinstance(value, dict):
+        return sum(_filled_leaves(item) for item in value.values())
+    if isinstance(value, list):
+        return sum(_filled_leaves(item) for item in value)
+    return int(value is not None)
+
+
+def _merge_cross_border(values: list[Record]) -> Record:
+    # A chunk without the facts says nothing crossed the border.
+    return _first([value for value in values if value["cross_border"]]) or values[0]
+
+
+def _merge_charge_defendants(lists: list[list[Record]]) -> list[Record]:
+    # IDs are numbered again when the merged judgement is validated.
+    return [
+        _merge_fields(group)
+        for group in _group(
+            lists, lambda defendant: normalise_name(defendant["defendant_name"])
+        )
+    ]
+
+
+def _charge_signature(charge: Record) -> tuple[str, tuple[str, ...]]:
+    return (
+        charge["charge_name"],
+        tuple(
+            sorted(
+                {
+                    normalise_name(defendant["defendant_name"])
+                    for defendant in charge["defendants_of_charge"]
+                }
+            )
+        ),
+    )
+
+
+def _charge_keys(charges: list[Record]) -> list[tuple]:
+    """A key for each charge: what it is, against whom, and which of the
+    charges alike it is."""
+    seen: Counter[tuple] = Counter()
+    keys = []
+    for charge in charges:
+        signature = _charge_signature(charge)
+        keys.append((signature, seen[signature]))
+        seen[signature] += 1
+    return keys
+
+
+def _check_charges(parts: list[Record]) -> list[list[tuple]]:
+    """The charge keys of every chunk, which must all list the header's charges.
+
+    Charge numbers and defendant IDs are positional, so chunks that read the
+    header differently would otherwise have one person's or charge's details
+    merged into another's.
+    """
+    keys = [_charge_keys(part["charges"]) for part in parts]
+    for part, part_keys in enumerate(keys[1:], start=2):
+        if part_keys != keys[0]:
+            raise ChunkMismatchError(
+                f"Chunk {part} lists charges {[key[0] for key in part_keys]}, "
+                f"but chunk 1 lists {[key[0] for key in keys[0]]}."
+            )
+    return keys
+
+
+def merge_judgements(parts: list[Judgement]) -> Judgement:
+    """Merge charges by what they are and against whom, and their defendants
+    by name.
+
+    Every chunk carries the judgement header, so every chunk must list the
+    same charges; ``ChunkMismatchError`` is raised when they don't.
+    Validation numbers the merged charges and defendants again.
+    """
+    records = [_dump(part) for part in parts]
+    keys = _check_charges(records)
+    charge_groups: dict[tuple, list[Record]] = {}
+    for part_keys, record in zip(keys, records):
+        for key, charge in zip(part_keys, record["charges"]):
+            charge_groups.setdefault(key, []).append(charge)
+    charges = [
+        _merge_fields(
+            group,
+            {
+                "cross_border": _merge_cross_border,
+                "defendants_of_charge": _merge_charge_defendants,
+            },
+        )
+        for group in charge_groups.values()
+    ]
+    merged = _merge_fields(records, {"charges": lambda _: charges})
+    return Judgement.model_validate(merged)
+
+
+def merge_defendants(parts: list[Defendants]) -> Defendants:
+    """Merge profiles by defendant name, keeping the ID the prompt gave."""
+    groups = _group(
+        [_dump(part)["defendants"] for part in parts],
+        lambda profile: normalise_name(profile["defendant_name"]["name"]),
+    )
+    for group in groups:
+        if len({profile["defendant_id"] for profile in group}) > 1:
+            raise ChunkMismatchError(
+                f"Chunks give {group[0]['defendant_name']['name']} the IDs "
+                f"{sorted({profile['defendant_id'] for profile in group})}."
+            )
+    return Defendants.model_validate(
+        {"defendants": [_merge_fields(group) for group in groups]}
+    )
+
+
+def merge_trials(parts: list[Trials]) -> Trials:
+    """Keep one trial per charge and defendant: the one that states the most.
+
+    The sentencing steps of a trial are checked against each other, so a
+    trial is never pieced together from several chunks.
+    """
+    groups = _group(
+        [_dump(part)["trials"] for part in parts],
+        lambda trial: (
+            trial["charge_type"]["charge_no"],
+            normalise_name(trial["charge_type"]["defendant_name"]),
+        ),
+    )
+    trials = sorted(
+        (max(group, key=_filled_leaves) for group in groups),
+        key=lambda trial: (
+            trial["charge_type"]["charge_no"],
+            trial["charge_type"]["defendant_id"],
+        ),
+    )
+    return Trials.model_validate({"trials": trials})
+
+
+MERGERS: dict[str, Callable[[list[Any]], BaseModel]] = {
+    "judgement": merge_judgements,
+    "defendants": merge_defendants,
+    "trials": merge_trials,
+}
+
+
+def merge_partials(schema_name: str, parts: list[BaseModel]) -> BaseModel:
+    """Combine the extractions of one schema from every chunk, in chunk order.
+
+    Raises ``ChunkMismatchError`` when the chunks can't be lined up.
+    """
+    if len(parts) == 1:
+        return parts[0]
+    return MERGERS[schema_name](parts)
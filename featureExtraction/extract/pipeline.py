@@ -1,20 +1,86 @@
+import asyncio
+import contextvars
+import hashlib
 import json
 import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from typing import Any
 
 from langfuse import Langfuse, observe
-from openai import OpenAI
-from openai._exceptions import OpenAIError
+from openai import AsyncOpenAI, OpenAI, OpenAIError
+from openai.types.responses import Response
 from pydantic import ValidationError
 from tqdm import tqdm
 
 from schema import Defendants, Judgement, Trials
+from schema.defendants import DefendantProfile
+from schema.trials import Trial
 
-from .config import MAX_RETRIES, MODEL
-from .prompts import EXTRACTION_ORDER, SCHEMA_CONFIGS
+from .cache import ResponseCache, get_response_cache
+from .client import get_governor
+from .config import (
+    EXTRACT_LLM_MAX_IN_FLIGHT,
+    EXTRACT_PROMPT_LAYOUT,
+    EXTRACT_REPAIR_RETRIES,
+    MODEL,
+)
+from .fanout import ITEM_SCHEMAS, PARENT_SCHEMAS, assemble_items, fanout_items
+from .hedge import get_hedger
+from .merge import ChunkMismatchError, merge_partials
+from .prompts import (
+    CHUNK_NOTE,
+    EXTRACTION_ORDER,
+    PREPEND,
+    REPAIR_PROMPT,
+    SCHEMA_CONFIGS,
+    SCHEMA_DEPENDENCIES,
+)
+from .retry import (
+    DEFAULT_RETRY_POLICY,
+    Deadline,
+    DeadlineExceeded,
+    RefusalError,
+    RetryBudget,
+)
+from .text_format import text_format
+from .timing import RUN_PROFILE
+from .usage import RUN_USAGE, TokenUsage, UsageMeter
 
-ExtractionModel = Judgement | Defendants | Trials
+ExtractionModel = Judgement | Defendants | Trials | DefendantProfile | Trial
+
+
+class OutputValidationError(ValueError):
+    """The model answered, but its output does not validate against the schema."""
+
+    def __init__(self, message: str, raw_output: str) -> None:
+        super().__init__(message)
+        self.raw_output = raw_output
+
+
+def _build_stages() -> list[list[str]]:
+    stages: list[list[str]] = []
+    done: set[str] = set()
+    remaining = list(EXTRACTION_ORDER)
+    while remaining:
+        stage = [
+            schema_name
+            for schema_name in remaining
+            if set(SCHEMA_DEPENDENCIES[schema_name]) <= done
+        ]
+        if not stage:
+            raise ValueError(f"Unresolvable schema dependencies for {remaining}.")
+        stages.append(stage)
+        done.update(stage)
+        remaining = [name for name in remaining if name not in done]
+    return stages
+
+
+# Schemas in the same stage only depend on earlier stages and run concurrently.
+EXTRACTION_STAGES = _build_stages()
 
 
 def _build_prompt(schema_name: str, previous_extractions: dict[str, Any] | None) -> str:
@@ -41,9 +107,378 @@ def _build_prompt(schema_name: str, previous_extractions: dict[str, Any] | None)
             charge_to_defendants="\n".join(charge_to_defendants_list)
         )
 
+    if schema_name == "defendant" and previous_extractions is not None:
+        defendant = previous_extractions["defendant"]
+        return base_prompt.format(
+            defendant_id=defendant.id, defendant_name=defendant.name
+        )
+
+    if schema_name == "trial" and previous_extractions is not None:
+        charge, defendant = (
+            previous_extractions["charge"],
+            previous_extractions["defendant"],
+        )
+        return base_prompt.format(
+            charge_no=charge.charge_no,
+            charge_name=charge.charge_name,
+            defendant_id=defendant.defendant_id,
+            defendant_name=defendant.defendant_name,
+        )
+
     return base_prompt
 
 
+def _build_input(
+    schema_name: str,
+    case_txt: str,
+    previous_extractions: dict[str, Any] | None,
+    last_error: str | None,
+) -> list[dict[str, str]]:
+    error_context = ""
+    if last_error:
+        error_context = (
+            "\n\nPrevious attempt failed with error: "
+            f"{last_error}. Please try again carefully."
+        )
+
+    if EXTRACT_PROMPT_LAYOUT == "case-first":
+        # The case text goes straight after the shared preamble so that retries
+        # and fanned-out items start with the same prefix; only the
+        # instructions and error context after it vary. The provider puts the
+        # schema's text.format ahead of the input, so different schemas do not
+        # share it.
+        instructions = _build_prompt(schema_name, previous_extractions)
+        return [
+            {"role": "system", "content": PREPEND},
+            {"role": "user", "content": case_txt},
+            {
+                "role": "system",
+                "content": instructions.removeprefix(PREPEND) + error_context,
+            },
+        ]
+
+    return [
+        {
+            "role": "system",
+            "content": _build_prompt(schema_name, previous_extractions),
+        },
+        {
+            "role": "user",
+            "content": case_txt + error_context,
+        },
+    ]
+
+
+def _build_repair_input(
+    schema_name: str,
+    previous_extractions: dict[str, Any] | None,
+    raw_output: str,
+    last_error: str,
+) -> list[dict[str, str]]:
+    instructions = _build_prompt(schema_name, previous_extractions)
+    return [
+        {
+            "role": "system",
+            "content": PREPEND
+            + REPAIR_PROMPT
+            + "\n\nOriginal instructions:\n"
+            + instructions.removeprefix(PREPEND),
+        },
+        {
+            "role": "user",
+            "content": f"Previous output:\n{raw_output}\n\nValidation errors:\n{last_error}",
+        },
+    ]
+
+
+def _build_request(
+    schema_name: str,
+    case_txt: str,
+    judgement_type: str,
+    attempt: int,
+    previous_extractions: dict[str, Any] | None,
+    last_error: str | None,
+    repair_output: str | None = None,
+) -> dict[str, Any]:
+    if repair_output is not None and last_error is not None:
+        name = f"{schema_name}-repair-{attempt + 1}"
+        input_messages = _build_repair_input(
+            schema_name, previous_extractions, repair_output, last_error
+        )
+    else:
+        name = f"{schema_name}-extraction-{attempt + 1}"
+        input_messages = _build_input(
+            schema_name, case_txt, previous_extractions, last_error
+        )
+
+    request = {
+        "name": name,
+        "model": MODEL,
+        "input": input_messages,
+        "text": {"format": text_format(SCHEMA_CONFIGS[schema_name]["model"])},
+        "metadata": {
+            "judgement_type": judgement_type,
+            "schema_name": schema_name,
+            "attempt": str(attempt + 1),
+        },
+    }
+    if EXTRACT_PROMPT_LAYOUT == "case-first" and repair_output is None:
+        # Route every call for the same case to the same cache shard.
+        request["prompt_cache_key"] = hashlib.sha256(case_txt.encode()).hexdigest()[:32]
+    return request
+
+
+def _refusal(response: Any) -> str | None:
+    for item in getattr(response, "output", None) or []:
+        for content in getattr(item, "content", None) or []:
+            if getattr(content, "type", None) == "refusal":
+                return content.refusal
+    return None
+
+
+def _parse_response(response: Any, schema_name: str) -> ExtractionModel:
+    # Parsing here rather than with responses.parse() keeps the raw output of
+    # a response that fails validation, so that it can be repaired.
+    if refusal := _refusal(response):
+        raise RefusalError(f"Model refused to generate output: {refusal}")
+    raw_output = getattr(response, "output_text", None)
+    if not raw_output:
+        raise ValueError(
+            f"Failed to parse response. Raw output: {getattr(response, 'output', None)}"
+        )
+    try:
+        return SCHEMA_CONFIGS[schema_name]["model"].model_validate_json(raw_output)
+    except ValidationError as exc:
+        raise OutputValidationError(str(exc), raw_output) from exc
+
+
+def _write_output(
+    output_path: str, extracted_data: ExtractionModel, langfuse: Langfuse
+) -> None:
+    output_dict = extracted_data.model_dump(mode="json")
+
+    with open(output_path, "w") as file:
+        output_dict_with_trace = output_dict.copy()
+        output_dict_with_trace["tracing_id"] = langfuse.get_current_trace_id()
+        file.write(json.dumps(output_dict_with_trace, indent=2, ensure_ascii=False))
+
+
+def _report_failure(
+    schema_name: str, judgement_type: str, attempts: int, last_error: str
+) -> None:
+    print(
+        f"Failed to extract {schema_name} for {judgement_type} after {attempts} attempts: {last_error}"
+    )
+
+
+def _record_usage(
+    schema_name: str, usage: TokenUsage, meter: UsageMeter | None
+) -> None:
+    """Count usage towards the run and, when given, the judgement's own meter."""
+    # Calls for one fanned-out item count towards the schema they belong to.
+    schema_name = PARENT_SCHEMAS.get(schema_name, schema_name)
+    RUN_USAGE.record(schema_name, usage)
+    if meter is not None:
+        meter.record(schema_name, usage)
+
+
+class RetryState:
+    """Decide what each attempt at extracting one schema sends.
+
+    After an output fails schema validation, up to ``EXTRACT_REPAIR_RETRIES``
+    retries send only that output and the validation errors and ask for a
+    corrected object. A repair that fails validation or is unusable falls back
+    to re-extracting from the full case text.
+    """
+
+    def __init__(
+        self,
+        schema_name: str,
+        case_txt: str,
+        judgement_type: str,
+        previous_extractions: dict[str, Any] | None,
+        usage: UsageMeter | None = None,
+    ) -> None:
+        self.schema_name = schema_name
+        self.case_txt = case_txt
+        self.judgement_type = judgement_type
+        self.previous_extractions = previous_extractions
+        self.last_error: str | None = None
+        self.repair_output: str | None = None
+        self.repairs_left = EXTRACT_REPAIR_RETRIES
+        self.full_input_tokens = 0
+        self.usage = usage
+
+    def request(self, attempt: int) -> dict[str, Any]:
+        _record_usage(self.schema_name, TokenUsage(attempts=1), self.usage)
+        return _build_request(
+            self.schema_name,
+            self.case_txt,
+            self.judgement_type,
+            attempt,
+            self.previous_extractions,
+            self.last_error,
+            self.repair_output,
+        )
+
+    def parse(self, response: Any) -> ExtractionModel:
+        usage = TokenUsage.from_response(response)
+        repairing = self.repair_output is not None
+        if repairing:
+            usage.repairs = 1
+            usage.repair_tokens_saved = max(
+                0, self.full_input_tokens - usage.input_tokens
+            )
+        else:
+            self.full_input_tokens = usage.input_tokens
+        try:
+            with RUN_PROFILE.time(f"validate.{self.schema_name}"):
+                extracted_data = _parse_response(response, self.schema_name)
+            if repairing:
+                usage.repaired = 1
+            return extracted_data
+        finally:
+            _record_usage(self.schema_name, usage, self.usage)
+
+    def failed(self, exc: Exception) -> None:
+        self.last_error = str(exc)
+        if isinstance(exc, OpenAIError):
+            # The provider never answered; try the same request again.
+            return
+        if (
+            isinstance(exc, OutputValidationError)
+            and exc.raw_output
+            and self.repairs_left > 0
+        ):
+            self.repairs_left -= 1
+            self.repair_output = exc.raw_output
+        else:
+            self.repair_output = None
+
+
+def record_extraction(
+    previous_extractions: dict[str, Any],
+    schema_name: str,
+    extracted_data: ExtractionModel,
+) -> None:
+    if schema_name == "judgement":
+        previous_extractions["defendants"] = extracted_data.defendants
+        previous_extractions["charge_to_defendants"] = extracted_data.charges
+
+
+def schema_case_parts(
+    schema_name: str,
+    case_txt: str,
+    schema_case_texts: dict[str, str],
+    chunks: list[str],
+) -> list[str]:
+    """Case texts to extract a schema from: the one for the schema, or every
+    chunk of a judgement too long for one call, to be merged afterwards."""
+    if not chunks:
+        return [schema_case_texts.get(schema_name, case_txt)]
+    return [
+        CHUNK_NOTE.format(part=part, parts=len(chunks)) + chunk
+        for part, chunk in enumerate(chunks, start=1)
+    ]
+
+
+@dataclass(frozen=True)
+class SchemaCall:
+    """One call of a stage: a schema, or one item of it, from one case text."""
+
+    schema_name: str
+    # Index of the chunk, and of the item when the schema is fanned out.
+    part: int
+    item: int
+    request_schema: str
+    case_txt: str
+    previous_extractions: dict[str, Any] | None
+
+
+def plan_stage(
+    stage: list[str],
+    case_txt: str,
+    schema_case_texts: dict[str, str],
+    chunks: list[str],
+    previous_extractions: dict[str, Any],
+) -> list[SchemaCall]:
+    context = dict(previous_extractions)
+    calls = []
+    for schema_name in stage:
+        items = fanout_items(schema_name, context) if context else []
+        case_parts = schema_case_parts(schema_name, case_txt, schema_case_texts, chunks)
+        for part, case_part in enumerate(case_parts):
+            if not items:
+                calls.append(
+                    SchemaCall(
+                        schema_name, part, 0, schema_name, case_part, context or None
+                    )
+                )
+            for index, item in enumerate(items):
+                calls.append(
+                    SchemaCall(
+                        schema_name,
+                        part,
+                        index,
+                        ITEM_SCHEMAS[schema_name],
+                        case_part,
+                        {**context, **item},
+                    )
+                )
+    return calls
+
+
+def _report_chunk_fallback(stage: list[str], exc: ChunkMismatchError) -> None:
+    tqdm.write(
+        f"Cannot merge chunks of {'+'.join(stage)}: {exc} "
+        "Extracting it and the later stages from the full case text."
+    )
+
+
+def collect_stage(
+    stage: list[str], calls: list[SchemaCall], results: list[ExtractionModel]
+) -> dict[str, ExtractionModel]:
+    """Assemble fanned-out items and merge chunks into one output per schema.
+
+    Raises ``ChunkMismatchError`` when the chunks of a schema disagree.
+    """
+    extracted_by_schema = {}
+    for schema_name in stage:
+        by_part: dict[int, list[tuple[SchemaCall, ExtractionModel]]] = {}
+        for call, extracted_data in zip(calls, results):
+            if call.schema_name == schema_name:
+                by_part.setdefault(call.part, []).append((call, extracted_data))
+        parts = []
+        for part in sorted(by_part):
+            part_calls = by_part[part]
+            if part_calls[0][0].request_schema == schema_name:
+                parts.append(part_calls[0][1])
+            else:
+                parts.append(
+                    assemble_items(
+                        schema_name,
+                        [call.previous_extractions for call, _ in part_calls],
+                        [extracted_data for _, extracted_data in part_calls],
+                    )
+                )
+        extracted_by_schema[schema_name] = merge_partials(schema_name, parts)
+    return extracted_by_schema
+
+
+def _cache_key(
+    cache: ResponseCache,
+    schema_name: str,
+    case_txt: str,
+    previous_extractions: dict[str, Any] | None,
+) -> str:
+    return cache.key(
+        MODEL,
+        SCHEMA_CONFIGS[schema_name]["model"],
+        _build_prompt(schema_name, previous_extractions),
+        case_txt,
+    )
+
+
 @observe(name="extract_single_schema")
 def extract_single_schema(
     schema_name: str,
@@ -53,71 +488,171 @@ def extract_single_schema(
     client: OpenAI,
     langfuse: Langfuse,
     previous_extractions: dict[str, Any] | None = None,
+    deadline: Deadline | None = None,
+    usage: UsageMeter | None = None,
 ) -> ExtractionModel:
-    config = SCHEMA_CONFIGS[schema_name]
-    schema_model = config["model"]
+    def call() -> ExtractionModel:
+        state = RetryState(
+            schema_name, case_txt, judgement_type, previous_extractions, usage
+        )
+        retry = RetryBudget(deadline=deadline)
+        hedger = get_hedger()
+        while True:
+            try:
+                request = state.request(retry.attempts)
 
-    last_error: str | None = None
-    for attempt in range(MAX_RETRIES):
-        try:
-            error_context = ""
-            if last_error:
-                error_context = (
-                    "\n\nPrevious attempt failed with error: "
-                    f"{last_error}. Please try again carefully."
-                )
+                def send(request: dict[str, Any] = request) -> Response:
+                    # Timed from when the call got its slot, not from when it
+                    # started waiting for one.
+                    timeout = retry.call_timeout()
+                    with RUN_PROFILE.time(f"llm.{schema_name}"):
+                        return client.responses.create(**request, timeout=timeout)
 
-            response = client.responses.parse(
-                name=f"{schema_name}-extraction-{attempt + 1}",
-                model=MODEL,
-                input=[
-                    {
-                        "role": "system",
-                        "content": _build_prompt(schema_name, previous_extractions),
-                    },
-                    {
-                        "role": "user",
-                        "content": case_txt + error_context,
-                    },
-                ],
-                text_format=schema_model,
-                metadata={
-                    "judgement_type": judgement_type,
-                    "schema_name": schema_name,
-                    "attempt": str(attempt + 1),
-                },
-            )
+                def send_and_parse() -> ExtractionModel:
+                    return state.parse(send())
 
-            if response.output_parsed is None:
-                if hasattr(response, "refusal") and response.refusal:
-                    raise ValueError(
-                        f"Model refused to generate output: {response.refusal}"
+                if hedger is not None:
+                    # The hedger takes the governor slot for each request.
+                    return hedger.run(schema_name, send_and_parse)
+                queued = time.perf_counter()
+                with get_governor().slot():
+                    RUN_PROFILE.record("llm.queue", time.perf_counter() - queued)
+                    response = send()
+                return state.parse(response)
+            except DeadlineExceeded as exc:
+                _report_failure(
+                    schema_name,
+                    judgement_type,
+                    retry.attempts,
+                    f"{exc} Last error: {state.last_error}"
+                    if state.last_error
+                    else str(exc),
+                )
+                raise
+            except (OpenAIError, ValidationError, ValueError) as exc:
+                state.failed(exc)
+                delay = retry.next_delay(exc)
+                if delay is None:
+                    _report_failure(
+                        schema_name, judgement_type, retry.attempts, str(exc)
                     )
+                    raise
+            with RUN_PROFILE.time(f"retry_wait.{schema_name}"):
+                time.sleep(delay)
 
-                raw_output = getattr(response, "output_text", None) or getattr(
-                    response, "output", None
+    cache = get_response_cache()
+    started = time.perf_counter()
+    try:
+        with RUN_PROFILE.time(f"schema.{schema_name}"):
+            if cache is None:
+                extracted_data = call()
+            else:
+                extracted_data = cache.get_or_compute(
+                    _cache_key(cache, schema_name, case_txt, previous_extractions),
+                    SCHEMA_CONFIGS[schema_name]["model"],
+                    call,
                 )
-                raise ValueError(f"Failed to parse response. Raw output: {raw_output}")
+    finally:
+        _record_usage(
+            schema_name, TokenUsage(seconds=time.perf_counter() - started), usage
+        )
+    _write_output(output_path, extracted_data, langfuse)
+    return extracted_data
 
-            output_dict = response.output_parsed.model_dump(mode="json")
 
-            with open(output_path, "w") as file:
-                output_dict_with_trace = output_dict.copy()
-                output_dict_with_trace["tracing_id"] = langfuse.get_current_trace_id()
-                file.write(
-                    json.dumps(output_dict_with_trace, indent=2, ensure_ascii=False)
-                )
+@observe(name="extract_single_schema")
+async def aextract_single_schema(
+    schema_name: str,
+    case_txt: str,
+    judgement_type: str,
+    client: AsyncOpenAI,
+    previous_extractions: dict[str, Any] | None = None,
+    deadline: Deadline | None = None,
+    usage: UsageMeter | None = None,
+) -> ExtractionModel:
+    async def call() -> ExtractionModel:
+        state = RetryState(
+            schema_name, case_txt, judgement_type, previous_extractions, usage
+        )
+        retry = RetryBudget(deadline=deadline)
+        hedger = get_hedger()
+        while True:
+            try:
+                request = state.request(retry.attempts)
+
+                async def send(request: dict[str, Any] = request) -> Response:
+                    # Timed from when the call got its slot, not from when it
+                    # started waiting for one.
+                    timeout = retry.call_timeout()
+                    with RUN_PROFILE.time(f"llm.{schema_name}"):
+                        return await client.responses.create(**request, timeout=timeout)
+
+                async def send_and_parse() -> ExtractionModel:
+                    return state.parse(await send())
 
-            return response.output_parsed
-        except (OpenAIError, ValidationError, ValueError) as exc:
-            last_error = str(exc)
-            if attempt == MAX_RETRIES - 1:
-                print(
-                    f"Failed to extract {schema_name} for {judgement_type} after {MAX_RETRIES} attempts: {last_error}"
+                if hedger is not None:
+                    # The hedger takes the governor slot for each request.
+                    return await hedger.arun(schema_name, send_and_parse)
+                queued = time.perf_counter()
+                async with get_governor().aslot():
+                    RUN_PROFILE.record("llm.queue", time.perf_counter() - queued)
+                    response = await send()
+                return state.parse(response)
+            except DeadlineExceeded as exc:
+                _report_failure(
+                    schema_name,
+                    judgement_type,
+                    retry.attempts,
+                    f"{exc} Last error: {state.last_error}"
+                    if state.last_error
+                    else str(exc),
                 )
                 raise
+            except (OpenAIError, ValidationError, ValueError) as exc:
+                state.failed(exc)
+                delay = retry.next_delay(exc)
+                if delay is None:
+                    _report_failure(
+                        schema_name, judgement_type, retry.attempts, str(exc)
+                    )
+                    raise
+            with RUN_PROFILE.time(f"retry_wait.{schema_name}"):
+                await asyncio.sleep(delay)
+
+    cache = get_response_cache()
+    started = time.perf_counter()
+    try:
+        with RUN_PROFILE.time(f"schema.{schema_name}"):
+            if cache is None:
+                return await call()
+            return await cache.aget_or_compute(
+                _cache_key(cache, schema_name, case_txt, previous_extractions),
+                SCHEMA_CONFIGS[schema_name]["model"],
+                call,
+            )
+    finally:
+        _record_usage(
+            schema_name, TokenUsage(seconds=time.perf_counter() - started), usage
+        )
+
 
-    raise RuntimeError(f"Failed to extract {schema_name}.")
+_stage_executor_lock = threading.Lock()
+_stage_executor: ThreadPoolExecutor | None = None
+
+
+def get_stage_executor() -> ThreadPoolExecutor:
+    """Return the process-wide pool running the calls of a stage in parallel.
+
+    Every judgement shares it, and it has a thread for each LLM call the
+    governor may let through, since more would only wait for a slot.
+    """
+    global _stage_executor
+    with _stage_executor_lock:
+        if _stage_executor is None:
+            _stage_executor = ThreadPoolExecutor(
+                max_workers=EXTRACT_LLM_MAX_IN_FLIGHT, thread_name_prefix="stage"
+            )
+        return _stage_executor
 
 
 @observe(name="extract_all_features")
@@ -126,6 +661,9 @@ def extract_all_features(
     judgement_type: str,
     client: OpenAI,
     langfuse: Langfuse,
+    schema_case_texts: dict[str, str] | None = None,
+    chunks: list[str] | None = None,
+    usage: UsageMeter | None = None,
 ) -> tuple[Judgement, Defendants, Trials, str | None]:
     langfuse.update_current_trace(
         input={"judgement_type": judgement_type, "model": MODEL},
@@ -134,24 +672,135 @@ def extract_all_features(
 
     previous_extractions: dict[str, Any] = {}
     extracted_by_schema: dict[str, ExtractionModel] = {}
+    deadline = Deadline(DEFAULT_RETRY_POLICY.judgement_deadline)
+    schema_case_texts = schema_case_texts or {}
+    chunks = chunks or []
 
-    for schema_name in tqdm(
-        EXTRACTION_ORDER, desc="Schemas", leave=False, file=sys.stdout
-    ):
-        extracted_data = extract_single_schema(
-            schema_name=schema_name,
-            case_txt=case_txt,
+    def extract(call: SchemaCall) -> ExtractionModel:
+        return extract_single_schema(
+            schema_name=call.request_schema,
+            case_txt=call.case_txt,
             judgement_type=judgement_type,
             output_path=os.devnull,
             client=client,
             langfuse=langfuse,
-            previous_extractions=previous_extractions if previous_extractions else None,
+            previous_extractions=call.previous_extractions,
+            deadline=deadline,
+            usage=usage,
         )
-        extracted_by_schema[schema_name] = extracted_data
 
-        if schema_name == "judgement":
-            previous_extractions["defendants"] = extracted_data.defendants
-            previous_extractions["charge_to_defendants"] = extracted_data.charges
+    with tqdm(total=0, desc="Schemas", leave=False, file=sys.stdout) as progress:
+
+        def run_stage(
+            stage: list[str], chunks: list[str]
+        ) -> dict[str, ExtractionModel]:
+            calls = plan_stage(
+                stage, case_txt, schema_case_texts, chunks, previous_extractions
+            )
+            progress.total += len(calls)
+            progress.refresh()
+            if len(calls) == 1:
+                results = [extract(calls[0])]
+                progress.update()
+            else:
+                # Threads don't inherit contextvars, so each one gets a copy of
+                # the current context to keep its spans under this trace.
+                executor = get_stage_executor()
+                futures = [
+                    executor.submit(contextvars.copy_context().run, extract, call)
+                    for call in calls
+                ]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                        progress.update()
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+                results = [future.result() for future in futures]
+            return collect_stage(stage, calls, results)
+
+        for stage in EXTRACTION_STAGES:
+            try:
+                extracted_by_schema.update(run_stage(stage, chunks))
+            except ChunkMismatchError as exc:
+                _report_chunk_fallback(stage, exc)
+                chunks = []
+                extracted_by_schema.update(run_stage(stage, chunks))
+            for schema_name in stage:
+                record_extraction(
+                    previous_extractions,
+                    schema_name,
+                    extracted_by_schema[schema_name],
+                )
+
+    langfuse.update_current_trace(
+        output={"schemas_extracted": list(previous_extractions.keys())}
+    )
+
+    return (
+        extracted_by_schema["judgement"],
+        extracted_by_schema["defendants"],
+        extracted_by_schema["trials"],
+        langfuse.get_current_trace_id(),
+    )
+
+
+@observe(name="extract_all_features")
+async def aextract_all_features(
+    case_txt: str,
+    judgement_type: str,
+    client: AsyncOpenAI,
+    langfuse: Langfuse,
+    schema_case_texts: dict[str, str] | None = None,
+    chunks: list[str] | None = None,
+    usage: UsageMeter | None = None,
+) -> tuple[Judgement, Defendants, Trials, str | None]:
+    langfuse.update_current_trace(
+        input={"judgement_type": judgement_type, "model": MODEL},
+        tags=["feature-extraction"],
+    )
+
+    previous_extractions: dict[str, Any] = {}
+    extracted_by_schema: dict[str, ExtractionModel] = {}
+    deadline = Deadline(DEFAULT_RETRY_POLICY.judgement_deadline)
+    schema_case_texts = schema_case_texts or {}
+    chunks = chunks or []
+
+    async def run_stage(
+        stage: list[str], chunks: list[str]
+    ) -> dict[str, ExtractionModel]:
+        calls = plan_stage(
+            stage, case_txt, schema_case_texts, chunks, previous_extractions
+        )
+        results = await asyncio.gather(
+            *(
+                aextract_single_schema(
+                    schema_name=call.request_schema,
+                    case_txt=call.case_txt,
+                    judgement_type=judgement_type,
+                    client=client,
+                    previous_extractions=call.previous_extractions,
+                    deadline=deadline,
+                    usage=usage,
+                )
+                for call in calls
+            )
+        )
+        return collect_stage(stage, calls, results)
+
+    for stage in EXTRACTION_STAGES:
+        try:
+            extracted_by_schema.update(await run_stage(stage, chunks))
+        except ChunkMismatchError as exc:
+            _report_chunk_fallback(stage, exc)
+            chunks = []
+            extracted_by_schema.update(await run_stage(stage, chunks))
+        for schema_name in stage:
+            record_extraction(
+                previous_extractions, schema_name, extracted_by_schema[schema_name]
+            )
 
     langfuse.update_current_trace(
         output={"schemas_extracted": list(previous_extractions.keys())}
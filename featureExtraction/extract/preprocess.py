@@ -0,0 +1,207 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from .sections import build_case_texts
+from .timing import RUN_PROFILE
+
+# What converting malformed or unexpected HTML can raise. It fails that
+# judgement; anything else, such as a broken process pool, ends the run.
+RENDER_ERRORS = (AttributeError, LookupError, RecursionError, TypeError, ValueError)
+
+
+@dataclass(frozen=True)
+class RenderedJudgement:
+    judgement_doc: dict
+    case_txt: str
+    judgement_type: str
+    # Shorter case text for schemas that don't need all of it; see
+    # ``build_case_texts``.
+    schema_case_texts: dict[str, str] = field(default_factory=dict)
+    # The case text in chunks, when it is too long to extract in one call.
+    chunks: list[str] = field(default_factory=list)
+    # Why the HTML could not be converted; the case texts are then empty.
+    error: str | None = None
+
+
+def render_case_text(
+    judgement_doc: dict,
+) -> tuple[str, str, dict[str, str], list[str], float]:
+    """Build the case text in a worker process and report how long it took."""
+    started = time.perf_counter()
+    case_txt, judgement_type, schema_case_texts, chunks = build_case_texts(
+        judgement_doc
+    )
+    return (
+        case_txt,
+        judgement_type,
+        schema_case_texts,
+        chunks,
+        time.perf_counter() - started,
+    )
+
+
+def failed_render(judgement_doc: dict, exc: Exception) -> RenderedJudgement:
+    return RenderedJudgement(
+        judgement_doc, "", "", error=f"{type(exc).__name__}: {exc}"
+    )
+
+
+def create_process_pool(workers: int) -> ProcessPoolExecutor:
+    # The runner already has MongoDB and HTTP threads running, which a forked
+    # child would inherit in an arbitrary state. The fork server imports the
+    # HTML parsing modules once, so workers start without re-importing them.
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+class RenderStage:
+    """Convert judgement HTML to case text in a process pool.
+
+    Parsing judgement HTML is CPU-bound and holds the GIL, so rendering
+    inside the LLM worker threads serialises it across all of them. This
+    stage renders on every core instead and keeps at most ``queue_size``
+    rendered judgements waiting for the LLM workers (plus one in progress per
+    process), so it runs ahead of them without holding the whole corpus in
+    memory. With no workers, ``results`` renders in the calling thread.
+    """
+
+    def __init__(self, workers: int, queue_size: int) -> None:
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.rendered = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.waited_seconds = 0.0
+        self.ready_total = 0
+        self.ready_max = 0
+        self.started: float | None = None
+        self.stopped: float | None = None
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending: dict[Future, dict] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "RenderStage":
+        if self.workers:
+            self._executor = create_process_pool(self.workers)
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stopped = time.monotonic()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _record(
+        self,
+        judgement_doc: dict,
+        rendered: tuple[str, str, dict[str, str], list[str], float],
+        ready: int,
+    ) -> RenderedJudgement:
+        case_txt, judgement_type, schema_case_texts, chunks, seconds = rendered
+        RUN_PROFILE.record("case_text", seconds)
+        with self._lock:
+            self.rendered += 1
+            self.busy_seconds += seconds
+            self.ready_total += ready
+            self.ready_max = max(self.ready_max, ready)
+        return RenderedJudgement(
+            judgement_doc, case_txt, judgement_type, schema_case_texts, chunks
+        )
+
+    def _failed(self, judgement_doc: dict, exc: Exception) -> RenderedJudgement:
+        with self._lock:
+            self.failed += 1
+        return failed_render(judgement_doc, exc)
+
+    async def arender(self, judgement_doc: dict) -> RenderedJudgement:
+        """Render one judgement from an event loop without blocking it."""
+        assert self._executor is not None, "RenderStage must be entered first."
+        started = time.monotonic()
+        try:
+            rendered = await asyncio.get_running_loop().run_in_executor(
+                self._executor, render_case_text, judgement_doc
+            )
+        except RENDER_ERRORS as exc:
+            return self._failed(judgement_doc, exc)
+        finally:
+            waited = time.monotonic() - started
+            RUN_PROFILE.record("render.wait", waited)
+            with self._lock:
+                self.waited_seconds += waited
+        return self._record(judgement_doc, rendered, ready=0)
+
+    def results(self, docs: Iterable[dict]) -> Iterator[RenderedJudgement]:
+        """Yield rendered judgements in the order they finish rendering.
+
+        A judgement whose HTML cannot be converted is yielded with ``error``
+        set rather than ending the run.
+        """
+        assert self.started is not None, "RenderStage must be entered first."
+        if self._executor is None:
+            for judgement_doc in docs:
+                try:
+                    rendered = render_case_text(judgement_doc)
+                except RENDER_ERRORS as exc:
+                    yield self._failed(judgement_doc, exc)
+                    continue
+                yield self._record(judgement_doc, rendered, ready=0)
+            return
+        docs = iter(docs)
+        exhausted = False
+        while True:
+            while not exhausted and len(self._pending) < self.capacity:
+                judgement_doc = next(docs, None)
+                if judgement_doc is None:
+                    exhausted = True
+                    break
+                future = self._executor.submit(render_case_text, judgement_doc)
+                self._pending[future] = judgement_doc
+            if not self._pending:
+                return
+
+            done = [future for future in self._pending if future.done()]
+            if not done:
+                # Every rendered judgement has been taken: the LLM workers are
+                # waiting on this stage.
+                waited = time.monotonic()
+                finished, _ = wait(self._pending, return_when=FIRST_COMPLETED)
+                waited = time.monotonic() - waited
+                RUN_PROFILE.record("render.wait", waited)
+                with self._lock:
+                    self.waited_seconds += waited
+                done = list(finished)
+            future = done[0]
+            judgement_doc = self._pending.pop(future)
+            try:
+                rendered = future.result()
+            except RENDER_ERRORS as exc:
+                yield self._failed(judgement_doc, exc)
+                continue
+            yield self._record(judgement_doc, rendered, len(done))
+
+    def utilisation(self) -> float:
+        if self.started is None:
+            return 0.0
+        elapsed = (self.stopped or time.monotonic()) - self.started
+        if elapsed <= 0:
+            return 0.0
+        return self.busy_seconds / (elapsed * max(self.workers, 1))
+
+    def summary(self) -> str:
+        with self._lock:
+            rendered, failed, waited = self.rendered, self.failed, self.waited_seconds
+            ready_mean = self.ready_total / rendered if rendered else 0.0
+            ready_max = self.ready_max
+        return (
+            f"Render stage: processes={self.workers}, rendered={rendered}, "
+            f"failed={failed}, "
+            f"utilisation={self.utilisation():.0%}, "
+            f"ready queue mean={ready_mean:.1f} max={ready_max}, "
+            f"consumers waited {waited:.1f}s for case text"
+        )
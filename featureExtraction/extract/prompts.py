@@ -1,4 +1,6 @@
 from schema import Defendants, Judgement, Trials
+from schema.defendants import DefendantProfile
+from schema.trials import Trial
 
 PREPEND = "You are Judgement Information Extraction Bot: extract only objective, non-opinionated case metadata for an academic social-science study that improves public welfare;\n\n"
 
@@ -35,6 +37,52 @@ SCHEMA_CONFIGS = {
             "but check the case text thoroughly."
         ),
     },
+    # One item of "defendants" or "trials" per call; see extract/fanout.py.
+    "defendant": {
+        "model": DefendantProfile,
+        "prompt": PREPEND
+        + (
+            "Extract the information of one defendant according to the provided schema: "
+            "defendant {defendant_id}. {defendant_name}. "
+            "The other defendants are extracted separately, so use only what the judgement says about this defendant. "
+            "If a feature is not mentioned in the case, set the corresponding field to null, "
+            "but check the case text thoroughly."
+        ),
+    },
+    "trial": {
+        "model": Trial,
+        "prompt": PREPEND
+        + (
+            "Extract the trial information according to the provided schema for one charge to defendant pair only: "
+            "Charge {charge_no}. {charge_name} -> On Defendant {defendant_id}: {defendant_name}. "
+            "The other pairs are extracted separately. "
+            "If a feature is not mentioned in the case, set the corresponding field to null, "
+            "but check the case text thoroughly."
+        ),
+    },
 }
 
+REPAIR_PROMPT = (
+    "Your previous output for this schema failed validation. "
+    "Return a corrected object that satisfies the schema and fixes every listed error. "
+    "Keep all other values unchanged unless an error requires changing them, and do not invent facts."
+)
+
+# Put before each chunk of a judgement too long to extract in one call.
+CHUNK_NOTE = (
+    "The case text below is part {part} of {parts} of a long judgement, "
+    "with the judgement header repeated at the top of every part. "
+    "Keep every charge and defendant listed in the header, in the same order, "
+    "and take all other details only from this part, setting anything it does not mention to null. "
+    "Leave out charge to defendant pairs whose sentence this part does not discuss. "
+    "The parts are merged afterwards.\n\n"
+)
+
 EXTRACTION_ORDER = ["judgement", "defendants", "trials"]
+
+# Schemas whose outputs are needed to build each schema's prompt.
+SCHEMA_DEPENDENCIES: dict[str, list[str]] = {
+    "judgement": [],
+    "defendants": ["judgement"],
+    "trials": ["judgement"],
+}
@@ -0,0 +1,185 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+import openai
+from pydantic import ValidationError
+
+from .config import (
+    EXTRACT_CALL_TIMEOUT_SECONDS,
+    EXTRACT_JUDGEMENT_DEADLINE_SECONDS,
+    EXTRACT_RATE_LIMIT_RETRIES,
+    EXTRACT_REFUSAL_RETRIES,
+    EXTRACT_RETRY_BASE_SECONDS,
+    EXTRACT_RETRY_MAX_SECONDS,
+    EXTRACT_TRANSPORT_RETRIES,
+    MAX_RETRIES,
+)
+from .governor import parse_duration
+
+ERROR_TRANSPORT = "transport"
+ERROR_RATE_LIMIT = "rate_limit"
+ERROR_REFUSAL = "refusal"
+ERROR_VALIDATION = "validation"
+ERROR_FATAL = "fatal"
+
+# Errors that are worth waiting out; the others are retried immediately.
+BACKOFF_ERRORS = {ERROR_TRANSPORT, ERROR_RATE_LIMIT}
+RETRYABLE_STATUS_CODES = {408, 409}
+
+
+class RefusalError(ValueError):
+    pass
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def classify_error(exc: BaseException) -> str:
+    if isinstance(exc, openai.RateLimitError):
+        return ERROR_RATE_LIMIT
+    if isinstance(exc, (openai.APIConnectionError, openai.InternalServerError)):
+        return ERROR_TRANSPORT
+    if isinstance(exc, openai.APIStatusError):
+        if exc.status_code in RETRYABLE_STATUS_CODES:
+            return ERROR_TRANSPORT
+        # Bad requests, authentication and missing models won't fix themselves.
+        return ERROR_FATAL
+    if isinstance(exc, RefusalError):
+        return ERROR_REFUSAL
+    if isinstance(exc, (ValidationError, ValueError)):
+        return ERROR_VALIDATION
+    return ERROR_FATAL
+
+
+def _retry_after(exc: BaseException) -> float | None:
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    retry_after_ms = response.headers.get("retry-after-ms")
+    if retry_after_ms is not None:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    return parse_duration(response.headers.get("retry-after"))
+
+
+class Deadline:
+    """Time budget for extracting every schema of one judgement."""
+
+    def __init__(self, seconds: float) -> None:
+        self.expires_at = time.monotonic() + seconds if seconds > 0 else None
+
+    def remaining(self) -> float | None:
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    budgets: dict[str, int]
+    base_delay: float
+    max_delay: float
+    call_timeout: float
+    judgement_deadline: float
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy(
+    budgets={
+        ERROR_TRANSPORT: EXTRACT_TRANSPORT_RETRIES,
+        ERROR_RATE_LIMIT: EXTRACT_RATE_LIMIT_RETRIES,
+        ERROR_REFUSAL: EXTRACT_REFUSAL_RETRIES,
+        ERROR_VALIDATION: MAX_RETRIES - 1,
+        ERROR_FATAL: 0,
+    },
+    base_delay=EXTRACT_RETRY_BASE_SECONDS,
+    max_delay=EXTRACT_RETRY_MAX_SECONDS,
+    call_timeout=EXTRACT_CALL_TIMEOUT_SECONDS,
+    judgement_deadline=EXTRACT_JUDGEMENT_DEADLINE_SECONDS,
+)
+
+
+class ErrorCounter:
+    """Thread-safe counts of failed calls per error class for the whole run."""
+
+    def __init__(self) -> None:
+        self._failed: dict[str, int] = {}
+        self._retried: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, retried: bool) -> None:
+        with self._lock:
+            self._failed[kind] = self._failed.get(kind, 0) + 1
+            if retried:
+                self._retried[kind] = self._retried.get(kind, 0) + 1
+
+    def snapshot(self) -> dict[str, tuple[int, int]]:
+        """(failed, retried) per error class."""
+        with self._lock:
+            return {
+                kind: (failed, self._retried.get(kind, 0))
+                for kind, failed in self._failed.items()
+            }
+
+
+RUN_ERRORS = ErrorCounter()
+
+
+class RetryBudget:
+    """Retry bookkeeping for one schema extraction.
+
+    Each kind of error has its own allowance, so schema validation retries
+    never use up the retries meant for network failures or rate limits.
+    Transport errors and rate limits back off exponentially with full jitter
+    (never less than the provider's ``retry-after``); validation failures and
+    refusals are retried straight away since waiting won't change the answer.
+    """
+
+    def __init__(
+        self,
+        policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+        deadline: Deadline | None = None,
+    ) -> None:
+        self.policy = policy
+        self.deadline = deadline
+        self.retries = dict.fromkeys(policy.budgets, 0)
+        self.attempts = 0
+
+    def call_timeout(self) -> float:
+        """Timeout for the next call, or DeadlineExceeded if there is no time left."""
+        remaining = self.deadline.remaining() if self.deadline else None
+        if remaining is None:
+            return self.policy.call_timeout
+        if remaining <= 0:
+            raise DeadlineExceeded("Judgement extraction deadline exceeded.")
+        return min(self.policy.call_timeout, remaining)
+
+    def next_delay(self, exc: BaseException) -> float | None:
+        """Seconds to wait before retrying after ``exc``, or None to give up."""
+        self.attempts += 1
+        kind = classify_error(exc)
+        delay = self._delay(kind, exc)
+        RUN_ERRORS.record(kind, retried=delay is not None)
+        return delay
+
+    def _delay(self, kind: str, exc: BaseException) -> float | None:
+        if self.retries[kind] >= self.policy.budgets[kind]:
+            return None
+        self.retries[kind] += 1
+
+        delay = 0.0
+        if kind in BACKOFF_ERRORS:
+            cap = min(
+                self.policy.max_delay,
+                self.policy.base_delay * 2 ** (self.retries[kind] - 1),
+            )
+            delay = max(random.uniform(0, cap), _retry_after(exc) or 0.0)
+
+        remaining = self.deadline.remaining() if self.deadline else None
+        if remaining is not None and delay >= remaining:
+            return None
+        return delay
@@ -1,21 +1,81 @@
+import argparse
+import asyncio
+import sys
+from collections.abc import Callable, Iterable, Iterator
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
 from dataclasses import dataclass
-import sys
 from typing import Any
 
+from openai import OpenAIError
+from pydantic import ValidationError
 from pymongo.collection import Collection
+from pymongo.errors import PyMongoError
 from tqdm import tqdm
 
-from .case_text import build_case_text
-from .client import create_db, create_langfuse, create_openai_client
+from schema import Defendants, Judgement, Trials
+
+from .cache import get_response_cache
+from .client import (
+    close_clients,
+    create_db,
+    get_governor,
+    get_langfuse,
+    get_openai_client,
+)
+from .compact import RUN_COMPACTION
 from .config import (
     EXTRACT_CONCURRENCY,
+    EXTRACT_DASHBOARD_SECONDS,
+    EXTRACT_LEASE_MAX_ATTEMPTS,
+    EXTRACT_LEASE_RETRY_SECONDS,
+    EXTRACT_LEASE_SECONDS,
     EXTRACT_LIMIT,
+    EXTRACT_MAX_INFLIGHT_BYTES,
+    EXTRACT_QUEUE_SIZE,
+    EXTRACT_RENDER_PROCESSES,
+    EXTRACT_RENDER_QUEUE_SIZE,
+    EXTRACT_SPILL_DIR,
+    EXTRACT_WRITE_BATCH_SIZE,
+    EXTRACT_WRITE_FLUSH_SECONDS,
     MODEL,
     MUST_INCLUDE_TRIALS,
     RERUN_ALL,
 )
+from .dashboard import Dashboard
+from .feed import BoundedFeed, judgement_doc_size
+from .hedge import get_hedger
+from .lease import LeaseQueue, backfill_lease_status
 from .pipeline import extract_all_features
+from .preprocess import (
+    RENDER_ERRORS,
+    RenderedJudgement,
+    RenderStage,
+    failed_render,
+)
+from .sections import RUN_SECTIONS, build_case_texts
+from .timing import RUN_PROFILE, report_profile
+from .usage import RUN_BUDGET, RUN_USAGE, UsageMeter
+from .writer import BulkWriter
+
+# What extracting and storing one judgement can raise: provider and database
+# failures, outputs that never validate, an expired deadline and output files
+# that cannot be written. They fail that judgement; any other exception is a
+# bug and ends the run rather than failing every judgement the same way.
+JUDGEMENT_ERRORS = (OpenAIError, PyMongoError, ValidationError, ValueError, OSError)
+
+# _ids read per query by --stream; only the pending ones are then fetched whole.
+STREAM_ID_PAGE_SIZE = 1000
+
+JUDGEMENT_PROJECTION = {
+    "_id": 1,
+    "trial": 1,
+    "appeal": 1,
+    "corrigendum": 1,
+    "html": 1,
+    "appeal_html": 1,
+    "corrigendum_html": 1,
+}
 
 
 @dataclass(frozen=True)
@@ -25,6 +85,41 @@ class ProcessResult:
     message: str | None = None
 
 
+@dataclass(frozen=True)
+class WorkPlan:
+    docs: Iterable[dict]
+    judgement_count: int
+    must_include_count: int
+    progress_total: int
+    # Combined HTML size of the planned judgements, when known up front.
+    total_bytes: int | None = None
+
+
+@dataclass
+class RunSummary:
+    processed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    first_insert_logged: bool = False
+
+    def record(self, result: ProcessResult) -> None:
+        if result.message:
+            tqdm.write(result.message)
+
+        if result.status == "processed":
+            self.processed += 1
+            if not self.first_insert_logged:
+                tqdm.write(
+                    f"Inserted extracted features for source {result.source_id} into llm-extracted features."
+                )
+                self.first_insert_logged = True
+        elif result.status == "skipped":
+            self.skipped += 1
+        else:
+            self.failed += 1
+            tqdm.write(f"Failed to process source {result.source_id}: {result.message}")
+
+
 def should_skip_extraction(
     source_id: Any, extracted_features_collection: Collection
 ) -> bool:
@@ -44,29 +139,44 @@ def build_must_include_filter(must_include_trials: list[str]) -> dict | None:
     return {"trial": {"$in": must_include_trials}}
 
 
-def build_docs_to_process(
+def build_normal_filter(base_filter: dict, must_include_ids: list[Any]) -> dict:
+    if not must_include_ids:
+        return base_filter.copy()
+    return {"$and": [base_filter, {"_id": {"$nin": must_include_ids}}]}
+
+
+def build_docs_filters(
     judgements_collection: Collection, extracted_features_collection: Collection
-) -> tuple[list[dict], int]:
+) -> tuple[dict | None, dict]:
     base_filter = {
         "_id": {"$nin": extracted_features_collection.distinct("source_judgement_id")}
     }
     must_include_filter = build_must_include_filter(MUST_INCLUDE_TRIALS)
+    if not must_include_filter:
+        return None, base_filter
+
+    priority_filter = {"$and": [base_filter, must_include_filter]}
+    must_include_ids = [
+        doc["_id"] for doc in judgements_collection.find(priority_filter, {"_id": 1})
+    ]
+    return priority_filter, build_normal_filter(base_filter, must_include_ids)
+
+
+def build_docs_to_process(
+    judgements_collection: Collection, extracted_features_collection: Collection
+) -> tuple[list[dict], int]:
+    priority_filter, normal_filter = build_docs_filters(
+        judgements_collection, extracted_features_collection
+    )
 
     must_include_docs: list[dict] = []
-    if must_include_filter:
+    if priority_filter:
         must_include_docs = list(
-            judgements_collection.find({"$and": [base_filter, must_include_filter]})
+            judgements_collection.find(priority_filter, JUDGEMENT_PROJECTION)
         )
 
-    must_include_ids = {doc["_id"] for doc in must_include_docs if doc.get("_id")}
-    normal_filter: dict[str, Any] = base_filter.copy()
-    if must_include_ids:
-        normal_filter = {
-            "$and": [base_filter, {"_id": {"$nin": list(must_include_ids)}}]
-        }
-
     normal_total = judgements_collection.count_documents(normal_filter)
-    cursor = judgements_collection.find(normal_filter)
+    cursor = judgements_collection.find(normal_filter, JUDGEMENT_PROJECTION)
     if EXTRACT_LIMIT > 0:
         cursor = cursor.limit(EXTRACT_LIMIT)
 
@@ -74,9 +184,143 @@ def build_docs_to_process(
     return docs_to_process, normal_total + len(must_include_docs)
 
 
+def iter_pending_docs(
+    judgements_collection: Collection,
+    extracted_features_collection: Collection,
+    docs_filter: dict,
+    batch_size: int,
+    limit: int = 0,
+) -> Iterator[dict]:
+    """Yield judgements matching ``docs_filter`` that have no extracted features.
+
+    The collection is read in ``_id`` order a page of ``_id``s at a time: the
+    ids already extracted are dropped, and the rest are fetched ``batch_size``
+    documents at a time. Each query is read to the end before its documents
+    are handed out, so no cursor sits idle while they are processed and can
+    time out, and the next page starts after the last ``_id`` seen.
+    """
+    last_id = None
+    yielded = 0
+    while True:
+        page_filter = (
+            docs_filter
+            if last_id is None
+            else {"$and": [docs_filter, {"_id": {"$gt": last_id}}]}
+        )
+        ids = [
+            doc["_id"]
+            for doc in judgements_collection.find(
+                page_filter, {"_id": 1}, sort=[("_id", 1)], limit=STREAM_ID_PAGE_SIZE
+            )
+        ]
+        if not ids:
+            return
+        last_id = ids[-1]
+        extracted = set(
+            extracted_features_collection.distinct(
+                "source_judgement_id", {"source_judgement_id": {"$in": ids}}
+            )
+        )
+        pending = [source_id for source_id in ids if source_id not in extracted]
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start : start + batch_size]
+            if limit > 0:
+                batch = batch[: limit - yielded]
+            docs = list(
+                judgements_collection.find(
+                    {"_id": {"$in": batch}}, JUDGEMENT_PROJECTION, sort=[("_id", 1)]
+                )
+            )
+            yield from docs
+            yielded += len(docs)
+            if limit > 0 and yielded >= limit:
+                return
+
+
+def stream_docs_to_process(
+    judgements_collection: Collection, extracted_features_collection: Collection
+) -> tuple[Iterator[dict], int, int]:
+    """Stream the judgements to extract, must-include trials first.
+
+    Unlike build_docs_to_process this never scans the extracted collection up
+    front, so the judgement count is estimated from the collection sizes.
+    """
+    batch_size = EXTRACT_CONCURRENCY + EXTRACT_QUEUE_SIZE
+    must_include_filter = build_must_include_filter(MUST_INCLUDE_TRIALS)
+
+    must_include_count = 0
+    normal_filter: dict = {}
+    must_include_done = 0
+    if must_include_filter:
+        must_include_ids = [
+            doc["_id"]
+            for doc in judgements_collection.find(must_include_filter, {"_id": 1})
+        ]
+        must_include_done = len(
+            extracted_features_collection.distinct(
+                "source_judgement_id",
+                {"source_judgement_id": {"$in": must_include_ids}},
+            )
+        )
+        must_include_count = len(must_include_ids) - must_include_done
+        normal_filter = {"trial": {"$nin": MUST_INCLUDE_TRIALS}}
+        normal_total = judgements_collection.estimated_document_count() - len(
+            must_include_ids
+        )
+    else:
+        normal_total = judgements_collection.estimated_document_count()
+    normal_total -= (
+        extracted_features_collection.estimated_document_count() - must_include_done
+    )
+
+    def docs() -> Iterator[dict]:
+        if must_include_filter:
+            yield from iter_pending_docs(
+                judgements_collection,
+                extracted_features_collection,
+                must_include_filter,
+                batch_size,
+            )
+        yield from iter_pending_docs(
+            judgements_collection,
+            extracted_features_collection,
+            normal_filter,
+            batch_size,
+            EXTRACT_LIMIT,
+        )
+
+    return docs(), max(normal_total, 0) + must_include_count, must_include_count
+
+
+def build_extracted_doc(
+    judgement_doc: dict,
+    judgement_type: str,
+    judgement_data: Judgement,
+    defendants_data: Defendants,
+    trials_data: Trials,
+    trace_id: str | None,
+    usage: UsageMeter | None = None,
+) -> dict:
+    return {
+        "source_judgement_id": judgement_doc.get("_id"),
+        "trial": judgement_doc.get("trial"),
+        "appeal": judgement_doc.get("appeal"),
+        "corrigendum": judgement_doc.get("corrigendum"),
+        "judgement": judgement_data.model_dump(mode="json"),
+        "defendants": defendants_data.model_dump(mode="json"),
+        "trials": trials_data.model_dump(mode="json"),
+        "model": MODEL,
+        "judgement_type": judgement_type,
+        "trace_id": trace_id,
+        "usage": usage.to_record() if usage is not None else None,
+    }
+
+
 def process_judgement_doc(
     judgement_doc: dict,
     extracted_features_collection: Collection,
+    writer: BulkWriter | None = None,
+    rendered: RenderedJudgement | None = None,
 ) -> ProcessResult:
     source_id = judgement_doc.get("_id")
     if source_id is None:
@@ -85,16 +329,38 @@ def process_judgement_doc(
     if should_skip_extraction(source_id, extracted_features_collection):
         return ProcessResult(status="skipped", source_id=source_id)
 
-    case_txt, judgement_type = build_case_text(judgement_doc)
+    if rendered is None:
+        with RUN_PROFILE.time("case_text"):
+            try:
+                rendered = RenderedJudgement(
+                    judgement_doc, *build_case_texts(judgement_doc)
+                )
+            except RENDER_ERRORS as exc:
+                rendered = failed_render(judgement_doc, exc)
+    if rendered.error is not None:
+        return ProcessResult(
+            status="failed",
+            source_id=source_id,
+            message=f"Failed to convert {source_id} to case text: {rendered.error}",
+        )
+    case_txt, judgement_type = rendered.case_txt, rendered.judgement_type
+    schema_case_texts, chunks = rendered.schema_case_texts, rendered.chunks
     if not case_txt:
         return ProcessResult(
             status="skipped",
             source_id=source_id,
             message=f"Skipping {source_id}: empty html content",
         )
+    RUN_SECTIONS.record(case_txt, schema_case_texts)
+    case_txt = RUN_COMPACTION.apply(case_txt)
+    schema_case_texts = RUN_COMPACTION.apply_to_schemas(schema_case_texts)
+    chunks = RUN_COMPACTION.apply_to_chunks(chunks)
+    if chunks:
+        tqdm.write(f"Extracting {source_id} in {len(chunks)} chunks.")
 
-    client = create_openai_client()
-    langfuse = create_langfuse()
+    client = get_openai_client()
+    langfuse = get_langfuse()
+    usage = UsageMeter()
 
     try:
         judgement_data, defendants_data, trials_data, trace_id = extract_all_features(
@@ -102,84 +368,351 @@ def process_judgement_doc(
             judgement_type=judgement_type,
             client=client,
             langfuse=langfuse,
+            schema_case_texts=schema_case_texts,
+            chunks=chunks,
+            usage=usage,
         )
-        extracted_doc = {
-            "source_judgement_id": source_id,
-            "trial": judgement_doc.get("trial"),
-            "appeal": judgement_doc.get("appeal"),
-            "corrigendum": judgement_doc.get("corrigendum"),
-            "judgement": judgement_data.model_dump(mode="json"),
-            "defendants": defendants_data.model_dump(mode="json"),
-            "trials": trials_data.model_dump(mode="json"),
-            "model": MODEL,
-            "judgement_type": judgement_type,
-            "trace_id": trace_id,
-        }
-        extracted_features_collection.insert_one(extracted_doc)
-        langfuse.flush()
+        extracted_doc = build_extracted_doc(
+            judgement_doc,
+            judgement_type,
+            judgement_data,
+            defendants_data,
+            trials_data,
+            trace_id,
+            usage,
+        )
+        if writer is not None:
+            writer.add(extracted_doc)
+        else:
+            with RUN_PROFILE.time("db.insert"):
+                extracted_features_collection.insert_one(extracted_doc)
         return ProcessResult(status="processed", source_id=source_id)
-    except Exception as exc:
-        langfuse.flush()
+    except JUDGEMENT_ERRORS as exc:
         return ProcessResult(status="failed", source_id=source_id, message=str(exc))
 
 
+def _item_size(item: dict | RenderedJudgement) -> int:
+    if isinstance(item, RenderedJudgement):
+        return (
+            judgement_doc_size(item.judgement_doc)
+            + len(item.case_txt)
+            + sum(len(case_txt) for case_txt in item.schema_case_texts.values())
+            + sum(len(chunk) for chunk in item.chunks)
+        )
+    return judgement_doc_size(item)
+
+
+def settle_lease(
+    lease: LeaseQueue, result: ProcessResult, bulk_write: bool = False
+) -> None:
+    if result.source_id is None:
+        return
+    if result.status == "failed":
+        lease.fail(result.source_id, result.message)
+    elif result.status == "processed" and bulk_write:
+        # Still in the writer's buffer; complete_written settles it after the
+        # insert, and until then the heartbeat keeps the claim.
+        return
+    else:
+        lease.complete(result.source_id)
+
+
+def complete_written(lease: LeaseQueue) -> Callable[[list[dict]], object]:
+    def on_written(docs: list[dict]) -> object:
+        return lease.complete_many([doc["source_judgement_id"] for doc in docs])
+
+    return on_written
+
+
+def plan_list(
+    judgements_collection: Collection, extracted_features_collection: Collection
+) -> WorkPlan:
+    docs_to_process, judgement_count = build_docs_to_process(
+        judgements_collection, extracted_features_collection
+    )
+    return WorkPlan(
+        docs=docs_to_process,
+        judgement_count=judgement_count,
+        must_include_count=sum(
+            1 for doc in docs_to_process if doc.get("trial") in MUST_INCLUDE_TRIALS
+        ),
+        progress_total=len(docs_to_process),
+        total_bytes=sum(judgement_doc_size(doc) for doc in docs_to_process),
+    )
+
+
+def plan_stream(
+    judgements_collection: Collection, extracted_features_collection: Collection
+) -> WorkPlan:
+    docs, judgement_count, must_include_count = stream_docs_to_process(
+        judgements_collection, extracted_features_collection
+    )
+    normal_count = judgement_count - must_include_count
+    if EXTRACT_LIMIT > 0:
+        normal_count = min(normal_count, EXTRACT_LIMIT)
+    return WorkPlan(
+        docs=docs,
+        judgement_count=judgement_count,
+        must_include_count=must_include_count,
+        progress_total=must_include_count + normal_count,
+    )
+
+
+def plan_lease(lease: LeaseQueue) -> WorkPlan:
+    must_include_filter = build_must_include_filter(MUST_INCLUDE_TRIALS)
+    judgement_count = lease.count_claimable()
+    must_include_count = (
+        lease.count_claimable(must_include_filter) if must_include_filter else 0
+    )
+    normal_count = judgement_count - must_include_count
+    if EXTRACT_LIMIT > 0:
+        normal_count = min(normal_count, EXTRACT_LIMIT)
+    return WorkPlan(
+        docs=lease.iter_claims(must_include_filter, EXTRACT_LIMIT),
+        judgement_count=judgement_count,
+        must_include_count=must_include_count,
+        progress_total=must_include_count + normal_count,
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Extract LLM features for unprocessed judgements."
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help=(
+            "Read judgements lazily and keep at most EXTRACT_MAX_INFLIGHT_BYTES of "
+            "HTML queued or in flight, instead of loading every pending document first."
+        ),
+    )
+    parser.add_argument(
+        "--lease",
+        action="store_true",
+        help=(
+            "Claim judgements one at a time with an expiring lease so several "
+            "workers can share the corpus. Implies --stream."
+        ),
+    )
+    parser.add_argument(
+        "--lease-backfill",
+        action="store_true",
+        help="Before claiming, mark judgements that already have extracted features as done.",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["threads", "async", "batch"],
+        default="threads",
+        help=(
+            "threads: one worker thread per concurrent judgement. "
+            "async: a single event loop with EXTRACT_CONCURRENCY judgements in flight. "
+            "batch: submit each extraction stage for all pending judgements to the "
+            "provider's Batch API and wait for the results."
+        ),
+    )
+    parser.add_argument(
+        "--bulk-write",
+        action="store_true",
+        help=(
+            "Buffer extracted documents and write them in unordered batches of "
+            "EXTRACT_WRITE_BATCH_SIZE, journaling pending ones to EXTRACT_SPILL_DIR."
+        ),
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help=(
+            "Estimate the tokens, cost and wall-clock time of extracting the "
+            "pending judgements without calling the LLM."
+        ),
+    )
+    parser.add_argument(
+        "--dashboard",
+        action="store_true",
+        help=(
+            "Show live throughput, latency, token, queue and error status under "
+            "the progress bar, refreshed every EXTRACT_DASHBOARD_SECONDS."
+        ),
+    )
+    args = parser.parse_args()
+    if args.engine == "batch" and args.dashboard:
+        parser.error("--dashboard is not supported with --engine batch")
+    if args.engine != "threads" and args.bulk_write:
+        parser.error("--bulk-write is only supported with --engine threads")
+    if args.engine != "threads" and args.lease:
+        parser.error("--lease is only supported with --engine threads")
+    return args
+
+
 def main() -> None:
+    args = parse_args()
+    if args.dry_run:
+        from .estimate import run
+
+        run()
+        return
+    if args.engine == "async":
+        from .async_runner import run
+
+        asyncio.run(run(dashboard=args.dashboard))
+        return
+    if args.engine == "batch":
+        from .batch_runner import run
+
+        run()
+        return
+
     db = create_db()
     judgements_collection = db.get_judgements_collection()
     extracted_features_collection = db.get_extracted_features_collection()
 
-    docs_to_process, judgement_count = build_docs_to_process(
-        judgements_collection, extracted_features_collection
-    )
+    lease: LeaseQueue | None = None
+    if args.lease:
+        lease = LeaseQueue(
+            judgements_collection,
+            lease_seconds=EXTRACT_LEASE_SECONDS,
+            max_attempts=EXTRACT_LEASE_MAX_ATTEMPTS,
+            projection=JUDGEMENT_PROJECTION,
+            retry_seconds=EXTRACT_LEASE_RETRY_SECONDS,
+        )
+        if args.lease_backfill:
+            marked = backfill_lease_status(
+                judgements_collection, extracted_features_collection
+            )
+            print(f"Marked {marked} already extracted judgements as done.")
+        plan = plan_lease(lease)
+    elif args.stream:
+        plan = plan_stream(judgements_collection, extracted_features_collection)
+    else:
+        with RUN_PROFILE.time("fetch.all"):
+            plan = plan_list(judgements_collection, extracted_features_collection)
 
     print(
-        f"Found {judgement_count} unprocessed judgement records in judgement-html collection."
+        f"Found {plan.judgement_count} unprocessed judgement records in judgement-html collection."
     )
     if MUST_INCLUDE_TRIALS:
         print(
-            f"Must-include configured: matched {sum(1 for doc in docs_to_process if doc.get('trial') in MUST_INCLUDE_TRIALS)} records from {len(MUST_INCLUDE_TRIALS)} trial values."
+            f"Must-include configured: matched {plan.must_include_count} records from {len(MUST_INCLUDE_TRIALS)} trial values."
         )
+    if lease is not None:
+        print(f"Claiming judgements as worker {lease.worker_id}.")
     print(f"Using concurrency={EXTRACT_CONCURRENCY}.")
 
-    processed = 0
-    skipped = 0
-    failed = 0
-    first_insert_logged = False
+    summary = RunSummary()
+    writer: BulkWriter | None = None
+    if args.bulk_write:
+        writer = BulkWriter(
+            extracted_features_collection,
+            batch_size=EXTRACT_WRITE_BATCH_SIZE,
+            flush_seconds=EXTRACT_WRITE_FLUSH_SECONDS,
+            spill_dir=EXTRACT_SPILL_DIR,
+            log=tqdm.write,
+            on_written=complete_written(lease) if lease is not None else None,
+        )
+
+    dashboard: Dashboard | None = None
+    if args.dashboard:
+        dashboard = Dashboard(
+            plan.progress_total, plan.total_bytes, EXTRACT_DASHBOARD_SECONDS
+        )
+
+    render: RenderStage | None = None
+    if EXTRACT_RENDER_PROCESSES:
+        render = RenderStage(EXTRACT_RENDER_PROCESSES, EXTRACT_RENDER_QUEUE_SIZE)
 
-    with ThreadPoolExecutor(max_workers=EXTRACT_CONCURRENCY) as executor:
-        futures = [
-            executor.submit(
-                process_judgement_doc, judgement_doc, extracted_features_collection
+    def handle(item: dict | RenderedJudgement) -> ProcessResult:
+        rendered = item if isinstance(item, RenderedJudgement) else None
+        judgement_doc = rendered.judgement_doc if rendered is not None else item
+        if lease is None and RUN_BUDGET.exhausted():
+            # Every judgement was queued up front; leave the rest for the next run.
+            return ProcessResult(status="skipped", source_id=judgement_doc.get("_id"))
+        if dashboard is not None:
+            dashboard.start()
+        try:
+            with RUN_PROFILE.time("judgement"):
+                result = process_judgement_doc(
+                    judgement_doc, extracted_features_collection, writer, rendered
+                )
+        except Exception as exc:
+            if lease is None:
+                raise
+            result = ProcessResult(
+                status="failed", source_id=judgement_doc.get("_id"), message=str(exc)
             )
-            for judgement_doc in docs_to_process
-        ]
+        finally:
+            if dashboard is not None:
+                dashboard.finish(judgement_doc_size(judgement_doc))
+        if lease is not None:
+            settle_lease(lease, result, bulk_write=writer is not None)
+        return result
+
+    docs: Iterable[Any] = plan.docs
+    if args.stream or lease is not None:
+        # Judgements are read (or claimed) only while the budget lasts.
+        docs = RUN_BUDGET.take(docs)
+    if dashboard is not None:
+        docs = dashboard.track(docs)
+    if args.stream or lease is not None:
+        # Judgements are read (or claimed) one at a time as workers free up.
+        docs = RUN_PROFILE.iterate("fetch", docs)
+
+    with ExitStack() as stack:
+        stack.callback(close_clients)
+        # The writer closes first, so its final flush completes the leases it
+        # holds before the rest are released.
+        if lease is not None:
+            stack.enter_context(lease)
+        if writer is not None:
+            stack.enter_context(writer)
+        executor = stack.enter_context(
+            ThreadPoolExecutor(max_workers=EXTRACT_CONCURRENCY)
+        )
+        if render is not None:
+            stack.enter_context(render)
+            docs = render.results(docs)
+        if dashboard is not None:
+            stack.enter_context(dashboard)
 
-        for future in tqdm(
-            as_completed(futures),
-            total=len(futures),
+        # Rendered judgements are only taken as workers free up, so the render
+        # stage stays at most EXTRACT_RENDER_QUEUE_SIZE ahead of them.
+        if args.stream or lease is not None or render is not None:
+            feed = BoundedFeed(
+                executor,
+                handle,
+                max_pending=EXTRACT_CONCURRENCY + EXTRACT_QUEUE_SIZE,
+                max_inflight_bytes=EXTRACT_MAX_INFLIGHT_BYTES,
+                size=_item_size,
+            )
+            results = feed.results(docs)
+        else:
+            futures = [executor.submit(handle, judgement_doc) for judgement_doc in docs]
+            results = (future.result() for future in as_completed(futures))
+
+        for result in tqdm(
+            results,
+            total=plan.progress_total,
             desc="Judgements",
             file=sys.stdout,
         ):
-            result = future.result()
-
-            if result.message:
-                tqdm.print(result.message)
-
-            if result.status == "processed":
-                processed += 1
-                if not first_insert_logged:
-                    tqdm.print(
-                        f"Inserted extracted features for source {result.source_id} into llm-extracted features."
-                    )
-                    first_insert_logged = True
-            elif result.status == "skipped":
-                skipped += 1
-            else:
-                failed += 1
-                tqdm.print(
-                    f"Failed to process source {result.source_id}: {result.message}"
-                )
+            summary.record(result)
 
     print(
-        f"Extraction completed. processed={processed}, skipped={skipped}, failed={failed}, total={judgement_count}"
+        f"Extraction completed. processed={summary.processed}, skipped={summary.skipped}, failed={summary.failed}, total={plan.judgement_count}"
     )
+    print(get_governor().summary())
+    if render is not None:
+        print(render.summary())
+    if RUN_COMPACTION.enabled:
+        print(RUN_COMPACTION.summary())
+    if RUN_SECTIONS.enabled:
+        print(RUN_SECTIONS.summary())
+    print(RUN_USAGE.summary())
+    if RUN_BUDGET.enabled:
+        print(RUN_BUDGET.summary())
+    if (cache := get_response_cache()) is not None:
+        print(cache.summary())
+    if (hedger := get_hedger()) is not None:
+        print(hedger.summary())
+        hedger.close()
+    report_profile()
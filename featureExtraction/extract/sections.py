@@ -0,0 +1,269 @@
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+
+from utils.htmlToText import HEADER_TAGS, replace_tables
+
+from .case_text import build_case_text, judgement_html, normalise_case_text
+from .compact import estimate_tokens
+from .config import (
+    EXTRACT_CHUNK_THRESHOLD_TOKENS,
+    EXTRACT_CHUNK_TOKENS,
+    EXTRACT_SECTION_CONTEXT,
+)
+
+# HKLII marks section headings with <p class="heading">. A heading that names
+# none of these (e.g. "第一被告人" or a case name) is a subheading of the
+# section it appears in. The first pattern that matches wins.
+HEADING_KINDS: list[tuple[str, re.Pattern[str]]] = [
+    ("facts", re.compile(r"\bfacts\b|案情|控罪詳情", re.IGNORECASE)),
+    ("mitigation", re.compile(r"mitigat|求情|輕判", re.IGNORECASE)),
+    (
+        "background",
+        re.compile(
+            r"background|antecedent|criminal record|背景|定罪紀錄", re.IGNORECASE
+        ),
+    ),
+    (
+        "sentencing",
+        re.compile(
+            r"sentenc|starting point|grounds of appeal|判刑|量刑", re.IGNORECASE
+        ),
+    ),
+]
+
+# Sections each schema is given. "header" and "general" are always included;
+# a schema is sent the full case text when none of its other sections were
+# found, or when its sections are nearly the whole judgement anyway. Reasons
+# for the offence are usually argued in mitigation, and the sentencing steps
+# restate drug quantities and discounts from the facts and mitigation.
+SCHEMA_SECTIONS: dict[str, tuple[str, ...]] = {
+    "judgement": ("header", "general", "facts", "mitigation"),
+    "defendants": ("header", "general", "background", "mitigation"),
+    "trials": ("header", "general", "facts", "mitigation", "sentencing"),
+}
+FULL_TEXT_SHARE = 0.9
+
+# Private-use characters, which never occur in judgement text.
+_MARKER_START, _MARKER_END = "\ue000", "\ue001"
+_RE_MARKER = re.compile(f"{_MARKER_START}(\\w+){_MARKER_END}")
+
+
+@dataclass(frozen=True)
+class Section:
+    kind: str
+    # Text exactly as rendered, so the sections of a judgement join back into
+    # its case text.
+    text: str
+
+
+def heading_kind(heading: str) -> str | None:
+    for kind, pattern in HEADING_KINDS:
+        if pattern.search(heading):
+            return kind
+    return None
+
+
+def _marker(kind: str) -> NavigableString:
+    return NavigableString(f"{_MARKER_START}{kind}{_MARKER_END}")
+
+
+def _is_boundary(tag: Tag) -> bool:
+    if tag.find_parent(HEADER_TAGS) is not None:
+        return False
+    return tag.name in HEADER_TAGS or (
+        tag.name == "p" and "heading" in (tag.get("class") or [])
+    )
+
+
+def segment_html(html: str) -> list[Section]:
+    """Split one judgement's HTML into typed sections.
+
+    The HTML is parsed and its tables converted once, as for
+    ``html_to_text_with_tables``; markers placed at section boundaries are
+    split on after the text is extracted. The header tags and the title
+    block before them are "header", and the body is "general" until its
+    first recognised heading.
+    """
+    soup = BeautifulSoup(html, "lxml")
+    replace_tables(soup)
+
+    current = "general"
+    for tag in soup.find_all(_is_boundary):
+        if tag.name in HEADER_TAGS:
+            # Representation is often listed after the judgement body.
+            tag.insert_before(_marker("header"))
+            tag.insert_after(_marker(current))
+            continue
+        kind = heading_kind(tag.get_text(" ", strip=True))
+        if kind is not None and kind != current:
+            tag.insert_before(_marker(kind))
+            current = kind
+
+    parts = _RE_MARKER.split(soup.get_text())
+    sections = [Section("header", parts[0])]
+    for index in range(1, len(parts), 2):
+        sections.append(Section(parts[index], parts[index + 1]))
+    return sections
+
+
+def build_case_sections(judgement_doc: dict) -> tuple[list[Section], str]:
+    """``build_case_text``, keeping the sections of every HTML field."""
+    html_fields, judgement_type = judgement_html(judgement_doc)
+    sections = [section for html in html_fields for section in segment_html(html)]
+    return sections, judgement_type
+
+
+def join_sections(sections: list[Section]) -> str:
+    return normalise_case_text("".join(section.text for section in sections))
+
+
+def schema_contexts(sections: list[Section], case_txt: str) -> dict[str, str]:
+    """Case text for each schema that doesn't need the whole judgement."""
+    found = {section.kind for section in sections if section.text.strip()}
+    contexts = {}
+    for schema_name, kinds in SCHEMA_SECTIONS.items():
+        if not found & (set(kinds) - {"header", "general"}):
+            continue
+        context = join_sections(
+            [section for section in sections if section.kind in kinds]
+        )
+        if len(context) < FULL_TEXT_SHARE * len(case_txt):
+            contexts[schema_name] = context
+    return contexts
+
+
+def _split_paragraphs(text: str, max_tokens: int) -> list[str]:
+    """Split a section too long for one chunk between its paragraphs, and a
+    paragraph too long itself between its lines."""
+    pieces = [""]
+    for paragraph in re.split(r"(?<=\n\n)", text):
+        lines = (
+            [paragraph]
+            if estimate_tokens(paragraph) <= max_tokens
+            else re.split(r"(?<=\n)", paragraph)
+        )
+        for line in lines:
+            if pieces[-1] and estimate_tokens(pieces[-1] + line) > max_tokens:
+                pieces.append("")
+            pieces[-1] += line
+    return pieces
+
+
+def chunk_sections(sections: list[Section], max_tokens: int) -> list[str]:
+    """Pack the sections of a long judgement into case texts of about
+    ``max_tokens`` each.
+
+    Every chunk starts with all the header sections, which name the parties
+    and list the charges, so that charges and defendants are numbered the
+    same way in each chunk. The body is cut between sections where it can,
+    and within a section only where it is too long for a chunk on its own.
+    Returns an empty list when the judgement fits in one chunk.
+    """
+    header = "".join(section.text for section in sections if section.kind == "header")
+    # A header that takes most of the budget still leaves room for some body.
+    budget = max(max_tokens - estimate_tokens(header), max_tokens // 2)
+
+    chunks = [""]
+    for section in sections:
+        if section.kind == "header":
+            continue
+        for piece in _split_paragraphs(section.text, budget):
+            if chunks[-1] and estimate_tokens(chunks[-1] + piece) > budget:
+                chunks.append("")
+            chunks[-1] += piece
+
+    if len(chunks) < 2:
+        return []
+    return [normalise_case_text(header + chunk) for chunk in chunks]
+
+
+def _needs_chunks(case_txt: str) -> bool:
+    return (
+        EXTRACT_CHUNK_THRESHOLD_TOKENS > 0
+        and estimate_tokens(case_txt) > EXTRACT_CHUNK_THRESHOLD_TOKENS
+    )
+
+
+def build_case_texts(
+    judgement_doc: dict,
+) -> tuple[str, str, dict[str, str], list[str]]:
+    """Build the case text and, with ``EXTRACT_SECTION_CONTEXT=on``, the
+    shorter case text for each schema that can do without the rest.
+
+    Schemas missing from the returned dict get the full case text. A case
+    text estimated above ``EXTRACT_CHUNK_THRESHOLD_TOKENS`` is also returned
+    in chunks (see ``chunk_sections``), which then replace it and the
+    per-schema texts for extraction.
+    """
+    if EXTRACT_SECTION_CONTEXT != "on":
+        case_txt, judgement_type = build_case_text(judgement_doc)
+        if not _needs_chunks(case_txt):
+            return case_txt, judgement_type, {}, []
+        # Only long judgements are parsed a second time for their sections.
+        sections, judgement_type = build_case_sections(judgement_doc)
+        return (
+            case_txt,
+            judgement_type,
+            {},
+            chunk_sections(sections, EXTRACT_CHUNK_TOKENS),
+        )
+
+    sections, judgement_type = build_case_sections(judgement_doc)
+    case_txt = join_sections(sections)
+    chunks = (
+        chunk_sections(sections, EXTRACT_CHUNK_TOKENS)
+        if _needs_chunks(case_txt)
+        else []
+    )
+    return case_txt, judgement_type, schema_contexts(sections, case_txt), chunks
+
+
+class SectionContextMeter:
+    """Track how much of the case text each schema call is spared."""
+
+    def __init__(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self.judgements = 0
+        self._full_tokens = 0
+        self._sent_tokens: Counter[str] = Counter()
+        self._fallbacks: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, case_txt: str, contexts: dict[str, str]) -> None:
+        if not self.enabled:
+            return
+        full_tokens = estimate_tokens(case_txt)
+        with self._lock:
+            self.judgements += 1
+            self._full_tokens += full_tokens
+            for schema_name in SCHEMA_SECTIONS:
+                if schema_name in contexts:
+                    self._sent_tokens[schema_name] += estimate_tokens(
+                        contexts[schema_name]
+                    )
+                else:
+                    self._sent_tokens[schema_name] += full_tokens
+                    self._fallbacks[schema_name] += 1
+
+    def summary(self) -> str:
+        with self._lock:
+            if not self.judgements:
+                return "Section context: no judgements segmented"
+            full = self._full_tokens
+            parts = [
+                f"{schema_name} {sent} ({1 - sent / full if full else 0:.0%} saved, "
+                f"full text for {self._fallbacks[schema_name]})"
+                for schema_name in SCHEMA_SECTIONS
+                for sent in [self._sent_tokens[schema_name]]
+            ]
+        return (
+            f"Section context: judgements={self.judgements}, "
+            f"estimated case-text tokens per call full={full}, " + ", ".join(parts)
+        )
+
+
+RUN_SECTIONS = SectionContextMeter(EXTRACT_SECTION_CONTEXT == "on")
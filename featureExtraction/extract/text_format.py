@@ -0,0 +1,65 @@
+from functools import cache
+from typing import Any
+
+from pydantic import BaseModel
+
+
+def _resolve_ref(root: dict[str, Any], ref: str) -> dict[str, Any]:
+    resolved = root
+    for key in ref.removeprefix("#/").split("/"):
+        resolved = resolved[key]
+    return resolved
+
+
+def _make_strict(schema: dict[str, Any], root: dict[str, Any]) -> dict[str, Any]:
+    """Rewrite ``schema`` in place the way strict structured outputs need it.
+
+    Every object forbids extra properties and requires all of its properties
+    (optional fields stay nullable), ``None`` defaults are dropped, a single
+    ``allOf`` is inlined, and a ``$ref`` with sibling keys such as a
+    description is replaced by the schema it points to.
+    """
+    for defs_key in ("$defs", "definitions"):
+        for definition in schema.get(defs_key, {}).values():
+            _make_strict(definition, root)
+
+    if schema.get("type") == "object":
+        schema.setdefault("additionalProperties", False)
+    if isinstance(properties := schema.get("properties"), dict):
+        schema["required"] = list(properties)
+        for value in properties.values():
+            _make_strict(value, root)
+    if isinstance(items := schema.get("items"), dict):
+        _make_strict(items, root)
+    for variant in schema.get("anyOf", []):
+        _make_strict(variant, root)
+    if isinstance(all_of := schema.get("allOf"), list):
+        if len(all_of) == 1:
+            schema.update(_make_strict(all_of[0], root))
+            schema.pop("allOf")
+        else:
+            for entry in all_of:
+                _make_strict(entry, root)
+
+    if "default" in schema and schema["default"] is None:
+        schema.pop("default")
+
+    ref = schema.get("$ref")
+    if ref and len(schema) > 1:
+        # Keys given next to the $ref win over those of the referenced schema.
+        schema.update({**_resolve_ref(root, ref), **schema})
+        schema.pop("$ref")
+        return _make_strict(schema, root)
+    return schema
+
+
+@cache
+def text_format(model: type[BaseModel]) -> dict[str, Any]:
+    """The Responses API ``text.format`` asking for output valid as ``model``."""
+    schema = model.model_json_schema()
+    return {
+        "type": "json_schema",
+        "strict": True,
+        "name": model.__name__,
+        "schema": _make_strict(schema, schema),
+    }
@@ -0,0 +1,297 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import accumulate
+from typing import TypeVar
+
+from pymongo import monitoring
+from tabulate import tabulate
+
+from .config import EXTRACT_PROFILE_JSON, EXTRACT_PROFILE_PROM
+
+T = TypeVar("T")
+
+# Upper bounds (seconds) of the Prometheus histogram buckets.
+HISTOGRAM_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+    600.0,
+)
+PROMETHEUS_METRIC = "extract_stage_duration_seconds"
+# Durations kept per stage for percentiles; beyond this they are a uniform
+# random sample of every duration recorded.
+RESERVOIR_SIZE = 4096
+# Latest durations kept per stage for StageProfile.recent().
+RECENT_SIZE = 1000
+
+
+def percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+    return ordered[index]
+
+
+@dataclass
+class _StageDurations:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    # Durations per HISTOGRAM_BUCKETS bucket, not cumulative.
+    buckets: list[int] = field(default_factory=lambda: [0] * len(HISTOGRAM_BUCKETS))
+    reservoir: list[float] = field(default_factory=list)
+    recent: deque[float] = field(default_factory=lambda: deque(maxlen=RECENT_SIZE))
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        bucket = bisect_left(HISTOGRAM_BUCKETS, seconds)
+        if bucket < len(HISTOGRAM_BUCKETS):
+            self.buckets[bucket] += 1
+        if len(self.reservoir) < RESERVOIR_SIZE:
+            self.reservoir.append(seconds)
+        else:
+            index = random.randrange(self.count)
+            if index < RESERVOIR_SIZE:
+                self.reservoir[index] = seconds
+        self.recent.append(seconds)
+
+    def copy(self) -> "_StageDurations":
+        return _StageDurations(
+            self.count,
+            self.total,
+            self.max,
+            list(self.buckets),
+            list(self.reservoir),
+        )
+
+
+class StageProfile:
+    """Wall-clock durations recorded per pipeline stage during a run.
+
+    Counts, totals, maxima and histogram buckets are exact; percentiles come
+    from up to ``RESERVOIR_SIZE`` durations per stage, so memory stays bounded
+    however many calls a long run makes.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.time()
+        self._durations: dict[str, _StageDurations] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            durations = self._durations.get(stage)
+            if durations is None:
+                durations = self._durations[stage] = _StageDurations()
+            durations.add(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def iterate(self, stage: str, items: Iterable[T]) -> Iterator[T]:
+        """Yield from ``items``, recording how long each item took to arrive."""
+        iterator = iter(items)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.record(stage, time.perf_counter() - started)
+            yield item
+
+    def recent(self, stage: str, limit: int) -> list[float]:
+        with self._lock:
+            durations = self._durations.get(stage)
+            if durations is None:
+                return []
+            return list(durations.recent)[-limit:]
+
+    def _snapshot(self) -> dict[str, _StageDurations]:
+        with self._lock:
+            return {stage: values.copy() for stage, values in self._durations.items()}
+
+    async def aiterate(self, stage: str, items: AsyncIterable[T]) -> AsyncIterator[T]:
+        iterator = aiter(items)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = await anext(iterator)
+            except StopAsyncIteration:
+                return
+            self.record(stage, time.perf_counter() - started)
+            yield item
+
+    def stats(
+        self, durations: dict[str, _StageDurations] | None = None
+    ) -> dict[str, dict[str, float]]:
+        if durations is None:
+            durations = self._snapshot()
+        return {
+            stage: {
+                "count": values.count,
+                "total": values.total,
+                "p50": percentile(values.reservoir, 50),
+                "p95": percentile(values.reservoir, 95),
+                "p99": percentile(values.reservoir, 99),
+                "max": values.max,
+            }
+            for stage, values in sorted(durations.items())
+        }
+
+    def summary(self) -> str:
+        rows = [
+            [
+                stage,
+                stat["count"],
+                f"{stat['total']:.1f}",
+                f"{stat['p50'] * 1000:.1f}",
+                f"{stat['p95'] * 1000:.1f}",
+                f"{stat['p99'] * 1000:.1f}",
+                f"{stat['max'] * 1000:.1f}",
+            ]
+            for stage, stat in self.stats().items()
+        ]
+        if not rows:
+            return "Stage latency: nothing recorded."
+        return "Stage latency:\n" + tabulate(
+            rows,
+            headers=[
+                "stage",
+                "count",
+                "total s",
+                "p50 ms",
+                "p95 ms",
+                "p99 ms",
+                "max ms",
+            ],
+            tablefmt="github",
+        )
+
+    def histograms(self) -> dict[str, dict[str, float | list[int]]]:
+        """Stats per stage plus cumulative counts for ``HISTOGRAM_BUCKETS``."""
+        durations = self._snapshot()
+        return {
+            stage: {
+                **stat,
+                "bucket_counts": list(accumulate(durations[stage].buckets)),
+            }
+            for stage, stat in self.stats(durations).items()
+        }
+
+    def write_json(self, path: str) -> None:
+        report = {
+            "started_at": self.started,
+            "wall_seconds": time.time() - self.started,
+            "buckets": list(HISTOGRAM_BUCKETS),
+            "stages": self.histograms(),
+        }
+        _write_atomically(path, json.dumps(report, indent=2))
+
+    def write_prometheus(self, path: str) -> None:
+        lines = [
+            f"# HELP {PROMETHEUS_METRIC} Duration of extraction pipeline stages.",
+            f"# TYPE {PROMETHEUS_METRIC} histogram",
+        ]
+        for stage, stat in self.histograms().items():
+            label = f'stage="{_escape_label(stage)}"'
+            for bound, count in zip(HISTOGRAM_BUCKETS, stat["bucket_counts"]):
+                lines.append(
+                    f'{PROMETHEUS_METRIC}_bucket{{{label},le="{bound}"}} {count}'
+                )
+            lines.append(
+                f'{PROMETHEUS_METRIC}_bucket{{{label},le="+Inf"}} {stat["count"]}'
+            )
+            lines.append(f"{PROMETHEUS_METRIC}_sum{{{label}}} {stat['total']}")
+            lines.append(f"{PROMETHEUS_METRIC}_count{{{label}}} {stat['count']}")
+        lines.append("# HELP extract_run_wall_seconds Wall-clock time of the run.")
+        lines.append("# TYPE extract_run_wall_seconds gauge")
+        lines.append(f"extract_run_wall_seconds {time.time() - self.started}")
+        # The node_exporter textfile collector only reads complete files.
+        _write_atomically(path, "\n".join(lines) + "\n")
+
+
+def _escape_label(value: str) -> str:
+    return re.sub(r'(["\\])', r"\\\1", value)
+
+
+def _write_atomically(path: str, content: str) -> None:
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as file:
+        file.write(content)
+    os.replace(temp_path, path)
+
+
+class MongoCommandProfiler(monitoring.CommandListener):
+    """Record the server round trip of every MongoDB command as ``mongo.<command>``."""
+
+    def __init__(self, profile: StageProfile) -> None:
+        self.profile = profile
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self.profile.record(f"mongo.{event.command_name}", event.duration_micros / 1e6)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self.profile.record(
+            f"mongo.{event.command_name}.failed", event.duration_micros / 1e6
+        )
+
+
+RUN_PROFILE = StageProfile()
+
+_mongo_monitoring_lock = threading.Lock()
+_mongo_monitoring_installed = False
+
+
+def install_mongo_monitoring() -> None:
+    """Profile MongoDB commands of every client created after this call."""
+    global _mongo_monitoring_installed
+    with _mongo_monitoring_lock:
+        if not _mongo_monitoring_installed:
+            monitoring.register(MongoCommandProfiler(RUN_PROFILE))
+            _mongo_monitoring_installed = True
+
+
+def report_profile() -> None:
+    print(RUN_PROFILE.summary())
+    for path, write in (
+        (EXTRACT_PROFILE_JSON, RUN_PROFILE.write_json),
+        (EXTRACT_PROFILE_PROM, RUN_PROFILE.write_prometheus),
+    ):
+        if not path:
+            continue
+        try:
+            write(path)
+        except OSError as exc:
+            print(f"Could not write the stage latency report to {path}: {exc}")
+        else:
+            print(f"Stage latency report written to {path}.")
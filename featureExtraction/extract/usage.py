@@ -0,0 +1,210 @@
+import threading
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass
+from typing import Any, TypeVar
+
+from tqdm import tqdm
+
+from .config import (
+    EXTRACT_BUDGET_TOKENS,
+    EXTRACT_BUDGET_USD,
+    EXTRACT_PRICE_CACHED_INPUT_PER_MTOK,
+    EXTRACT_PRICE_INPUT_PER_MTOK,
+    EXTRACT_PRICE_OUTPUT_PER_MTOK,
+)
+
+T = TypeVar("T")
+
+
+def cost_usd(input_tokens: int, cached_tokens: int, output_tokens: int) -> float:
+    return (
+        (input_tokens - cached_tokens) * EXTRACT_PRICE_INPUT_PER_MTOK
+        + cached_tokens * EXTRACT_PRICE_CACHED_INPUT_PER_MTOK
+        + output_tokens * EXTRACT_PRICE_OUTPUT_PER_MTOK
+    ) / 1_000_000
+
+
+@dataclass
+class TokenUsage:
+    calls: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    reasoning_tokens: int = 0
+    repairs: int = 0
+    repaired: int = 0
+    repair_tokens_saved: int = 0
+    # Requests sent, including ones that never got a response.
+    attempts: int = 0
+    # Time spent extracting, summed over calls that may have run in parallel.
+    seconds: float = 0.0
+
+    @classmethod
+    def from_response(cls, response: Any) -> "TokenUsage":
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return cls(calls=1)
+        input_details = getattr(usage, "input_tokens_details", None)
+        output_details = getattr(usage, "output_tokens_details", None)
+        return cls(
+            calls=1,
+            input_tokens=usage.input_tokens or 0,
+            cached_tokens=getattr(input_details, "cached_tokens", 0) or 0,
+            output_tokens=usage.output_tokens or 0,
+            reasoning_tokens=getattr(output_details, "reasoning_tokens", 0) or 0,
+        )
+
+    def add(self, other: "TokenUsage") -> None:
+        self.calls += other.calls
+        self.input_tokens += other.input_tokens
+        self.cached_tokens += other.cached_tokens
+        self.output_tokens += other.output_tokens
+        self.reasoning_tokens += other.reasoning_tokens
+        self.repairs += other.repairs
+        self.repaired += other.repaired
+        self.repair_tokens_saved += other.repair_tokens_saved
+        self.attempts += other.attempts
+        self.seconds += other.seconds
+
+    @property
+    def cached_share(self) -> float:
+        if not self.input_tokens:
+            return 0.0
+        return self.cached_tokens / self.input_tokens
+
+    @property
+    def tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def cost(self) -> float:
+        return cost_usd(self.input_tokens, self.cached_tokens, self.output_tokens)
+
+    def to_record(self) -> dict[str, Any]:
+        """The usage as stored on an extracted document."""
+        record = asdict(self)
+        record["seconds"] = round(self.seconds, 3)
+        record["cost_usd"] = round(self.cost(), 6)
+        return record
+
+    def describe(self) -> str:
+        description = (
+            f"calls={self.calls}, attempts={self.attempts}, "
+            f"input_tokens={self.input_tokens}, "
+            f"cached_tokens={self.cached_tokens} ({self.cached_share:.0%}), "
+            f"output_tokens={self.output_tokens}, reasoning_tokens={self.reasoning_tokens}, "
+            f"seconds={self.seconds:.1f}, cost=${self.cost():.4f}"
+        )
+        if self.repairs:
+            description += (
+                f", repairs={self.repaired}/{self.repairs}, "
+                f"repair_tokens_saved={self.repair_tokens_saved}"
+            )
+        return description
+
+
+class UsageMeter:
+    """Thread-safe token totals per schema, for the whole run or one judgement."""
+
+    def __init__(self) -> None:
+        self._by_schema: dict[str, TokenUsage] = {}
+        self._lock = threading.Lock()
+
+    def record(self, schema_name: str, usage: TokenUsage) -> None:
+        with self._lock:
+            self._by_schema.setdefault(schema_name, TokenUsage()).add(usage)
+
+    def by_schema(self) -> dict[str, TokenUsage]:
+        with self._lock:
+            return {
+                schema_name: TokenUsage(**vars(usage))
+                for schema_name, usage in self._by_schema.items()
+            }
+
+    def total(self) -> TokenUsage:
+        total = TokenUsage()
+        for usage in self.by_schema().values():
+            total.add(usage)
+        return total
+
+    def summary(self) -> str:
+        lines = [f"Token usage: {self.total().describe()}"]
+        for schema_name, usage in self.by_schema().items():
+            lines.append(f"  {schema_name}: {usage.describe()}")
+        return "\n".join(lines)
+
+    def to_record(self) -> dict[str, Any]:
+        return {
+            "total": self.total().to_record(),
+            "by_schema": {
+                schema_name: usage.to_record()
+                for schema_name, usage in self.by_schema().items()
+            },
+        }
+
+
+class RunBudget:
+    """Stop starting judgements once the run has spent its token or cost budget.
+
+    Judgements already started are finished, so a run overshoots its budget
+    by at most what those cost.
+    """
+
+    def __init__(self, meter: UsageMeter, max_tokens: int, max_usd: float) -> None:
+        self.meter = meter
+        self.max_tokens = max_tokens
+        self.max_usd = max_usd
+        self._reported = False
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_tokens > 0 or self.max_usd > 0
+
+    def _reached(self) -> str | None:
+        usage = self.meter.total()
+        if self.max_tokens > 0 and usage.tokens >= self.max_tokens:
+            return f"token budget of {self.max_tokens} reached ({usage.tokens} used)"
+        if self.max_usd > 0 and usage.cost() >= self.max_usd:
+            return (
+                f"cost budget of ${self.max_usd:g} reached (${usage.cost():.4f} used)"
+            )
+        return None
+
+    def exhausted(self) -> bool:
+        if not self.enabled:
+            return False
+        reason = self._reached()
+        if reason is None:
+            return False
+        with self._lock:
+            if not self._reported:
+                self._reported = True
+                tqdm.write(f"Run budget: {reason}; not starting more judgements.")
+        return True
+
+    def take(self, items: Iterable[T]) -> Iterator[T]:
+        """Yield items until the budget is exhausted, checking before each
+        item is read, so that nothing is claimed that will not be extracted."""
+        iterator = iter(items)
+        while not self.exhausted():
+            try:
+                yield next(iterator)
+            except StopIteration:
+                return
+
+    def summary(self) -> str:
+        limits = []
+        if self.max_tokens > 0:
+            limits.append(f"tokens={self.max_tokens}")
+        if self.max_usd > 0:
+            limits.append(f"cost=${self.max_usd:g}")
+        usage = self.meter.total()
+        status = "reached" if self._reached() else "not reached"
+        return (
+            f"Run budget: {', '.join(limits)} {status}; used tokens={usage.tokens}, "
+            f"cost=${usage.cost():.4f}"
+        )
+
+
+RUN_USAGE = UsageMeter()
+RUN_BUDGET = RunBudget(RUN_USAGE, EXTRACT_BUDGET_TOKENS, EXTRACT_BUDGET_USD)
@@ -0,0 +1,280 @@
+import glob
+import os
+import threading
+import time
+from collections.abc import Callable
+from contextlib import suppress
+from dataclasses import dataclass
+
+from bson import ObjectId, json_util
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from .timing import RUN_PROFILE
+
+DUPLICATE_KEY_ERROR = 11000
+JOURNAL_PATTERN = "pending-*.jsonl"
+QUARANTINE_SUFFIX = ".corrupt"
+
+# Journals written by BulkWriters of this process, so a restarted worker that
+# was given its predecessor's PID (PID 1 in a container) still replays them.
+_own_journals: set[str] = set()
+_own_journals_lock = threading.Lock()
+
+
+def _journal_pid(journal_path: str) -> int | None:
+    try:
+        return int(os.path.basename(journal_path).split("-")[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _remove_journal(journal_path: str) -> None:
+    with suppress(FileNotFoundError):
+        os.remove(journal_path)
+    with _own_journals_lock:
+        _own_journals.discard(journal_path)
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@dataclass(frozen=True)
+class BatchReport:
+    size: int
+    inserted: int
+    seconds: float
+
+
+class BulkWriter:
+    """Buffer extracted documents and write them with unordered insert_many.
+
+    Every document is given its ``_id`` and appended to a journal file in
+    ``spill_dir`` before it is buffered, so a crash never loses a result: the
+    next writer replays the journals of workers that are no longer running on
+    start-up, and documents that did reach MongoDB are skipped by their
+    duplicate ``_id``. Lines that cannot be parsed, such as one cut short by a
+    crash, are moved to a ``.corrupt`` file next to the journal. A batch is flushed
+    when ``batch_size`` documents are buffered, every ``flush_seconds``, and on
+    close. ``on_written`` is called with the documents of each batch that are
+    now in MongoDB.
+    """
+
+    def __init__(
+        self,
+        collection: Collection,
+        batch_size: int,
+        flush_seconds: float,
+        spill_dir: str,
+        log: Callable[[str], object] = print,
+        on_written: Callable[[list[dict]], object] | None = None,
+    ) -> None:
+        self.collection = collection
+        self.on_written = on_written
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.spill_dir = spill_dir
+        self.log = log
+        self.reports: list[BatchReport] = []
+        self._buffer: list[dict] = []
+        self._journal_path = self._new_journal_path()
+        self._unwritten: list[tuple[str, list[dict]]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._thread: threading.Thread | None = None
+        os.makedirs(spill_dir, exist_ok=True)
+
+    def _new_journal_path(self) -> str:
+        path = os.path.join(
+            self.spill_dir, f"pending-{os.getpid()}-{time.time_ns()}.jsonl"
+        )
+        with _own_journals_lock:
+            _own_journals.add(path)
+        return path
+
+    def _claim_journal(self, journal_path: str) -> str | None:
+        """Take over the journal of a worker that is no longer running.
+
+        Journals of live workers, including other writers of this process, are
+        left alone. The journal is renamed to a new name of this process, so of
+        two workers starting at once only one replays it.
+        """
+        pid = _journal_pid(journal_path)
+        if pid is None:
+            return None
+        with _own_journals_lock:
+            if journal_path in _own_journals:
+                return None
+        if pid != os.getpid() and _is_running(pid):
+            return None
+        claimed_path = self._new_journal_path()
+        try:
+            os.rename(journal_path, claimed_path)
+        except FileNotFoundError:
+            return None
+        return claimed_path
+
+    def _read_journal(self, journal_path: str) -> list[dict]:
+        docs: list[dict] = []
+        lines: list[str] = []
+        corrupt: list[str] = []
+        with open(journal_path) as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    docs.append(json_util.loads(line))
+                    lines.append(line)
+                except ValueError:
+                    corrupt.append(line if line.endswith("\n") else line + "\n")
+        if corrupt:
+            quarantine_path = journal_path + QUARANTINE_SUFFIX
+            with open(quarantine_path, "a") as file:
+                file.writelines(corrupt)
+            # Rewrite the journal without the unparsable lines, so a journal
+            # left unwritten again is not quarantined a second time.
+            with open(journal_path + ".tmp", "w") as file:
+                file.writelines(lines)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(journal_path + ".tmp", journal_path)
+            self.log(
+                f"Skipped {len(corrupt)} unparsable lines of {journal_path}; "
+                f"moved them to {quarantine_path}."
+            )
+        return docs
+
+    def recover(self) -> int:
+        recovered = 0
+        for journal_path in sorted(
+            glob.glob(os.path.join(self.spill_dir, JOURNAL_PATTERN))
+        ):
+            journal_path = self._claim_journal(journal_path)
+            if journal_path is None:
+                continue
+            docs = self._read_journal(journal_path)
+            if docs:
+                recovered += len(docs)
+                self._unwritten.append((journal_path, docs))
+            else:
+                _remove_journal(journal_path)
+        if recovered:
+            self.log(
+                f"Replaying {recovered} extracted documents from {self.spill_dir}."
+            )
+            self.flush()
+        return recovered
+
+    def add(self, doc: dict) -> None:
+        doc.setdefault("_id", ObjectId())
+        line = json_util.dumps(doc)
+        with self._lock:
+            with open(self._journal_path, "a") as file:
+                file.write(line + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            self._buffer.append(doc)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _insert(self, docs: list[dict]) -> list[dict]:
+        started = time.perf_counter()
+        remaining: list[dict] = []
+        try:
+            inserted = len(
+                self.collection.insert_many(docs, ordered=False).inserted_ids
+            )
+        except BulkWriteError as exc:
+            write_errors = exc.details.get("writeErrors", [])
+            failed = {
+                error["index"]
+                for error in write_errors
+                if error.get("code") != DUPLICATE_KEY_ERROR
+            }
+            remaining = [doc for index, doc in enumerate(docs) if index in failed]
+            inserted = exc.details.get("nInserted", 0)
+        except PyMongoError as exc:
+            self.log(f"Bulk insert of {len(docs)} extracted documents failed: {exc}")
+            remaining = docs
+            inserted = 0
+
+        report = BatchReport(
+            size=len(docs), inserted=inserted, seconds=time.perf_counter() - started
+        )
+        RUN_PROFILE.record("db.insert_many", report.seconds)
+        self.reports.append(report)
+        self.log(
+            f"Wrote {report.inserted}/{report.size} extracted documents in {report.seconds * 1000:.0f} ms."
+        )
+        return remaining
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                if self._buffer:
+                    self._unwritten.append((self._journal_path, self._buffer))
+                    self._buffer = []
+                    self._journal_path = self._new_journal_path()
+
+            still_unwritten: list[tuple[str, list[dict]]] = []
+            for journal_path, docs in self._unwritten:
+                remaining = self._insert(docs)
+                if self.on_written is not None:
+                    failed = {id(doc) for doc in remaining}
+                    written = [doc for doc in docs if id(doc) not in failed]
+                    if written:
+                        self.on_written(written)
+                if remaining:
+                    still_unwritten.append((journal_path, remaining))
+                else:
+                    _remove_journal(journal_path)
+            self._unwritten = still_unwritten
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            buffered = len(self._buffer)
+        return buffered + sum(len(docs) for _, docs in self._unwritten)
+
+    def _run(self) -> None:
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def __enter__(self) -> "BulkWriter":
+        self.recover()
+        self._thread = threading.Thread(
+            target=self._run, name="bulk-writer", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._closed.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+        if self.reports:
+            latencies = sorted(report.seconds for report in self.reports)
+            self.log(
+                f"Bulk writer: {sum(report.inserted for report in self.reports)} documents in {len(self.reports)} batches, "
+                f"median {latencies[len(latencies) // 2] * 1000:.0f} ms, max {latencies[-1] * 1000:.0f} ms per batch."
+            )
+        if self.pending:
+            self.log(
+                f"{self.pending} extracted documents could not be written and remain in {self.spill_dir}; "
+                "they will be written on the next run."
+            )
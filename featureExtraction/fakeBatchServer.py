@@ -0,0 +1,391 @@
+"""File-based stand-in for the OpenAI Files and Batch APIs.
+
+Serves just enough of ``/v1/files`` and ``/v1/batches`` for
+``extractFeature.py --engine batch`` to run offline. Uploaded files and batch
+state are kept as plain files under ``--dir``. Every batch request is answered
+with the example output for its schema, trimmed to the JSON schema sent in the
+request, so the extraction pipeline parses and validates it as usual.
+
+    uv run fakeBatchServer.py --port 8765
+    OPENAI_BASE_URL=http://localhost:8765/v1 OPENAI_API_KEY=test \\
+        EXTRACT_BATCH_POLL_SECONDS=1 uv run extractFeature.py --engine batch
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+DEFAULT_OUTPUTS_DIR = "schema/exampleOutput/gpt-5-mini/multi-d-multi-dt"
+# Formats of one item of a schema (see extract/fanout.py), answered with the
+# first item of that schema's example output.
+ITEM_OUTPUTS = {"defendantprofile": "defendants", "trial": "trials"}
+
+FILE_CONTENT_PATH = re.compile(r"^/v1/files/([\w-]+)/content$")
+FILE_PATH = re.compile(r"^/v1/files/([\w-]+)$")
+BATCH_PATH = re.compile(r"^/v1/batches/([\w-]+)$")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Serve a local stand-in for the OpenAI Batch API."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--dir", default="fake-batch-server", help="Where files and batches are kept."
+    )
+    parser.add_argument(
+        "--outputs",
+        default=DEFAULT_OUTPUTS_DIR,
+        help="Directory with judgement.json, defendants.json and trials.json to answer with.",
+    )
+    parser.add_argument(
+        "--delay",
+        type=float,
+        default=2.0,
+        help="Seconds a batch stays in progress before it completes.",
+    )
+    parser.add_argument(
+        "--fail-rate",
+        type=float,
+        default=0.0,
+        help="Share of batch requests answered with a 500 error, to exercise retries.",
+    )
+    return parser.parse_args()
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}_{uuid.uuid4().hex}"
+
+
+def resolve(schema: dict, defs: dict) -> dict:
+    while "$ref" in schema:
+        schema = defs[schema["$ref"].rsplit("/", 1)[-1]]
+    return schema
+
+
+def _option_for(value: Any, schema: dict, defs: dict) -> dict:
+    schema = resolve(schema, defs)
+    if "anyOf" not in schema:
+        return schema
+    wanted = (
+        "object"
+        if isinstance(value, dict)
+        else "array"
+        if isinstance(value, list)
+        else None
+    )
+    for option in schema["anyOf"]:
+        option = resolve(option, defs)
+        if wanted is None or option.get("type") == wanted:
+            return option
+    return schema
+
+
+def trim_to_schema(value: Any, schema: dict, defs: dict) -> Any:
+    """Drop keys the request's JSON schema doesn't allow (e.g. computed fields)."""
+    schema = _option_for(value, schema, defs)
+    if isinstance(value, dict):
+        properties = schema.get("properties", {})
+        return {
+            key: trim_to_schema(item, properties[key], defs)
+            for key, item in value.items()
+            if key in properties
+        }
+    if isinstance(value, list):
+        return [trim_to_schema(item, schema.get("items", {}), defs) for item in value]
+    return value
+
+
+def canned_output(outputs_dir: str, format_name: str) -> dict:
+    """The example output for a request's text format, as the model would send it."""
+    schema_name = ITEM_OUTPUTS.get(format_name, format_name)
+    with open(os.path.join(outputs_dir, f"{schema_name}.json")) as file:
+        output = json.load(file)
+    if format_name in ITEM_OUTPUTS:
+        return output[schema_name][0]
+    output.pop("tracing_id", None)
+    return output
+
+
+def trimmed_output(request_body: dict, outputs_dir: str) -> dict:
+    text_format = request_body["text"]["format"]
+    schema = text_format["schema"]
+    return trim_to_schema(
+        canned_output(outputs_dir, text_format["name"].lower()),
+        schema,
+        schema.get("$defs", {}),
+    )
+
+
+def build_response(request_body: dict, text: str) -> dict:
+    """A completed Responses API object whose output is ``text``."""
+    input_tokens = len(json.dumps(request_body["input"])) // 4
+    output_tokens = len(text) // 4
+    return {
+        "id": _new_id("resp"),
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": request_body["model"],
+        "status": "completed",
+        "output": [
+            {
+                "type": "message",
+                "id": _new_id("msg"),
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }
+        ],
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "metadata": request_body.get("metadata") or {},
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + output_tokens,
+        },
+    }
+
+
+def answer(request_body: dict, outputs_dir: str) -> dict:
+    output = trimmed_output(request_body, outputs_dir)
+    return build_response(request_body, json.dumps(output, ensure_ascii=False))
+
+
+class FakeBatchStore:
+    def __init__(
+        self, directory: str, outputs_dir: str, delay: float, fail_rate: float
+    ) -> None:
+        self.directory = directory
+        self.outputs_dir = outputs_dir
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "files"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "batches"), exist_ok=True)
+
+    def _file_path(self, file_id: str) -> str:
+        return os.path.join(self.directory, "files", file_id)
+
+    def _batch_path(self, batch_id: str) -> str:
+        return os.path.join(self.directory, "batches", f"{batch_id}.json")
+
+    def add_file(self, filename: str, purpose: str, content: bytes) -> dict:
+        file_object = {
+            "id": _new_id("file"),
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with open(self._file_path(file_object["id"]), "wb") as file:
+            file.write(content)
+        with open(self._file_path(file_object["id"]) + ".json", "w") as file:
+            json.dump(file_object, file)
+        return file_object
+
+    def get_file(self, file_id: str) -> dict | None:
+        try:
+            with open(self._file_path(file_id) + ".json") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def file_content(self, file_id: str) -> bytes | None:
+        try:
+            with open(self._file_path(file_id), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def save_batch(self, batch: dict) -> None:
+        with self.lock:
+            with open(self._batch_path(batch["id"]), "w") as file:
+                json.dump(batch, file)
+
+    def get_batch(self, batch_id: str) -> dict | None:
+        with self.lock:
+            try:
+                with open(self._batch_path(batch_id)) as file:
+                    return json.load(file)
+            except FileNotFoundError:
+                return None
+
+    def create_batch(self, params: dict) -> dict | None:
+        if self.get_file(params.get("input_file_id", "")) is None:
+            return None
+        batch = {
+            "id": _new_id("batch"),
+            "object": "batch",
+            "endpoint": params["endpoint"],
+            "input_file_id": params["input_file_id"],
+            "completion_window": params.get("completion_window", "24h"),
+            "status": "validating",
+            "created_at": int(time.time()),
+            "metadata": params.get("metadata"),
+            "output_file_id": None,
+            "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        self.save_batch(batch)
+        threading.Thread(target=self._run_batch, args=(batch,), daemon=True).start()
+        return batch
+
+    def _run_batch(self, batch: dict) -> None:
+        batch["status"] = "in_progress"
+        self.save_batch(batch)
+        time.sleep(self.delay)
+
+        content = self.file_content(batch["input_file_id"]) or b""
+        requests = [json.loads(line) for line in content.splitlines() if line.strip()]
+        output_lines: list[str] = []
+        failed = 0
+        for request in requests:
+            if random.random() < self.fail_rate:
+                failed += 1
+                response = {
+                    "status_code": 500,
+                    "request_id": _new_id("req"),
+                    "body": {"error": {"message": "Injected failure."}},
+                }
+            else:
+                response = {
+                    "status_code": 200,
+                    "request_id": _new_id("req"),
+                    "body": answer(request["body"], self.outputs_dir),
+                }
+            output_lines.append(
+                json.dumps(
+                    {
+                        "id": _new_id("batch_req"),
+                        "custom_id": request["custom_id"],
+                        "response": response,
+                        "error": None,
+                    },
+                    ensure_ascii=False,
+                )
+            )
+
+        output_file = self.add_file(
+            f"{batch['id']}_output.jsonl",
+            "batch_output",
+            "\n".join(output_lines).encode(),
+        )
+        batch.update(
+            status="completed",
+            output_file_id=output_file["id"],
+            completed_at=int(time.time()),
+            request_counts={
+                "total": len(requests),
+                "completed": len(requests) - failed,
+                "failed": failed,
+            },
+        )
+        self.save_batch(batch)
+
+
+def make_handler(store: FakeBatchStore) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _not_found(self) -> None:
+            self._send_json(404, {"error": {"message": f"No route for {self.path}"}})
+
+        def _read_body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def do_GET(self) -> None:
+            if match := FILE_CONTENT_PATH.match(self.path):
+                content = store.file_content(match.group(1))
+                if content is None:
+                    return self._not_found()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+                return
+            if match := FILE_PATH.match(self.path):
+                file_object = store.get_file(match.group(1))
+                return (
+                    self._send_json(200, file_object)
+                    if file_object
+                    else self._not_found()
+                )
+            if match := BATCH_PATH.match(self.path):
+                batch = store.get_batch(match.group(1))
+                return self._send_json(200, batch) if batch else self._not_found()
+            self._not_found()
+
+        def do_POST(self) -> None:
+            body = self._read_body()
+            if self.path == "/v1/files":
+                message = BytesParser(policy=HTTP).parsebytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+                    + body
+                )
+                fields = {
+                    part.get_param("name", header="content-disposition"): part
+                    for part in message.iter_parts()
+                }
+                upload = fields["file"]
+                return self._send_json(
+                    200,
+                    store.add_file(
+                        upload.get_filename() or "upload.jsonl",
+                        fields["purpose"].get_content().strip(),
+                        upload.get_payload(decode=True),
+                    ),
+                )
+            if self.path == "/v1/batches":
+                batch = store.create_batch(json.loads(body))
+                if batch is None:
+                    return self._send_json(
+                        400, {"error": {"message": "Unknown input_file_id."}}
+                    )
+                return self._send_json(200, batch)
+            self._not_found()
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return Handler
+
+
+def main() -> None:
+    args = parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    store = FakeBatchStore(args.dir, args.outputs, args.delay, args.fail_rate)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(store))
+    print(f"Fake batch server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+"""Local stand-in for the OpenAI Responses API, for offline load testing.
+
+Answers ``POST /v1/responses`` as ``client.responses.create`` in
+``extract/pipeline.py`` calls it: each request gets the example output for
+its schema from one of the samples under ``--outputs``, trimmed to the JSON
+schema sent in the request (see ``fakeBatchServer.py``). Every call for the
+same case text is answered from the same sample. Latency, 429s, 5xx errors
+and outputs that fail validation can be injected to exercise the runner's
+concurrency, governor, retries and repairs without any network.
+
+    uv run fakeResponsesServer.py --port 8766 --latency lognormal:2:0.5 \\
+        --rate-limit-rate 0.02 --error-rate 0.01 --malformed-rate 0.05
+    OPENAI_BASE_URL=http://localhost:8766/v1 OPENAI_API_KEY=test \\
+        uv run extractFeature.py --stream
+
+What happens to a request depends only on ``--seed``, the request body and
+how many times the same body was sent before, so a rerun against a fresh
+server injects the same faults. ``GET /stats`` returns the request counts.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from fakeBatchServer import build_response, resolve, trimmed_output
+
+DEFAULT_OUTPUTS_DIR = "schema/exampleOutput/gpt-5-mini"
+SERVER_ERROR_CODES = (500, 502, 503)
+MALFORMED_KINDS = ("truncated", "missing_field")
+
+
+def latency_sampler(spec: str) -> Callable[[random.Random], float]:
+    """Parse ``fixed:S``, ``uniform:LOW:HIGH``, ``normal:MEAN:SD`` or
+    ``lognormal:MEDIAN:SIGMA`` (all in seconds) into a sampler."""
+    kind, *params = spec.split(":")
+    try:
+        values = [float(param) for param in params]
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"Invalid latency {spec!r}.") from exc
+    samplers: dict[str, tuple[int, Callable[[random.Random], float]]] = {
+        "fixed": (1, lambda rng: values[0]),
+        "uniform": (2, lambda rng: rng.uniform(values[0], values[1])),
+        "normal": (2, lambda rng: max(0.0, rng.gauss(values[0], values[1]))),
+        "lognormal": (
+            2,
+            lambda rng: values[0] * rng.lognormvariate(0.0, values[1]),
+        ),
+    }
+    if kind not in samplers or len(values) != samplers[kind][0]:
+        raise argparse.ArgumentTypeError(
+            f"Invalid latency {spec!r}; expected fixed:S, uniform:LOW:HIGH, "
+            "normal:MEAN:SD or lognormal:MEDIAN:SIGMA."
+        )
+    return samplers[kind][1]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Serve a local stand-in for the OpenAI Responses API."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument(
+        "--outputs",
+        default=DEFAULT_OUTPUTS_DIR,
+        help=(
+            "A directory with judgement.json, defendants.json and trials.json, "
+            "or a directory of such sample directories to pick from."
+        ),
+    )
+    parser.add_argument(
+        "--latency",
+        type=latency_sampler,
+        default=latency_sampler("fixed:0"),
+        help=(
+            "Seconds before a response: fixed:S, uniform:LOW:HIGH, "
+            "normal:MEAN:SD or lognormal:MEDIAN:SIGMA."
+        ),
+    )
+    parser.add_argument(
+        "--output-tokens-per-second",
+        type=float,
+        default=0.0,
+        help="Also wait for the output to be generated at this rate (0 = instantly).",
+    )
+    parser.add_argument(
+        "--rate-limit-rate",
+        type=float,
+        default=0.0,
+        help="Share of requests answered with a 429.",
+    )
+    parser.add_argument(
+        "--retry-after",
+        type=float,
+        default=1.0,
+        help="Seconds sent in the retry-after header of a 429.",
+    )
+    parser.add_argument(
+        "--rpm",
+        type=int,
+        default=0,
+        help=(
+            "Requests per minute before answering 429s, reported in the "
+            "x-ratelimit headers (0 = no limit)."
+        ),
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Share of requests answered with a 500, 502 or 503.",
+    )
+    parser.add_argument(
+        "--malformed-rate",
+        type=float,
+        default=0.0,
+        help=(
+            "Share of answers that fail validation: truncated JSON, or an "
+            "object missing a required field."
+        ),
+    )
+    parser.add_argument("--seed", default="0")
+    return parser.parse_args()
+
+
+def sample_dirs(outputs_dir: str) -> list[str]:
+    if os.path.exists(os.path.join(outputs_dir, "judgement.json")):
+        return [outputs_dir]
+    samples = sorted(
+        os.path.join(outputs_dir, name)
+        for name in os.listdir(outputs_dir)
+        if os.path.exists(os.path.join(outputs_dir, name, "judgement.json"))
+    )
+    if not samples:
+        raise SystemExit(f"No example outputs found under {outputs_dir}.")
+    return samples
+
+
+def fits_schema(value: Any, schema: dict, defs: dict) -> bool:
+    """Whether a trimmed output has the shape the schema asks for.
+
+    Example outputs written before a schema change (a field that became a
+    list, say) are skipped rather than served as failures.
+    """
+    schema = resolve(schema, defs)
+    if "anyOf" in schema:
+        return any(fits_schema(value, option, defs) for option in schema["anyOf"])
+    expected = schema.get("type")
+    if isinstance(value, dict):
+        properties = schema.get("properties", {})
+        return expected in (None, "object") and all(
+            fits_schema(item, properties[key], defs) for key, item in value.items()
+        )
+    if isinstance(value, list):
+        return expected in (None, "array") and all(
+            fits_schema(item, schema.get("items", {}), defs) for item in value
+        )
+    return expected not in ("object", "array")
+
+
+def case_key(request_body: dict) -> str:
+    """What identifies the judgement a request is about: its case text.
+
+    A repair carries no case text and is keyed by the output it repairs.
+    """
+    if request_body.get("prompt_cache_key"):
+        return request_body["prompt_cache_key"]
+    for message in request_body["input"]:
+        if message["role"] == "user":
+            return message["content"].split("\n\nPrevious attempt failed")[0]
+    return json.dumps(request_body["input"])
+
+
+def malform(output: dict, kind: str) -> str:
+    text = json.dumps(output, ensure_ascii=False)
+    if kind == "truncated":
+        return text[: len(text) // 2]
+    # Every field is required in the strict schema, so any one will do.
+    output = dict(output)
+    output.pop(next(iter(output)), None)
+    return json.dumps(output, ensure_ascii=False)
+
+
+class RequestStats:
+    def __init__(self) -> None:
+        self.outcomes: Counter[str] = Counter()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+
+    def start(self) -> None:
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finish(self, outcome: str) -> None:
+        with self.lock:
+            self.in_flight -= 1
+            self.outcomes[outcome] += 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "requests": sum(self.outcomes.values()),
+                "outcomes": dict(self.outcomes),
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+            }
+
+
+class FakeResponses:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.samples = sample_dirs(args.outputs)
+        self.stats = RequestStats()
+        self._seen: Counter[str] = Counter()
+        self._recent: deque[float] = deque()
+        self._outputs: dict[tuple[str, str], dict | None] = {}
+        self._lock = threading.Lock()
+
+    def _output(self, request_body: dict, sample: str) -> dict | None:
+        """The sample's output for the request's format, if it fits the schema."""
+        text_format = request_body["text"]["format"]
+        key = (sample, text_format["name"])
+        with self._lock:
+            if key in self._outputs:
+                return self._outputs[key]
+        output = trimmed_output(request_body, sample)
+        schema = text_format["schema"]
+        if not fits_schema(output, schema, schema.get("$defs", {})):
+            output = None
+        with self._lock:
+            self._outputs[key] = output
+        return output
+
+    def _pick_output(self, request_body: dict) -> dict:
+        """The output of the first fitting sample, starting from the one the
+        case text hashes to."""
+        key = hashlib.sha256(case_key(request_body).encode()).digest()
+        start = int.from_bytes(key[:4], "big")
+        for offset in range(len(self.samples)):
+            sample = self.samples[(start + offset) % len(self.samples)]
+            if (output := self._output(request_body, sample)) is not None:
+                return output
+        raise ValueError(
+            f"No sample output fits {request_body['text']['format']['name']}."
+        )
+
+    def _rng(self, body: bytes) -> random.Random:
+        digest = hashlib.sha256(body).hexdigest()
+        with self._lock:
+            self._seen[digest] += 1
+            seen = self._seen[digest]
+        return random.Random(f"{self.args.seed}|{digest}|{seen}")
+
+    def _rate_limit_headers(self) -> tuple[dict[str, str], bool]:
+        """The x-ratelimit headers for a new request, and whether it is over
+        the ``--rpm`` limit."""
+        if not self.args.rpm:
+            return {}, False
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            limited = len(self._recent) >= self.args.rpm
+            if not limited:
+                self._recent.append(now)
+            remaining = self.args.rpm - len(self._recent)
+            reset = 60 - (now - self._recent[0]) if self._recent else 0.0
+        return {
+            "x-ratelimit-limit-requests": str(self.args.rpm),
+            "x-ratelimit-remaining-requests": str(remaining),
+            "x-ratelimit-reset-requests": f"{reset:.3f}s",
+        }, limited
+
+    def respond(self, body: bytes) -> tuple[int, dict, dict[str, str], str]:
+        """Status, JSON payload, extra headers and outcome for one request."""
+        request_body = json.loads(body)
+        rng = self._rng(body)
+        headers, limited = self._rate_limit_headers()
+        if limited or rng.random() < self.args.rate_limit_rate:
+            headers["retry-after"] = f"{self.args.retry_after:g}"
+            return (
+                429,
+                {
+                    "error": {
+                        "message": "Rate limit reached (injected).",
+                        "type": "requests",
+                        "param": None,
+                        "code": "rate_limit_exceeded",
+                    }
+                },
+                headers,
+                "rate_limited",
+            )
+        if rng.random() < self.args.error_rate:
+            return (
+                rng.choice(SERVER_ERROR_CODES),
+                {
+                    "error": {
+                        "message": "The server had an error (injected).",
+                        "type": "server_error",
+                        "param": None,
+                        "code": None,
+                    }
+                },
+                headers,
+                "server_error",
+            )
+
+        output = self._pick_output(request_body)
+        if rng.random() < self.args.malformed_rate:
+            kind = rng.choice(MALFORMED_KINDS)
+            text, outcome = malform(output, kind), f"malformed_{kind}"
+        else:
+            text, outcome = json.dumps(output, ensure_ascii=False), "ok"
+        response = build_response(request_body, text)
+
+        delay = self.args.latency(rng)
+        if self.args.output_tokens_per_second > 0:
+            delay += (
+                response["usage"]["output_tokens"] / self.args.output_tokens_per_second
+            )
+        time.sleep(delay)
+        return 200, response, headers, outcome
+
+
+def make_handler(server: FakeResponses) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        # Keep connections open so that the client's pool is exercised as
+        # against the real API.
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(
+            self, status: int, payload: dict, headers: dict[str, str] | None = None
+        ) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            if self.path == "/stats":
+                return self._send_json(200, server.stats.snapshot())
+            self._send_json(404, {"error": {"message": f"No route for {self.path}"}})
+
+        def do_POST(self) -> None:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path != "/v1/responses":
+                return self._send_json(
+                    404, {"error": {"message": f"No route for {self.path}"}}
+                )
+            server.stats.start()
+            outcome = "error"
+            try:
+                status, payload, headers, outcome = server.respond(body)
+                self._send_json(status, payload, headers)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client timed out and hung up.
+                outcome = "disconnected"
+            except Exception as exc:
+                self._send_json(500, {"error": {"message": str(exc)}})
+                raise
+            finally:
+                server.stats.finish(outcome)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return Handler
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for every connection of a high-concurrency run to queue.
+    request_queue_size = 1024
+
+
+def main() -> None:
+    args = parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    fake = FakeResponses(args)
+    server = Server((args.host, args.port), make_handler(fake))
+    print(
+        f"Fake Responses API listening on http://{args.host}:{args.port}/v1 "
+        f"with {len(fake.samples)} samples"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(fake.stats.snapshot()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,21 @@
 import os
-import re
 import json
 
 # from openai import OpenAI
 from langfuse.openai import openai  # Langfuse OpenAI wrapper for observability
 from openai._exceptions import OpenAIError
-from bs4 import BeautifulSoup
 from pydantic import ValidationError
 from tqdm import tqdm
 from langfuse import observe
 
 from schema import Judgement, Defendants, Trials
-from utils.htmlToText import html_to_text_with_tables
+from extract.cache import get_response_cache
+from extract.compact import compact_case_text, estimate_tokens
+from extract.config import EXTRACT_COMPACT_CASE_TEXT, EXTRACT_SECTION_CONTEXT
+from extract.merge import ChunkMismatchError, merge_partials
+from extract.pipeline import schema_case_parts
+from extract.sections import build_case_texts
+from utils.compareExtractions import compare_extraction_dirs
 
 from langfuse import Langfuse
 from dotenv import load_dotenv
@@ -23,6 +27,17 @@ RERUN_ALL = False
 MAX_RETRIES = 5
 MODEL = "gpt-5-mini"
 # MODEL = "gpt-5.2"
+# With EXTRACT_COMPACT_CASE_TEXT or EXTRACT_SECTION_CONTEXT on, or with
+# EXTRACT_CHUNK_THRESHOLD_TOKENS set low enough (e.g. 1000) to extract the
+# samples in chunks, outputs go to a separate directory and are compared
+# against the full-text outputs at the end.
+OUTPUT_NAME = MODEL
+if EXTRACT_COMPACT_CASE_TEXT == "on":
+    OUTPUT_NAME += "-compact"
+if EXTRACT_SECTION_CONTEXT == "on":
+    OUTPUT_NAME += "-sections"
+if os.getenv("EXTRACT_CHUNK_THRESHOLD_TOKENS", "0") != "0":
+    OUTPUT_NAME += "-chunks"
 
 judgement_base_path = "sampleJudgments"
 judgement_types = [
@@ -91,105 +106,126 @@ def extract_single_schema(
     schema_model = config["model"]
     base_prompt = config["prompt"]
 
-    last_error = None
-    last_raw_output = None
-    for attempt in range(MAX_RETRIES):
-        try:
-            error_context = ""
-            if last_error:
-                error_context = f"\n\nPrevious attempt failed with error: {last_error}. Please try again carefully."
-
-            full_input = case_txt + error_context
-
-            if schema_name == "defendants":
-                base_prompt = base_prompt.format(
-                    defendant_ids_and_names="\n".join(
-                        [
-                            f"{d.id}. {d.name}"
-                            for d in previous_extractions["defendants"]
-                        ]
-                    )
-                )
-            elif schema_name == "trials":
-                charge_to_defendants_list = []
-                for charge in previous_extractions["charge_to_defendants"]:
-                    charge_to_defendants_list.append(
-                        f"Charge {charge.charge_no}. {charge.charge_name}"
-                    )
-                    for defendant in charge.defendants_of_charge:
-                        charge_to_defendants_list.append(
-                            f"  -> On Defendant {defendant.defendant_id}: {defendant.defendant_name}"
-                        )
-                base_prompt = base_prompt.format(
-                    charge_to_defendants="\n".join(charge_to_defendants_list)
+    if schema_name == "defendants":
+        base_prompt = base_prompt.format(
+            defendant_ids_and_names="\n".join(
+                [f"{d.id}. {d.name}" for d in previous_extractions["defendants"]]
+            )
+        )
+    elif schema_name == "trials":
+        charge_to_defendants_list = []
+        for charge in previous_extractions["charge_to_defendants"]:
+            charge_to_defendants_list.append(
+                f"Charge {charge.charge_no}. {charge.charge_name}"
+            )
+            for defendant in charge.defendants_of_charge:
+                charge_to_defendants_list.append(
+                    f"  -> On Defendant {defendant.defendant_id}: {defendant.defendant_name}"
                 )
+        base_prompt = base_prompt.format(
+            charge_to_defendants="\n".join(charge_to_defendants_list)
+        )
 
-            response = client.responses.parse(
-                name=f"{schema_name}-extraction-{attempt + 1}",
-                model=MODEL,
-                instructions=base_prompt,
-                input=full_input,
-                text_format=schema_model,
-                metadata={
-                    "judgement_type": judgement_type,
-                    "schema_name": schema_name,
-                    "attempt": str(attempt + 1),
-                },
-            )
+    def call_llm() -> Judgement | Defendants | Trials:
+        last_error = None
+        last_raw_output = None
+        for attempt in range(MAX_RETRIES):
+            try:
+                error_context = ""
+                if last_error:
+                    error_context = f"\n\nPrevious attempt failed with error: {last_error}. Please try again carefully."
+
+                full_input = case_txt + error_context
+
+                response = client.responses.parse(
+                    name=f"{schema_name}-extraction-{attempt + 1}",
+                    model=MODEL,
+                    instructions=base_prompt,
+                    input=full_input,
+                    text_format=schema_model,
+                    metadata={
+                        "judgement_type": judgement_type,
+                        "schema_name": schema_name,
+                        "attempt": str(attempt + 1),
+                    },
+                )
 
-            # Capture raw output before validation
-            raw_output = response.output or None
-            last_raw_output = raw_output  # Store for error logging
+                # Capture raw output before validation
+                raw_output = response.output or None
+                last_raw_output = raw_output  # Store for error logging
+
+                # Check if parsing succeeded
+                if response.output_parsed is None:
+                    # Check for refusal
+                    if hasattr(response, "refusal") and response.refusal:
+                        last_raw_output = response.refusal
+                        raise ValueError(
+                            f"Model refused to generate output: {response.refusal}"
+                        )
 
-            # Check if parsing succeeded
-            if response.output_parsed is None:
-                # Check for refusal
-                if hasattr(response, "refusal") and response.refusal:
-                    last_raw_output = response.refusal
+                    # Check raw output for debugging
+                    raw_output = raw_output or getattr(response, "output", None)
+                    last_raw_output = raw_output
                     raise ValueError(
-                        f"Model refused to generate output: {response.refusal}"
+                        f"Failed to parse response. Raw output: {raw_output}"
                     )
 
-                # Check raw output for debugging
-                raw_output = raw_output or getattr(response, "output", None)
-                last_raw_output = raw_output
-                raise ValueError(f"Failed to parse response. Raw output: {raw_output}")
-
-            output_dict = response.output_parsed.model_dump(mode="json")
+                return response.output_parsed
 
-            with open(output_path, "w") as f:
-                output_dict_with_trace = output_dict.copy()
-                output_dict_with_trace["tracing_id"] = langfuse.get_current_trace_id()
-                f.write(
-                    json.dumps(output_dict_with_trace, indent=2, ensure_ascii=False)
+            except (OpenAIError, ValidationError, ValueError) as e:
+                last_error = str(e)
+                # Always log something as output, even if it's just the error message
+                trace_output = (
+                    last_raw_output
+                    if last_raw_output is not None
+                    else f"Error: {last_error}"
                 )
+                langfuse.update_current_span(
+                    metadata={
+                        f"error_output_{attempt + 1}": trace_output,
+                    },
+                )
+                if attempt == MAX_RETRIES - 1:
+                    print(
+                        f"Failed to extract {schema_name} for {judgement_type} after {MAX_RETRIES} attempts: {last_error}"
+                    )
+                    raise
 
-            return response.output_parsed  # Return for use in subsequent extractions
+        raise RuntimeError(f"Failed to extract {schema_name}.")
 
-        except (OpenAIError, ValidationError, ValueError) as e:
-            last_error = str(e)
-            # Always log something as output, even if it's just the error message
-            trace_output = (
-                last_raw_output
-                if last_raw_output is not None
-                else f"Error: {last_error}"
-            )
-            langfuse.update_current_span(
-                metadata={
-                    f"error_output_{attempt + 1}": trace_output,
-                },
-            )
-            if attempt == MAX_RETRIES - 1:
-                print(
-                    f"Failed to extract {schema_name} for {judgement_type} after {MAX_RETRIES} attempts: {last_error}"
-                )
-                raise
+    response_cache = get_response_cache()
+    if response_cache is None:
+        extracted_data = call_llm()
+    else:
+        extracted_data = response_cache.get_or_compute(
+            response_cache.key(MODEL, schema_model, base_prompt, case_txt),
+            schema_model,
+            call_llm,
+        )
 
-    return {}
+    write_output(output_path, extracted_data)
+    return extracted_data  # Return for use in subsequent extractions
+
+
+def write_output(
+    output_path: str, extracted_data: Judgement | Defendants | Trials
+) -> None:
+    output_dict = extracted_data.model_dump(mode="json")
+
+    with open(output_path, "w") as f:
+        output_dict_with_trace = output_dict.copy()
+        output_dict_with_trace["tracing_id"] = langfuse.get_current_trace_id()
+        f.write(json.dumps(output_dict_with_trace, indent=2, ensure_ascii=False))
 
 
 @observe(name="extract_all_features")
-def extract_all_features(case_txt: str, judgement_type: str, output_dir: str) -> None:
+def extract_all_features(
+    case_txt: str,
+    judgement_type: str,
+    output_dir: str,
+    schema_case_texts: dict[str, str],
+    chunks: list[str],
+) -> None:
     """Extract all features in sequence, passing context between extractions."""
     langfuse.update_current_trace(
         input={"judgement_type": judgement_type, "model": MODEL},
@@ -198,17 +234,35 @@ def extract_all_features(case_txt: str, judgement_type: str, output_dir: str) ->
 
     previous_extractions: dict[str, dict] = {}
 
+    def extract_parts(schema_name: str, output_path: str) -> list:
+        case_parts = schema_case_parts(schema_name, case_txt, schema_case_texts, chunks)
+        return [
+            extract_single_schema(
+                schema_name=schema_name,
+                case_txt=case_part,
+                judgement_type=judgement_type,
+                output_path=output_path if len(case_parts) == 1 else os.devnull,
+                previous_extractions=previous_extractions
+                if previous_extractions
+                else None,
+            )
+            for case_part in case_parts
+        ]
+
     for schema_name in tqdm(EXTRACTION_ORDER, desc="Schemas", leave=False):
         output_path = f"{output_dir}/{schema_name}.json"
 
         # Extract with context from previous extractions
-        extracted_data = extract_single_schema(
-            schema_name=schema_name,
-            case_txt=case_txt,
-            judgement_type=judgement_type,
-            output_path=output_path,
-            previous_extractions=previous_extractions if previous_extractions else None,
-        )
+        parts = extract_parts(schema_name, output_path)
+        try:
+            extracted_data = merge_partials(schema_name, parts)
+        except ChunkMismatchError as exc:
+            print(f"{schema_name}: {exc} Extracting from the full case text.")
+            chunks = []
+            parts = extract_parts(schema_name, output_path)
+            extracted_data = parts[0]
+        if len(parts) > 1:
+            write_output(output_path, extracted_data)
 
         # Store for use in subsequent extractions
         if schema_name == "judgement":
@@ -221,7 +275,7 @@ def extract_all_features(case_txt: str, judgement_type: str, output_dir: str) ->
 
 
 for judgement_type in tqdm(judgement_types, desc="Judgement Types"):
-    output_dir = f"schema/exampleOutput/{MODEL}/{judgement_type}"
+    output_dir = f"schema/exampleOutput/{OUTPUT_NAME}/{judgement_type}"
     os.makedirs(output_dir, exist_ok=True)
 
     # Skip if all outputs already exist and not rerunning all
@@ -245,24 +299,74 @@ for judgement_type in tqdm(judgement_types, desc="Judgement Types"):
             judgement_path_2 = os.path.join(judgement_base_path, "appeal-from.htm")
 
         with open(judgement_path_1, "r") as f:
-            case_html = BeautifulSoup(f.read(), "html.parser")
+            case_html = f.read()
         with open(judgement_path_2, "r") as f:
-            case_html_2 = BeautifulSoup(f.read(), "html.parser")
-        case_txt = html_to_text_with_tables(case_html) + html_to_text_with_tables(
-            case_html_2
-        )
+            case_html_2 = f.read()
+        judgement_doc = {
+            "html": case_html,
+            judgement_type: True,
+            f"{judgement_type}_html": case_html_2,
+        }
     else:
         judgement_path = os.path.join(judgement_base_path, judgement_type + ".htm")
         with open(judgement_path, "r") as f:
-            case_html = BeautifulSoup(f.read(), "html.parser")
-        case_txt = html_to_text_with_tables(case_html)
-
-    case_txt = re.sub(r"\n\s*\n", "\n\n", case_txt)  # Remove excessive newlines
-    case_txt = case_txt.strip()
+            case_html = f.read()
+        judgement_doc = {"html": case_html}
+
+    case_txt, _, schema_case_texts, chunks = build_case_texts(judgement_doc)
+    if EXTRACT_COMPACT_CASE_TEXT == "on":
+        compacted = compact_case_text(case_txt)
+        before, after = estimate_tokens(case_txt), estimate_tokens(compacted)
+        tqdm.write(
+            f"{judgement_type}: compaction saves {before - after} of {before} "
+            f"estimated case-text tokens ({(before - after) / before:.0%})"
+        )
+        case_txt = compacted
+        schema_case_texts = {
+            schema_name: compact_case_text(schema_case_txt)
+            for schema_name, schema_case_txt in schema_case_texts.items()
+        }
+        chunks = [compact_case_text(chunk) for chunk in chunks]
+    if chunks:
+        tqdm.write(
+            f"{judgement_type}: extracting in {len(chunks)} chunks of "
+            + ", ".join(str(estimate_tokens(chunk)) for chunk in chunks)
+            + " estimated tokens"
+        )
+    if EXTRACT_SECTION_CONTEXT == "on":
+        tqdm.write(
+            f"{judgement_type}: estimated case-text tokens per schema "
+            + ", ".join(
+                f"{schema_name}={estimate_tokens(schema_case_texts.get(schema_name, case_txt))}"
+                for schema_name in EXTRACTION_ORDER
+            )
+            + f" (full text {estimate_tokens(case_txt)})"
+        )
 
     # Extract all features in sequence within a single trace
-    extract_all_features(case_txt, judgement_type, output_dir)
+    extract_all_features(
+        case_txt, judgement_type, output_dir, schema_case_texts, chunks
+    )
     langfuse.flush()
 
 # Flush Langfuse to ensure all traces are sent
 langfuse.flush()
+
+if (response_cache := get_response_cache()) is not None:
+    print(response_cache.summary())
+
+if OUTPUT_NAME != MODEL:
+    print(f"Fields matching schema/exampleOutput/{MODEL}:")
+    for judgement_type in judgement_types:
+        comparison = compare_extraction_dirs(
+            f"schema/exampleOutput/{MODEL}/{judgement_type}",
+            f"schema/exampleOutput/{OUTPUT_NAME}/{judgement_type}",
+            EXTRACTION_ORDER,
+        )
+        for schema_name, result in comparison.items():
+            print(
+                f"  {judgement_type}/{schema_name}: "
+                f"{result['matching']}/{result['fields']}"
+            )
+            for path in result["differing"]:
+                print(f"    differs: {path}")
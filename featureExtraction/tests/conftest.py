@@ -0,0 +1,9 @@
+import os
+
+# extract.config reads these when it is first imported: keep the suite offline,
+# uncached and without backoff sleeps.
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["LANGFUSE_TRACING_ENABLED"] = "false"
+os.environ["EXTRACT_CACHE_DIR"] = ""
+os.environ["EXTRACT_RETRY_BASE_SECONDS"] = "0"
+os.environ["EXTRACT_FANOUT_MIN_ITEMS"] = "0"
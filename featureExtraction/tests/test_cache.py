@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pydantic import BaseModel
+
+from extract.cache import ResponseCache
+
+
+class Answer(BaseModel):
+    text: str
+
+
+def make_key(cache: ResponseCache, case_txt: str) -> str:
+    return cache.key("model", Answer, "prompt", case_txt)
+
+
+def test_key_changes_with_every_input(tmp_path):
+    cache = ResponseCache(str(tmp_path), 1 << 20)
+    keys = {
+        cache.key("model", Answer, "prompt", "case"),
+        cache.key("other-model", Answer, "prompt", "case"),
+        cache.key("model", Answer, "other prompt", "case"),
+        cache.key("model", Answer, "prompt", "other case"),
+    }
+    assert len(keys) == 4
+
+
+def test_second_call_is_served_from_disk(tmp_path):
+    cache = ResponseCache(str(tmp_path), 1 << 20)
+    key = make_key(cache, "case")
+
+    cache.get_or_compute(key, Answer, lambda: Answer(text="first"))
+    value = ResponseCache(str(tmp_path), 1 << 20).get_or_compute(
+        key, Answer, lambda: pytest.fail("computed again")
+    )
+
+    assert value == Answer(text="first")
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_concurrent_callers_share_one_computation(tmp_path):
+    cache = ResponseCache(str(tmp_path), 1 << 20)
+    key = make_key(cache, "case")
+    release = threading.Event()
+    calls = 0
+
+    def compute() -> Answer:
+        nonlocal calls
+        calls += 1
+        release.wait(5)
+        return Answer(text="shared")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(cache.get_or_compute, key, Answer, compute)
+            for _ in range(4)
+        ]
+        # Hold the first call until the other three are waiting for it.
+        for _ in range(500):
+            if cache.shared == 3:
+                break
+            time.sleep(0.01)
+        release.set()
+        values = [future.result() for future in futures]
+
+    assert calls == 1
+    assert values == [Answer(text="shared")] * 4
+    assert (cache.misses, cache.shared) == (1, 3)
+
+
+def test_failed_computation_is_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path), 1 << 20)
+    key = make_key(cache, "case")
+
+    def fail() -> Answer:
+        raise RuntimeError("call failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute(key, Answer, fail)
+    assert cache.get_or_compute(key, Answer, lambda: Answer(text="ok")).text == "ok"
+
+
+def test_async_callers_share_one_computation(tmp_path):
+    cache = ResponseCache(str(tmp_path), 1 << 20)
+    key = make_key(cache, "case")
+    calls = 0
+
+    async def compute() -> Answer:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return Answer(text="shared")
+
+    async def run() -> list[Answer]:
+        return await asyncio.gather(
+            *(cache.aget_or_compute(key, Answer, compute) for _ in range(4))
+        )
+
+    assert asyncio.run(run()) == [Answer(text="shared")] * 4
+    assert (calls, cache.shared) == (1, 3)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    entry_size = len(Answer(text="x" * 10).model_dump_json())
+    cache = ResponseCache(str(tmp_path), entry_size * 2)
+    first, second, third = (make_key(cache, case) for case in "abc")
+
+    cache.get_or_compute(first, Answer, lambda: Answer(text="1" * 10))
+    cache.get_or_compute(second, Answer, lambda: Answer(text="2" * 10))
+    # Reading the first entry makes the second the least recently used.
+    cache.get_or_compute(first, Answer, lambda: pytest.fail("computed again"))
+    cache.get_or_compute(third, Answer, lambda: Answer(text="3" * 10))
+
+    assert cache.evictions == 1
+    assert not (tmp_path / second[:2] / f"{second}.json").exists()
+    assert (tmp_path / first[:2] / f"{first}.json").exists()
+    reloaded = ResponseCache(str(tmp_path), entry_size * 2)
+    assert reloaded.summary().endswith(f"entries=2, bytes={entry_size * 2}")
+
+
+def test_unreadable_entry_is_a_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path), 1 << 20)
+    key = make_key(cache, "case")
+    cache.get_or_compute(key, Answer, lambda: Answer(text="first"))
+    (tmp_path / key[:2] / f"{key}.json").write_text('{"text": ')
+
+    value = cache.get_or_compute(key, Answer, lambda: Answer(text="again"))
+
+    assert value.text == "again"
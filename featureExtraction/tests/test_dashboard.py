@@ -0,0 +1,16 @@
+import extract.dashboard as dashboard
+from extract.timing import StageProfile
+
+
+def test_latency_includes_fanned_out_calls(monkeypatch):
+    profile = StageProfile()
+    monkeypatch.setattr(dashboard, "RUN_PROFILE", profile)
+    profile.record("llm.judgement", 1.0)
+    profile.record("llm.defendant", 2.0)
+
+    latency = dashboard.Dashboard(1, None, 1.0).render()[1]
+
+    assert "judgement 1.0/1.0s" in latency
+    assert "defendant 2.0/2.0s" in latency
+    assert "defendants -" in latency
+    assert " trial " not in latency
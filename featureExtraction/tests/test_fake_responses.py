@@ -0,0 +1,124 @@
+"""Extract sample judgements end to end against fakeResponsesServer.py."""
+
+import json
+import sys
+import threading
+import urllib.request
+from pathlib import Path
+
+import mongomock
+import pytest
+
+import fakeResponsesServer
+from extract.client import close_clients
+from extract.lease import STATUS_CLAIMED, STATUS_DONE, STATUS_FIELD, LeaseQueue
+from extract.runner import complete_written, process_judgement_doc
+from extract.writer import BulkWriter
+
+ROOT = Path(__file__).parent.parent
+SAMPLES = ["multi-d-multi-dt", "single-d-single-dt", "appeal"]
+
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    # Enough injected faults that every kind of retry happens at least once.
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "fakeResponsesServer.py",
+            "--port",
+            "0",
+            "--outputs",
+            str(ROOT / fakeResponsesServer.DEFAULT_OUTPUTS_DIR),
+            "--malformed-rate",
+            "0.2",
+            "--error-rate",
+            "0.1",
+            "--rate-limit-rate",
+            "0.2",
+            "--retry-after",
+            "0",
+        ],
+    )
+    fake = fakeResponsesServer.FakeResponses(fakeResponsesServer.parse_args())
+    server = fakeResponsesServer.Server(
+        ("127.0.0.1", 0), fakeResponsesServer.make_handler(fake)
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setenv("OPENAI_BASE_URL", f"{url}/v1")
+    try:
+        yield url
+    finally:
+        close_clients()
+        server.shutdown()
+        server.server_close()
+
+
+def judgement_docs() -> list[dict]:
+    return [
+        {
+            "_id": index,
+            "trial": f"HCCC {index}/2025",
+            "html": (ROOT / "sampleJudgments" / f"{sample}.htm").read_text(),
+        }
+        for index, sample in enumerate(SAMPLES)
+    ]
+
+
+def server_stats(url: str) -> dict:
+    with urllib.request.urlopen(f"{url}/stats") as response:
+        return json.load(response)
+
+
+def test_judgements_are_extracted_through_retries(fake_server):
+    extracted = mongomock.MongoClient().db.extracted
+
+    results = [process_judgement_doc(doc, extracted) for doc in judgement_docs()]
+
+    assert [result.status for result in results] == ["processed"] * len(SAMPLES)
+    assert extracted.count_documents({}) == len(SAMPLES)
+    doc = extracted.find_one({"source_judgement_id": 0})
+    assert doc["judgement"]["charges"]
+    assert doc["defendants"]["defendants"]
+    assert doc["trials"]["trials"]
+    assert set(doc["usage"]["by_schema"]) == {"judgement", "defendants", "trials"}
+    assert all(usage["calls"] >= 1 for usage in doc["usage"]["by_schema"].values())
+    assert doc["usage"]["total"]["input_tokens"] > 0
+
+    outcomes = server_stats(fake_server)["outcomes"]
+    assert {"rate_limited", "server_error"} <= set(outcomes)
+    assert any(outcome.startswith("malformed_") for outcome in outcomes)
+
+
+def test_bulk_written_leases_are_completed_after_the_insert(fake_server, tmp_path):
+    db = mongomock.MongoClient().db
+    db.judgements.insert_many(judgement_docs())
+    queue = LeaseQueue(
+        db.judgements, lease_seconds=60, max_attempts=1, worker_id="worker"
+    )
+
+    with (
+        queue,
+        BulkWriter(
+            db.extracted,
+            batch_size=100,
+            flush_seconds=60,
+            spill_dir=str(tmp_path),
+            log=lambda message: None,
+            on_written=complete_written(queue),
+        ) as writer,
+    ):
+        for doc in queue.iter_claims():
+            assert process_judgement_doc(doc, db.extracted, writer).status == (
+                "processed"
+            )
+        # Extracted but still buffered: the claims are kept.
+        assert db.extracted.count_documents({}) == 0
+        assert db.judgements.count_documents({STATUS_FIELD: STATUS_CLAIMED}) == 3
+        writer.flush()
+        assert db.judgements.count_documents({STATUS_FIELD: STATUS_DONE}) == 3
+
+    assert db.extracted.count_documents({}) == len(SAMPLES)
@@ -0,0 +1,45 @@
+from pathlib import Path
+
+import pytest
+from bs4 import BeautifulSoup
+
+from utils.htmlToText import _read_html_markdown, table_to_markdown
+
+SAMPLES_DIR = Path(__file__).parent.parent / "sampleJudgments"
+
+
+def sample_tables() -> list:
+    return [
+        pytest.param(table, id=f"{path.name}-{index}")
+        for path in sorted(SAMPLES_DIR.glob("*.htm"))
+        for index, table in enumerate(
+            BeautifulSoup(path.read_text(), "lxml").find_all("table")[1:]
+        )
+    ]
+
+
+@pytest.mark.parametrize("table", sample_tables())
+def test_sample_tables_match_read_html(table):
+    assert table_to_markdown(table) == _read_html_markdown(table)
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        # Superscripts, line breaks and runs of spaces.
+        "<tr><td>Appearance</td><td>Date</td></tr>"
+        "<tr><td>1<sup>st</sup></td><td>3/4/1979<br>and\n 5/4/1979</td></tr>",
+        # A blank row, a blank and a repeated header.
+        "<tr><td>A</td><td></td><td>A</td></tr><tr><td></td><td></td><td></td></tr>"
+        "<tr><td>x</td><td>NA</td><td>7</td></tr>",
+        # Cells spanning rows and columns, past the end of the table.
+        '<tr><td rowspan="3">1st</td><td colspan="2">Offence</td></tr>'
+        "<tr><td>Rape</td></tr>",
+        # Columns pandas reads as numbers go through pandas.
+        "<tr><td>Drug</td><td>Weight</td></tr>"
+        "<tr><td>Heroin</td><td>1,020.50</td></tr><tr><td>Ice</td><td></td></tr>",
+    ],
+)
+def test_tables_match_read_html(html):
+    table = BeautifulSoup(f"<table>{html}</table>", "lxml").find("table")
+    assert table_to_markdown(table) == _read_html_markdown(table)
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+import pytest
+
+from extract.lease import (
+    ATTEMPTS_FIELD,
+    EXPIRES_FIELD,
+    OWNER_FIELD,
+    STATUS_CLAIMED,
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUS_FIELD,
+    LeaseQueue,
+    claimable_filter,
+)
+
+
+@pytest.fixture
+def judgements():
+    collection = mongomock.MongoClient().db.judgements
+    collection.insert_many([{"_id": source_id} for source_id in range(3)])
+    return collection
+
+
+def make_queue(judgements, worker_id: str, **kwargs) -> LeaseQueue:
+    options = {"lease_seconds": 60, "max_attempts": 2, "retry_seconds": 60}
+    return LeaseQueue(judgements, worker_id=worker_id, **(options | kwargs))
+
+
+def claimable_ids(judgements, now: datetime, max_attempts: int = 2) -> list[int]:
+    return [doc["_id"] for doc in judgements.find(claimable_filter(now, max_attempts))]
+
+
+def test_claim_takes_each_judgement_once(judgements):
+    first, second = make_queue(judgements, "a"), make_queue(judgements, "b")
+
+    claimed = [first.claim(), second.claim(), first.claim(), second.claim()]
+
+    assert sorted(doc["_id"] for doc in claimed[:3]) == [0, 1, 2]
+    assert claimed[3] is None
+    doc = judgements.find_one({"_id": claimed[0]["_id"]})
+    assert doc[STATUS_FIELD] == STATUS_CLAIMED
+    assert doc[OWNER_FIELD] == "a"
+    assert doc[ATTEMPTS_FIELD] == 1
+
+
+def test_expired_claim_can_be_taken_over(judgements):
+    now = datetime.now(timezone.utc)
+    judgements.update_one(
+        {"_id": 0},
+        {
+            "$set": {
+                STATUS_FIELD: STATUS_CLAIMED,
+                OWNER_FIELD: "crashed",
+                EXPIRES_FIELD: now - timedelta(seconds=1),
+                ATTEMPTS_FIELD: 1,
+            }
+        },
+    )
+    judgements.update_one(
+        {"_id": 1},
+        {
+            "$set": {
+                STATUS_FIELD: STATUS_CLAIMED,
+                OWNER_FIELD: "alive",
+                EXPIRES_FIELD: now + timedelta(minutes=5),
+                ATTEMPTS_FIELD: 1,
+            }
+        },
+    )
+
+    assert claimable_ids(judgements, now) == [0, 2]
+    queue = make_queue(judgements, "b")
+    assert queue.claim({"_id": 0})[OWNER_FIELD] == "b"
+    assert queue.claim({"_id": 1}) is None
+
+
+def test_failed_judgement_waits_for_its_retry_time(judgements):
+    queue = make_queue(judgements, "a")
+    doc = queue.claim({"_id": 0})
+
+    assert queue.fail(doc["_id"], "boom")
+
+    failed = judgements.find_one({"_id": 0})
+    assert failed[STATUS_FIELD] == STATUS_FAILED
+    assert OWNER_FIELD not in failed
+    now = datetime.now(timezone.utc)
+    assert 0 not in claimable_ids(judgements, now)
+    assert 0 in claimable_ids(judgements, now + timedelta(seconds=61))
+
+
+def test_failure_without_retry_time_is_claimable(judgements):
+    judgements.update_one(
+        {"_id": 0}, {"$set": {STATUS_FIELD: STATUS_FAILED, ATTEMPTS_FIELD: 1}}
+    )
+    assert 0 in claimable_ids(judgements, datetime.now(timezone.utc))
+
+
+def test_failed_judgement_is_not_claimed_past_max_attempts(judgements):
+    judgements.update_one(
+        {"_id": 0}, {"$set": {STATUS_FIELD: STATUS_FAILED, ATTEMPTS_FIELD: 2}}
+    )
+
+    assert 0 not in claimable_ids(judgements, datetime.now(timezone.utc))
+    assert make_queue(judgements, "a").claim({"_id": 0}) is None
+
+
+def test_only_the_owner_settles_a_claim(judgements):
+    owner, other = make_queue(judgements, "a"), make_queue(judgements, "b")
+    doc = owner.claim({"_id": 0})
+
+    assert not other.complete(doc["_id"])
+    assert owner.complete_many([doc["_id"]]) == 1
+    assert judgements.find_one({"_id": 0})[STATUS_FIELD] == STATUS_DONE
+    assert 0 not in claimable_ids(judgements, datetime.now(timezone.utc))
+
+
+def test_release_all_returns_held_claims(judgements):
+    with make_queue(judgements, "a") as queue:
+        held = queue.claim({"_id": 0})
+        queue.complete(queue.claim({"_id": 1})["_id"])
+
+    released = judgements.find_one({"_id": held["_id"]})
+    assert OWNER_FIELD not in released
+    assert released[ATTEMPTS_FIELD] == 0
+    assert claimable_ids(judgements, datetime.now(timezone.utc)) == [0, 2]
@@ -0,0 +1,134 @@
+import copy
+from pathlib import Path
+
+import pytest
+from pydantic import BaseModel
+
+from extract.merge import ChunkMismatchError, merge_partials, normalise_name
+from fakeBatchServer import canned_output, trim_to_schema
+from schema import Defendants, Judgement, Trials
+
+SAMPLE_DIR = str(
+    Path(__file__).parent.parent / "schema/exampleOutput/gpt-5-mini/multi-d-multi-dt"
+)
+MODELS: dict[str, type[BaseModel]] = {
+    "judgement": Judgement,
+    "defendants": Defendants,
+    "trials": Trials,
+}
+
+
+def load(schema_name: str) -> dict:
+    """The sample output of a schema without its computed fields."""
+    schema = MODELS[schema_name].model_json_schema()
+    return trim_to_schema(
+        canned_output(SAMPLE_DIR, schema_name), schema, schema.get("$defs", {})
+    )
+
+
+def test_normalise_name_ignores_case_spacing_and_punctuation():
+    assert normalise_name("  SO  Hoi-yan ") == normalise_name("so hoi yan")
+
+
+def test_single_chunk_is_returned_as_is():
+    judgement = Judgement.model_validate(load("judgement"))
+    assert merge_partials("judgement", [judgement]) is judgement
+
+
+def test_judgement_fields_come_from_the_first_chunk_that_found_them():
+    first, second = load("judgement"), load("judgement")
+    place = first["charges"][3]["place_of_offence"]
+    first["charges"][3]["place_of_offence"] = None
+    second["neutral_citation"] = "[2025] HKCFI 9999"
+    second["representatives"].append({"name": "Mr Chan", "role": "for the 2nd accused"})
+
+    merged = merge_partials(
+        "judgement",
+        [Judgement.model_validate(first), Judgement.model_validate(second)],
+    )
+
+    assert merged.neutral_citation == first["neutral_citation"]
+    assert merged.charges[3].place_of_offence.address == place["address"]
+    assert len(merged.representatives) == len(first["representatives"]) + 1
+    assert [charge.charge_no for charge in merged.charges] == [1, 2, 3, 4]
+
+
+def test_judgement_defendants_are_matched_by_normalised_name():
+    first, second = load("judgement"), load("judgement")
+    second["charges"][0]["defendants_of_charge"][0]["defendant_name"] = "SO HOI-YAN"
+
+    merged = merge_partials(
+        "judgement",
+        [Judgement.model_validate(first), Judgement.model_validate(second)],
+    )
+
+    assert len(merged.charges[0].defendants_of_charge) == 1
+
+
+def test_chunks_attributing_a_charge_to_another_defendant_do_not_merge():
+    first, second = load("judgement"), load("judgement")
+    # Chunk 2 reads charge 1 as being against the 2nd defendant.
+    second["charges"][0]["defendants_of_charge"] = copy.deepcopy(
+        second["charges"][1]["defendants_of_charge"]
+    )
+
+    with pytest.raises(ChunkMismatchError):
+        merge_partials(
+            "judgement",
+            [Judgement.model_validate(first), Judgement.model_validate(second)],
+        )
+
+
+def test_chunks_listing_different_charges_do_not_merge():
+    first, second = load("judgement"), load("judgement")
+    del second["charges"][-1]
+
+    with pytest.raises(ChunkMismatchError):
+        merge_partials(
+            "judgement",
+            [Judgement.model_validate(first), Judgement.model_validate(second)],
+        )
+
+
+def test_defendant_profiles_are_merged_by_name():
+    first, second = load("defendants"), load("defendants")
+    first["defendants"][1]["occupation"] = None
+    second["defendants"][0]["defendant_name"]["name"] = "so hoi yan"
+
+    merged = merge_partials(
+        "defendants",
+        [Defendants.model_validate(first), Defendants.model_validate(second)],
+    )
+
+    assert len(merged.defendants) == len(first["defendants"])
+    assert merged.defendants[0].defendant_name.name == "So Hoi-yan"
+    assert merged.defendants[1].occupation == (
+        Defendants.model_validate(second).defendants[1].occupation
+    )
+
+
+def test_defendant_given_different_ids_does_not_merge():
+    first, second = load("defendants"), load("defendants")
+    second["defendants"][0]["defendant_id"], second["defendants"][1]["defendant_id"] = (
+        second["defendants"][1]["defendant_id"],
+        second["defendants"][0]["defendant_id"],
+    )
+
+    with pytest.raises(ChunkMismatchError):
+        merge_partials(
+            "defendants",
+            [Defendants.model_validate(first), Defendants.model_validate(second)],
+        )
+
+
+def test_trials_keep_the_chunk_that_states_the_most():
+    full, sparse = load("trials"), load("trials")
+    sparse["trials"][0]["mitigating_factors"] = None
+
+    merged = merge_partials(
+        "trials",
+        [Trials.model_validate(sparse), Trials.model_validate(full)],
+    )
+
+    assert len(merged.trials) == len(full["trials"])
+    assert merged.trials[0].mitigating_factors is not None
@@ -0,0 +1,141 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+from extract.pipeline import aextract_single_schema
+from extract.retry import (
+    ERROR_FATAL,
+    ERROR_RATE_LIMIT,
+    ERROR_REFUSAL,
+    ERROR_TRANSPORT,
+    ERROR_VALIDATION,
+    Deadline,
+    DeadlineExceeded,
+    RefusalError,
+    RetryBudget,
+    RetryPolicy,
+    classify_error,
+)
+
+REQUEST = httpx.Request("POST", "http://localhost/v1/responses")
+
+POLICY = RetryPolicy(
+    budgets={
+        ERROR_TRANSPORT: 3,
+        ERROR_RATE_LIMIT: 2,
+        ERROR_REFUSAL: 1,
+        ERROR_VALIDATION: 2,
+        ERROR_FATAL: 0,
+    },
+    base_delay=1.0,
+    max_delay=3.0,
+    call_timeout=30.0,
+    judgement_deadline=0.0,
+)
+
+
+def status_error(
+    error_type: type[openai.APIStatusError],
+    status_code: int,
+    headers: dict[str, str] | None = None,
+) -> openai.APIStatusError:
+    response = httpx.Response(status_code, headers=headers, request=REQUEST)
+    return error_type("injected", response=response, body=None)
+
+
+def transport_error() -> openai.APIConnectionError:
+    return openai.APIConnectionError(request=REQUEST)
+
+
+@pytest.mark.parametrize(
+    ("exc", "kind"),
+    [
+        (status_error(openai.RateLimitError, 429), ERROR_RATE_LIMIT),
+        (status_error(openai.InternalServerError, 503), ERROR_TRANSPORT),
+        (status_error(openai.APIStatusError, 409), ERROR_TRANSPORT),
+        (status_error(openai.BadRequestError, 400), ERROR_FATAL),
+        (transport_error(), ERROR_TRANSPORT),
+        (RefusalError("no"), ERROR_REFUSAL),
+        (ValueError("bad json"), ERROR_VALIDATION),
+        (RuntimeError("bug"), ERROR_FATAL),
+    ],
+)
+def test_classify_error(exc, kind):
+    assert classify_error(exc) == kind
+
+
+def test_each_error_class_has_its_own_budget():
+    budget = RetryBudget(POLICY)
+
+    assert [budget.next_delay(ValueError("bad")) for _ in range(3)] == [0.0, 0.0, None]
+    # Validation failures did not use up the transport retries.
+    assert all(budget.next_delay(transport_error()) is not None for _ in range(3))
+    assert budget.next_delay(transport_error()) is None
+    assert budget.retries == {
+        ERROR_TRANSPORT: 3,
+        ERROR_RATE_LIMIT: 0,
+        ERROR_REFUSAL: 0,
+        ERROR_VALIDATION: 2,
+        ERROR_FATAL: 0,
+    }
+    assert budget.attempts == 7
+
+
+def test_fatal_errors_are_not_retried():
+    budget = RetryBudget(POLICY)
+    assert budget.next_delay(status_error(openai.BadRequestError, 400)) is None
+
+
+def test_transport_backoff_is_capped(monkeypatch):
+    monkeypatch.setattr("extract.retry.random.uniform", lambda low, high: high)
+    budget = RetryBudget(POLICY)
+
+    delays = [budget.next_delay(transport_error()) for _ in range(3)]
+
+    assert delays == [1.0, 2.0, 3.0]
+
+
+def test_rate_limit_waits_at_least_retry_after(monkeypatch):
+    monkeypatch.setattr("extract.retry.random.uniform", lambda low, high: low)
+    budget = RetryBudget(POLICY)
+    in_ms = status_error(openai.RateLimitError, 429, {"retry-after-ms": "2500"})
+    in_seconds = status_error(openai.RateLimitError, 429, {"retry-after": "4"})
+
+    assert budget.next_delay(in_ms) == 2.5
+    assert budget.next_delay(in_seconds) == 4.0
+
+
+def test_no_retry_that_would_outlast_the_deadline():
+    budget = RetryBudget(POLICY, Deadline(5))
+    exc = status_error(openai.RateLimitError, 429, {"retry-after": "10"})
+
+    assert budget.next_delay(exc) is None
+    assert budget.call_timeout() <= 5
+
+
+def test_call_timeout_raises_once_the_deadline_has_passed():
+    budget = RetryBudget(POLICY, Deadline(5))
+    budget.deadline.expires_at -= 10
+
+    with pytest.raises(DeadlineExceeded):
+        budget.call_timeout()
+
+
+def test_call_timeout_without_deadline():
+    assert RetryBudget(POLICY, Deadline(0)).call_timeout() == POLICY.call_timeout
+
+
+def test_expired_deadline_is_reported(capsys):
+    deadline = Deadline(5)
+    deadline.expires_at -= 10
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(
+            aextract_single_schema(
+                "judgement", "case", "HCCC", client=None, deadline=deadline
+            )
+        )
+
+    assert "Failed to extract judgement for HCCC" in capsys.readouterr().out
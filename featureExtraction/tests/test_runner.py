@@ -0,0 +1,36 @@
+import mongomock
+import pytest
+
+import extract.runner as runner
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(runner, "STREAM_ID_PAGE_SIZE", 4)
+    monkeypatch.setattr(runner, "MUST_INCLUDE_TRIALS", ["T7", "T8"])
+    monkeypatch.setattr(runner, "EXTRACT_LIMIT", 0)
+    db = mongomock.MongoClient().db
+    db.judgements.insert_many(
+        [{"_id": source_id, "trial": f"T{source_id}"} for source_id in range(12)]
+    )
+    db.extracted.insert_many(
+        [{"source_judgement_id": source_id} for source_id in (1, 2, 3, 5, 8)]
+    )
+    return db
+
+
+def test_stream_yields_pending_judgements_must_include_first(db):
+    docs, judgement_count, must_include_count = runner.stream_docs_to_process(
+        db.judgements, db.extracted
+    )
+
+    assert [doc["_id"] for doc in docs] == [7, 0, 4, 6, 9, 10, 11]
+    assert (judgement_count, must_include_count) == (7, 1)
+
+
+def test_stream_stops_at_the_limit(db, monkeypatch):
+    monkeypatch.setattr(runner, "EXTRACT_LIMIT", 3)
+
+    docs, _, _ = runner.stream_docs_to_process(db.judgements, db.extracted)
+
+    assert [doc["_id"] for doc in docs] == [7, 0, 4, 6]
@@ -0,0 +1,37 @@
+import pytest
+
+from extract.prompts import SCHEMA_CONFIGS
+from extract.text_format import text_format
+
+
+def objects(schema):
+    if isinstance(schema, dict):
+        if schema.get("type") == "object":
+            yield schema
+        for value in schema.values():
+            yield from objects(value)
+    elif isinstance(schema, list):
+        for value in schema:
+            yield from objects(value)
+
+
+@pytest.mark.parametrize("schema_name", SCHEMA_CONFIGS)
+def test_every_object_is_strict(schema_name):
+    model = SCHEMA_CONFIGS[schema_name]["model"]
+    text = text_format(model)
+
+    assert (text["type"], text["strict"], text["name"]) == (
+        "json_schema",
+        True,
+        model.__name__,
+    )
+    for schema in objects(text["schema"]):
+        assert schema["additionalProperties"] is False
+        assert schema["required"] == list(schema["properties"])
+
+
+def test_refs_with_siblings_are_inlined():
+    for schema_name, config in SCHEMA_CONFIGS.items():
+        for schema in objects(text_format(config["model"])["schema"]):
+            for value in schema["properties"].values():
+                assert "$ref" not in value or len(value) == 1, schema_name
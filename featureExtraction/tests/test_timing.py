@@ -0,0 +1,35 @@
+import pytest
+
+from extract.timing import HISTOGRAM_BUCKETS, RESERVOIR_SIZE, StageProfile
+
+
+def test_stats_and_buckets_are_exact():
+    profile = StageProfile()
+    for seconds in (0.002, 0.002, 0.2, 3.0, 1000.0):
+        profile.record("llm.judgement", seconds)
+
+    stat = profile.histograms()["llm.judgement"]
+
+    assert (stat["count"], stat["max"]) == (5, 1000.0)
+    assert stat["total"] == pytest.approx(1003.204)
+    assert stat["p50"] == 0.2
+    counts = dict(zip(HISTOGRAM_BUCKETS, stat["bucket_counts"]))
+    assert (counts[0.001], counts[0.005], counts[0.5], counts[5.0]) == (0, 2, 3, 4)
+    assert counts[600.0] == 4
+
+
+def test_memory_per_stage_is_bounded():
+    profile = StageProfile()
+    for index in range(RESERVOIR_SIZE * 3):
+        profile.record("mongo.find", index / 1000)
+
+    stat = profile.stats()["mongo.find"]
+
+    assert stat["count"] == RESERVOIR_SIZE * 3
+    assert stat["max"] == (RESERVOIR_SIZE * 3 - 1) / 1000
+    assert len(profile._durations["mongo.find"].reservoir) == RESERVOIR_SIZE
+    # The sampled median stays close to the true one.
+    assert abs(stat["p50"] - RESERVOIR_SIZE * 1.5 / 1000) < RESERVOIR_SIZE * 0.3 / 1000
+    assert profile.recent("mongo.find", 3) == [
+        (RESERVOIR_SIZE * 3 - offset) / 1000 for offset in (3, 2, 1)
+    ]
@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+
+import mongomock
+import pytest
+from bson import ObjectId, json_util
+
+from extract.writer import QUARANTINE_SUFFIX, BulkWriter
+
+
+@pytest.fixture
+def extracted():
+    return mongomock.MongoClient().db.extracted
+
+
+def make_writer(extracted, spill_dir) -> BulkWriter:
+    return BulkWriter(
+        extracted,
+        batch_size=100,
+        flush_seconds=60,
+        spill_dir=str(spill_dir),
+        log=lambda message: None,
+    )
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def write_journal(path, docs: list[dict], tail: str = "") -> None:
+    path.write_text("".join(json_util.dumps(doc) + "\n" for doc in docs) + tail)
+
+
+def test_journal_of_a_dead_worker_is_replayed(extracted, tmp_path):
+    docs = [{"_id": ObjectId(), "source_judgement_id": index} for index in range(2)]
+    extracted.insert_one(docs[0])
+    write_journal(tmp_path / f"pending-{dead_pid()}-1.jsonl", docs)
+
+    assert make_writer(extracted, tmp_path).recover() == 2
+
+    assert extracted.count_documents({}) == 2
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_journal_of_a_running_worker_is_left_alone(extracted, tmp_path):
+    journal = tmp_path / f"pending-{os.getppid()}-1.jsonl"
+    write_journal(journal, [{"_id": ObjectId(), "source_judgement_id": 0}])
+
+    assert make_writer(extracted, tmp_path).recover() == 0
+
+    assert extracted.count_documents({}) == 0
+    assert journal.exists()
+
+
+def test_journal_of_another_writer_in_this_process_is_left_alone(extracted, tmp_path):
+    with make_writer(extracted, tmp_path) as first:
+        first.add({"source_judgement_id": 0})
+
+        assert make_writer(extracted, tmp_path).recover() == 0
+
+        assert extracted.count_documents({}) == 0
+    assert extracted.count_documents({}) == 1
+
+
+def test_truncated_last_line_is_quarantined(extracted, tmp_path):
+    docs = [{"_id": ObjectId(), "source_judgement_id": index} for index in range(2)]
+    write_journal(
+        tmp_path / f"pending-{dead_pid()}-1.jsonl", docs, '{"_id": {"$oid": "65'
+    )
+
+    assert make_writer(extracted, tmp_path).recover() == 2
+
+    assert extracted.count_documents({}) == 2
+    [quarantined] = tmp_path.glob(f"*{QUARANTINE_SUFFIX}")
+    assert quarantined.read_text() == '{"_id": {"$oid": "65\n'
+    assert list(tmp_path.glob("pending-*.jsonl")) == []
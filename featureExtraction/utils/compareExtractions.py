@@ -0,0 +1,58 @@
+import json
+import os
+
+# Written per run, so never expected to match.
+IGNORED_FIELDS = {"tracing_id"}
+
+
+def flatten(value: object, path: str = "") -> dict[str, object]:
+    """Map every leaf of an extraction to its path, e.g. ``charges[0].charge_no``."""
+    if isinstance(value, dict):
+        leaves = {}
+        for key, item in value.items():
+            if key not in IGNORED_FIELDS:
+                leaves.update(flatten(item, f"{path}.{key}" if path else key))
+        return leaves
+    if isinstance(value, list):
+        leaves = {}
+        for index, item in enumerate(value):
+            leaves.update(flatten(item, f"{path}[{index}]"))
+        return leaves or {path: []}
+    return {path: value}
+
+
+def compare_extraction_files(baseline_path: str, candidate_path: str) -> dict:
+    """Count the leaves of two outputs of one schema that hold the same value."""
+    with open(baseline_path) as f:
+        baseline = flatten(json.load(f))
+    with open(candidate_path) as f:
+        candidate = flatten(json.load(f))
+
+    paths = baseline.keys() | candidate.keys()
+    differing = sorted(
+        path
+        for path in paths
+        if path not in baseline
+        or path not in candidate
+        or baseline[path] != candidate[path]
+    )
+    return {
+        "fields": len(paths),
+        "matching": len(paths) - len(differing),
+        "differing": differing,
+    }
+
+
+def compare_extraction_dirs(
+    baseline_dir: str, candidate_dir: str, schema_names: list[str]
+) -> dict[str, dict]:
+    """Compare ``<schema>.json`` in two output directories, where both exist."""
+    return {
+        schema_name: compare_extraction_files(
+            os.path.join(baseline_dir, f"{schema_name}.json"),
+            os.path.join(candidate_dir, f"{schema_name}.json"),
+        )
+        for schema_name in schema_names
+        if os.path.exists(os.path.join(baseline_dir, f"{schema_name}.json"))
+        and os.path.exists(os.path.join(candidate_dir, f"{schema_name}.json"))
+    }
@@ -1,26 +1,205 @@
+import re
 from io import StringIO
-from bs4 import BeautifulSoup
-import pandas as pd
 
+from bs4 import BeautifulSoup, Tag
+from bs4.element import PreformattedString
+from tabulate import tabulate
 
-def html_to_text_with_tables(soup: BeautifulSoup) -> str:
-    """Convert HTML to text, preserving tables as clean HTML."""
-    soup = BeautifulSoup(
-        str(soup), "html.parser"
-    )  # Make a copy to avoid modifying original
+# Cell text is cleaned the way ``pd.read_html`` cleans it, so simple tables
+# come out as they did when every table went through pandas.
+_RE_WHITESPACE = re.compile(r"[\r\n]+|\s{2,}")
+# Column values that read_html keeps as they are written: plain integers.
+_RE_PLAIN_INT = re.compile(r"^(0|-?[1-9][0-9]{0,17})$")
+_RE_NUMBER = re.compile(r"^[\-\+]?([0-9,]+\.?[0-9]*|\.[0-9]+)([eE][\-\+]?[0-9]+)?$")
+_BOOLEANS = {"True", "TRUE", "true", "False", "FALSE", "false"}
+# pandas' default NA strings, which it writes out as empty cells.
+_NA_VALUES = {
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+}
 
+
+def _is_complex(table: Tag) -> bool:
+    """Whether the table has sections, nested tables or hidden content.
+
+    These are rare in judgements and are left to ``pd.read_html``, which
+    already handles them.
+    """
+    return table.find(["thead", "tfoot", "table", "style"]) is not None or any(
+        "display:none" in str(tag.get("style", "")).replace(" ", "")
+        for tag in table.find_all(style=True)
+    )
+
+
+def _read_html_markdown(table: Tag) -> str:
+    # Imported here so that the common case never loads pandas.
+    import pandas as pd
+
+    return (
+        pd.read_html(StringIO(str(table)), header=0)[0]
+        .fillna("")
+        .rename(columns={"Unnamed: 0": ""})
+        .astype(str)
+        .to_markdown(index=False)
+    )
+
+
+def _cell_text(cell: Tag) -> str:
+    parts = []
+    for node in cell.descendants:
+        if isinstance(node, Tag):
+            if node.name == "br":
+                parts.append("\n")
+        elif not isinstance(node, PreformattedString):
+            parts.append(str(node))
+    return _RE_WHITESPACE.sub(" ", "".join(parts).strip())
+
+
+def _take_spans(
+    row: list[str], spans: list[tuple[int, str, int]], rest: bool = False
+) -> list[tuple[int, str, int]]:
+    """Append the cells carried down from earlier rows that belong at the end
+    of ``row`` (or all of them with ``rest``), and return the spans that
+    continue into the next row."""
+    carried = []
+    while spans and (rest or spans[0][0] <= len(row)):
+        column, text, rows_left = spans.pop(0)
+        row.append(text)
+        if rows_left > 1:
+            carried.append((column, text, rows_left - 1))
+    return carried
+
+
+def _rows(table: Tag) -> list[list[str]]:
+    """The table's cells row by row, with spanned cells repeated as read_html
+    repeats them."""
+    rows: list[list[str]] = []
+    spans: list[tuple[int, str, int]] = []
+    for tr in table.find_all("tr"):
+        row: list[str] = []
+        next_spans: list[tuple[int, str, int]] = []
+        for cell in tr.find_all(["td", "th"], recursive=False):
+            next_spans += _take_spans(row, spans)
+            text = _cell_text(cell)
+            rowspan = int(cell.get("rowspan") or 1)
+            for _ in range(int(cell.get("colspan") or 1)):
+                if rowspan > 1:
+                    next_spans.append((len(row), text, rowspan - 1))
+                row.append(text)
+        next_spans += _take_spans(row, spans, rest=True)
+        rows.append(row)
+        spans = next_spans
+    # Cells spanning past the last row add rows of their own.
+    while spans:
+        row = []
+        spans = _take_spans(row, spans, rest=True)
+        rows.append(row)
+    return rows
+
+
+def _column_names(header: list[str]) -> list[str]:
+    """Header names as read_html gives them: blanks are "Unnamed: N" (the
+    first one left empty) and repeats get a ".N" suffix."""
+    names: list[str] = []
+    for index, name in enumerate(header):
+        name = name or (f"Unnamed: {index}" if index else "")
+        base, count = name, 0
+        while name in names:
+            count += 1
+            name = f"{base}.{count}"
+        names.append(name)
+    return names
+
+
+def _converts_values(column: list[str]) -> bool:
+    """Whether read_html would read the column as numbers or booleans and so
+    write its cells differently from how they appear."""
+    values = [value for value in column if value not in _NA_VALUES]
+    if not values:
+        return False
+    # Thousands separators are dropped from any number, whatever the column.
+    if any("," in value and _RE_NUMBER.match(value) for value in values):
+        return True
+    if all(value in _BOOLEANS for value in values):
+        return True
+    if not all(_RE_NUMBER.match(value) for value in values):
+        return False
+    # Integers stay as written unless an empty cell makes the column float.
+    return len(values) < len(column) or not all(
+        _RE_PLAIN_INT.match(value) for value in values
+    )
+
+
+def table_to_markdown(table: Tag) -> str:
+    """Render a judgement table as a markdown pipe table.
+
+    The first row is the header and cells spanning several rows or columns
+    are repeated in each, as with ``pd.read_html(header=0)``. Tables that
+    read_html would read differently from their text (sections, hidden
+    content, numeric or boolean columns) still go through pandas.
+    """
+    if _is_complex(table):
+        return _read_html_markdown(table)
+    rows = _rows(table)
+    if not rows:
+        return ""
+    width = max(len(row) for row in rows)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    # Like read_html, drop only rows that are a single blank cell.
+    header, *body = [row for row in rows if width > 1 or row[0]]
+    if any(_converts_values(list(column)) for column in zip(*body)):
+        return _read_html_markdown(table)
+    body = [[value if value not in _NA_VALUES else "" for value in row] for row in body]
+    return tabulate(
+        body, headers=_column_names(header), tablefmt="pipe", showindex=False
+    )
+
+
+# Tags holding the judgement's header details. Tables inside them are left as
+# they are.
+HEADER_TAGS = ["parties", "coram", "date", "representation", "charge"]
+
+
+def replace_tables(soup: BeautifulSoup) -> None:
+    """Replace every table after the first with its markdown, in place."""
     for table in soup.find_all("table")[1:]:
         # Skip tables inside parties, coram, date, representation, or charge tags
-        if table.find_parent(["parties", "coram", "date", "representation", "charge"]):
+        if table.find_parent(HEADER_TAGS):
             continue
 
-        table_df = (
-            pd.read_html(StringIO(str(table)), header=0)[0]
-            .fillna("")
-            .rename(columns={"Unnamed: 0": ""})
-            .astype(str)
-        )
-        clean_table = table_df.to_markdown(index=False)
+        clean_table = table_to_markdown(table)
         table.replace_with(clean_table)  # Replace with string, not parsed HTML
 
+
+def html_to_text_with_tables(html: str | BeautifulSoup) -> str:
+    """Convert HTML to text, preserving tables as clean HTML.
+
+    Pass the raw HTML string where possible: it is parsed once, with lxml. A
+    ``BeautifulSoup`` is copied first so the caller's tree is left untouched.
+    """
+    if isinstance(html, str):
+        soup = BeautifulSoup(html, "lxml")
+    else:
+        soup = BeautifulSoup(
+            str(html), "html.parser"
+        )  # Make a copy to avoid modifying original
+
+    replace_tables(soup)
     return soup.get_text()